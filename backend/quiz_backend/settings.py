@@ -194,15 +194,75 @@ ENABLE_DATA_INGESTION = config('ENABLE_DATA_INGESTION', default=True, cast=bool)
 ALLOW_BULK_DATA_IMPORT = config('ALLOW_BULK_DATA_IMPORT', default=False, cast=bool)
 MAX_IMPORT_BATCH_SIZE = config('MAX_IMPORT_BATCH_SIZE', default=1000, cast=int)
 
+# OpenTDB client: the public API allows one request every 5 seconds per IP
+OPENTDB_BASE_URL = config('OPENTDB_BASE_URL', default='https://opentdb.com')
+OPENTDB_RATE_LIMIT = config('OPENTDB_RATE_LIMIT', default=0.2, cast=float)  # requests per second
+OPENTDB_MAX_WORKERS = config('OPENTDB_MAX_WORKERS', default=4, cast=int)
+
+# AI quiz generation: provider ('gemini' or the offline 'fake'), background job pool and retries
+GEMINI_API_KEY = config('GEMINI_API_KEY', default=None)
+AI_QUIZ_PROVIDER = config('AI_QUIZ_PROVIDER', default='gemini')
+AI_QUIZ_FAKE_LATENCY = config('AI_QUIZ_FAKE_LATENCY', default=0.0, cast=float)  # seconds per fake generation
+AI_QUIZ_WORKERS = config('AI_QUIZ_WORKERS', default=4, cast=int)  # concurrent generations per process
+AI_QUIZ_MAX_RETRIES = config('AI_QUIZ_MAX_RETRIES', default=3, cast=int)
+AI_QUIZ_RETRY_BACKOFF = config('AI_QUIZ_RETRY_BACKOFF', default=2.0, cast=float)  # seconds, doubled per retry
+AI_QUIZ_JOB_TIMEOUT = config('AI_QUIZ_JOB_TIMEOUT', default=300, cast=int)  # running jobs fail after this
+AI_QUIZ_QUEUE_TIMEOUT = config('AI_QUIZ_QUEUE_TIMEOUT', default=900, cast=int)  # jobs never started fail after this
+AI_QUIZ_MAX_WAIT = config('AI_QUIZ_MAX_WAIT', default=25, cast=int)  # longest long-poll, in seconds
+AI_QUIZ_LEGACY_WAIT = config('AI_QUIZ_LEGACY_WAIT', default=5, cast=int)  # wait of the one-shot endpoint before 202
+AI_QUIZ_SHARD_SIZE = config('AI_QUIZ_SHARD_SIZE', default=10, cast=int)  # questions per prompt for large quizzes
+AI_QUIZ_SHARD_WORKERS = config('AI_QUIZ_SHARD_WORKERS', default=8, cast=int)  # concurrent shard prompts per process
+AI_QUIZ_CACHE_MAX_KEYS = config('AI_QUIZ_CACHE_MAX_KEYS', default=256, cast=int)  # (topic, difficulty, count) keys cached
+AI_QUIZ_CACHE_PER_KEY = config('AI_QUIZ_CACHE_PER_KEY', default=3, cast=int)  # quizzes kept per key, served at random
+AI_QUIZ_CACHE_TTL = config('AI_QUIZ_CACHE_TTL', default=3600, cast=int)  # seconds
+AI_QUIZ_PREWARM_INTERVAL = config('AI_QUIZ_PREWARM_INTERVAL', default=0, cast=int)  # seconds, 0 disables prewarming
+AI_QUIZ_PREWARM_POPULAR = config('AI_QUIZ_PREWARM_POPULAR', default=5, cast=int)  # most requested keys kept warm
+AI_QUIZ_PREWARM_MIN_REQUESTS = config(  # requests in the last one or two TTL periods before a key is prewarmed
+    'AI_QUIZ_PREWARM_MIN_REQUESTS', default=2, cast=int
+)
+AI_QUIZ_PREWARM_KEYS = config(  # 'topic:difficulty:count' entries always kept warm
+    'AI_QUIZ_PREWARM_KEYS', default='', cast=lambda v: [key.strip() for key in v.split(',') if key.strip()]
+)
+
 # Quiz Generation Settings
 MAX_QUIZ_QUESTIONS = config('MAX_QUIZ_QUESTIONS', default=50, cast=int)
 MIN_QUIZ_QUESTIONS = config('MIN_QUIZ_QUESTIONS', default=5, cast=int)
 DEFAULT_QUIZ_QUESTIONS = config('DEFAULT_QUIZ_QUESTIONS', default=10, cast=int)
 
 # Performance Settings
+# Response cache. The default is per process; point CACHE_BACKEND/CACHE_LOCATION at
+# Redis (django.core.cache.backends.redis.RedisCache) to share cached payloads between
+# workers. Content version bumps reach every worker either way (they go through the database).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='curiousmind'),
+    }
+}
 QUIZ_CACHE_TIMEOUT = config('QUIZ_CACHE_TIMEOUT', default=3600, cast=int)  # 1 hour
+QUIZ_CONTENT_VERSION_CHECK_INTERVAL = config(  # seconds a process trusts the content version it last read
+    'QUIZ_CONTENT_VERSION_CHECK_INTERVAL', default=1.0, cast=float
+)
+# Per-quiz leaderboards are cached; a completed or deleted attempt drops its quiz's entry
+# (in other workers too only when the cache backend is shared)
 LEADERBOARD_CACHE_TIMEOUT = config('LEADERBOARD_CACHE_TIMEOUT', default=300, cast=int)  # 5 minutes
 
+# Large quiz delivery: cursor pages of questions and NDJSON streaming
+QUIZ_QUESTIONS_PAGE_SIZE = config('QUIZ_QUESTIONS_PAGE_SIZE', default=50, cast=int)
+QUIZ_QUESTIONS_MAX_PAGE_SIZE = config('QUIZ_QUESTIONS_MAX_PAGE_SIZE', default=500, cast=int)
+QUIZ_STREAM_CHUNK_SIZE = config('QUIZ_STREAM_CHUNK_SIZE', default=500, cast=int)
+
+# Live leaderboard index: 'sortedset' (Redis sorted set shared by all processes),
+# 'database' (ranked UserProfile queries) or 'memory' (per process, single-worker only).
+# Defaults to the sorted set when LEADERBOARD_REDIS_URL is set, else the database.
+LEADERBOARD_REDIS_URL = config('LEADERBOARD_REDIS_URL', default='')
+LEADERBOARD_INDEX_BACKEND = config(
+    'LEADERBOARD_INDEX_BACKEND', default='sortedset' if LEADERBOARD_REDIS_URL else 'database'
+)
+# Most changed profiles a request (e.g. data cleanup) recomputes itself; the
+# scheduled leaderboard update handles the rest
+LEADERBOARD_SYNC_UPDATE_LIMIT = config('LEADERBOARD_SYNC_UPDATE_LIMIT', default=500, cast=int)
+
 # Security Settings
 SECURE_SSL_REDIRECT = config('SECURE_SSL_REDIRECT', default=False, cast=bool)
 SECURE_BROWSER_XSS_FILTER = config('SECURE_BROWSER_XSS_FILTER', default=True, cast=bool)
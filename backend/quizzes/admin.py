@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Quiz, Question, Choice, QuizAttempt, Answer, UserProfile
+from .models import Category, Quiz, Question, Choice, QuizAttempt, Answer, UserProfile, AIQuizJob
 
 class ChoiceInline(admin.TabularInline):
     model = Choice
@@ -9,10 +9,16 @@ class QuestionInline(admin.TabularInline):
     model = Question
     extra = 1
 
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug']
+    search_fields = ['name']
+    prepopulated_fields = {'slug': ['name']}
+
 @admin.register(Quiz)
 class QuizAdmin(admin.ModelAdmin):
-    list_display = ['title', 'created_at', 'is_active']
-    list_filter = ['is_active', 'created_at']
+    list_display = ['title', 'category', 'created_at', 'is_active']
+    list_filter = ['is_active', 'category', 'created_at']
     search_fields = ['title', 'description']
     inlines = [QuestionInline]
 
@@ -38,3 +44,10 @@ class QuizAttemptAdmin(admin.ModelAdmin):
 class AnswerAdmin(admin.ModelAdmin):
     list_display = ['attempt', 'question', 'selected_choice', 'is_correct']
     list_filter = ['is_correct']
+
+@admin.register(AIQuizJob)
+class AIQuizJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'topic', 'difficulty', 'question_count', 'status', 'created_at', 'finished_at']
+    list_filter = ['status', 'difficulty']
+    search_fields = ['topic']
+    readonly_fields = ['result']
@@ -0,0 +1,245 @@
+"""
+Cache of generated AI quizzes.
+
+Requests are keyed by (topic, difficulty, question count), with the topic
+normalized so "Space!", " space" and "SPACE" share an entry and an empty
+topic means general knowledge. Each key holds up to
+settings.AI_QUIZ_CACHE_PER_KEY validated quizzes, each kept for
+AI_QUIZ_CACHE_TTL seconds; a hit serves one of them at random. At most
+AI_QUIZ_CACHE_MAX_KEYS keys are kept, least recently used first out.
+
+A prewarmer thread keeps the most requested keys (and any listed in
+AI_QUIZ_PREWARM_KEYS) stocked with fresh quizzes, generating one at a
+time, every AI_QUIZ_PREWARM_INTERVAL seconds. Popularity counts the
+requests of the current and previous TTL period, and only keys requested
+at least AI_QUIZ_PREWARM_MIN_REQUESTS times in it are prewarmed, so
+one-off topics do not spend provider quota.
+
+Like the 'memory' leaderboard backend, the cache lives in each process.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from .ai_quiz import AIQuizError, generate_quiz
+
+logger = logging.getLogger(__name__)
+
+GENERAL_KNOWLEDGE = 'general knowledge'
+
+
+def cache_key(topic, difficulty, question_count):
+    """Normalized (topic, difficulty, question_count) key of a generation request"""
+    topic = ' '.join(re.sub(r'[^\w\s]', ' ', topic.casefold()).split())
+    return (topic or GENERAL_KNOWLEDGE, difficulty, question_count)
+
+
+def parse_key(text):
+    """Key from its 'topic:difficulty:count' form, as used in AI_QUIZ_PREWARM_KEYS"""
+    topic, difficulty, question_count = text.rsplit(':', 2)
+    return cache_key(topic, difficulty.strip(), int(question_count))
+
+
+class AIQuizCache:
+    """
+    Thread-safe TTL and LRU cache holding several quizzes per key.
+
+    Args:
+        max_keys: Keys kept before the least recently used is evicted
+        per_key: Quizzes kept per key
+        ttl: Seconds a quiz stays servable
+        clock: Monotonic time source, replaceable in tests
+    """
+
+    def __init__(self, max_keys, per_key, ttl, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.per_key = per_key
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> [(expires_at, quiz)], least recently used first
+        self.requests = Counter()  # requests per key in the current TTL period
+        self.previous_requests = Counter()  # and in the one before
+        self.period_started = clock()
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def _fresh(self, key):
+        now = self.clock()
+        quizzes = self.entries.get(key, [])
+        fresh = [entry for entry in quizzes if entry[0] > now]
+        if len(fresh) != len(quizzes):
+            self.stats['expirations'] += len(quizzes) - len(fresh)
+            if fresh:
+                self.entries[key] = fresh
+            else:
+                del self.entries[key]
+        return fresh
+
+    def _rotate_requests(self):
+        now = self.clock()
+        if now - self.period_started >= self.ttl:
+            # A whole period without rotating leaves nothing recent to keep
+            recent = now - self.period_started < 2 * self.ttl
+            self.previous_requests = self.requests if recent else Counter()
+            self.requests = Counter()
+            self.period_started = now
+
+    def get(self, key):
+        """A cached quiz for the key, or None; counts the request towards the key's popularity"""
+        with self.lock:
+            self._rotate_requests()
+            self.requests[key] += 1
+            if len(self.requests) > self.max_keys * 4:
+                # Topics are free text: forget the long tail of rare keys
+                self.requests = Counter(dict(self.requests.most_common(self.max_keys)))
+            fresh = self._fresh(key)
+            if not fresh:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self.entries.move_to_end(key)
+            return random.choice(fresh)[1]
+
+    def put(self, key, quiz):
+        """Store a validated quiz, replacing the oldest one when the key is full"""
+        with self.lock:
+            quizzes = self._fresh(key)
+            quizzes.append((self.clock() + self.ttl, quiz))
+            self.entries[key] = quizzes[-self.per_key:]
+            self.entries.move_to_end(key)
+            self.stats['stores'] += 1
+
+            while len(self.entries) > self.max_keys:
+                _, evicted = self.entries.popitem(last=False)
+                self.stats['evictions'] += len(evicted)
+
+    def fresh_count(self, key):
+        with self.lock:
+            return len(self._fresh(key))
+
+    def popular_keys(self, limit, min_requests=1):
+        """Keys requested at least min_requests times lately, most requested first"""
+        with self.lock:
+            self._rotate_requests()
+            recent = self.requests + self.previous_requests
+            return [key for key, count in recent.most_common(limit) if count >= min_requests]
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'hits': self.stats['hits'],
+                'misses': self.stats['misses'],
+                'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+                'stores': self.stats['stores'],
+                'prewarmed': self.stats['prewarmed'],
+                'evictions': self.stats['evictions'],
+                'expirations': self.stats['expirations'],
+                'keys': len(self.entries),
+                'quizzes': sum(len(quizzes) for quizzes in self.entries.values()),
+            }
+
+
+def serve(quiz):
+    """A copy of a cached quiz with its own id and timestamp, like a fresh generation"""
+    return {**quiz, 'id': int(time.time() * 1000), 'created_at': timezone.now().isoformat()}
+
+
+class Prewarmer:
+    """
+    Keeps popular keys stocked with `per_key` fresh quizzes.
+
+    Args:
+        cache: AIQuizCache to fill
+        keys: Keys always kept warm
+        popular: Number of most requested keys kept warm as well
+        min_requests: Recent requests a key needs before it counts as popular
+    """
+
+    def __init__(self, cache, keys=(), popular=5, min_requests=2):
+        self.cache = cache
+        self.keys = list(keys)
+        self.popular = popular
+        self.min_requests = min_requests
+        self.stopped = threading.Event()
+
+    def targets(self):
+        targets = list(self.keys)
+        for key in self.cache.popular_keys(self.popular, self.min_requests):
+            if key not in targets:
+                targets.append(key)
+        return targets
+
+    def run_once(self):
+        """Top up every target key; returns the number of quizzes generated"""
+        generated = 0
+        for key in self.targets():
+            topic, difficulty, question_count = key
+            while self.cache.fresh_count(key) < self.cache.per_key:
+                try:
+                    quiz = generate_quiz('' if topic == GENERAL_KNOWLEDGE else topic, difficulty, question_count)
+                except AIQuizError as e:
+                    logger.warning(f'Prewarming {key} failed: {e.message}')
+                    break
+                self.cache.put(key, quiz)
+                with self.cache.lock:
+                    self.cache.stats['prewarmed'] += 1
+                generated += 1
+        return generated
+
+    def start(self, interval):
+        """Run run_once every `interval` seconds in a daemon thread until stop()"""
+        def loop():
+            while not self.stopped.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.error(f'AI quiz prewarming failed: {e}', exc_info=True)
+                self.stopped.wait(interval)
+
+        threading.Thread(target=loop, name='ai-quiz-prewarmer', daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+
+
+_cache = None
+_prewarmer = None
+_cache_lock = threading.Lock()
+
+
+def get_ai_quiz_cache():
+    """The process-wide cache, starting its prewarmer on first use when enabled"""
+    global _cache, _prewarmer
+    with _cache_lock:
+        if _cache is None:
+            _cache = AIQuizCache(
+                max_keys=settings.AI_QUIZ_CACHE_MAX_KEYS,
+                per_key=settings.AI_QUIZ_CACHE_PER_KEY,
+                ttl=settings.AI_QUIZ_CACHE_TTL,
+            )
+            if settings.AI_QUIZ_PREWARM_INTERVAL > 0:
+                _prewarmer = Prewarmer(
+                    _cache,
+                    keys=[parse_key(text) for text in settings.AI_QUIZ_PREWARM_KEYS],
+                    popular=settings.AI_QUIZ_PREWARM_POPULAR,
+                    min_requests=settings.AI_QUIZ_PREWARM_MIN_REQUESTS,
+                )
+                _prewarmer.start(settings.AI_QUIZ_PREWARM_INTERVAL)
+        return _cache
+
+
+def reset_ai_quiz_cache():
+    """Drop the process-wide cache and stop its prewarmer"""
+    global _cache, _prewarmer
+    with _cache_lock:
+        if _prewarmer:
+            _prewarmer.stop()
+        _cache = None
+        _prewarmer = None
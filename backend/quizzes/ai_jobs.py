@@ -0,0 +1,176 @@
+"""
+Background AI quiz generation jobs.
+
+Creating a job stores an AIQuizJob row and hands it to a process-wide
+thread pool of settings.AI_QUIZ_WORKERS threads, which performs the
+provider call with its retries. Request threads never wait on the
+provider: clients poll the job, or long-poll it with wait_for_job, which
+wakes as soon as a job run by this process finishes and re-reads the row
+every POLL_INTERVAL seconds to see jobs finished by other processes.
+
+Requests that the AI quiz cache (see ai_cache) can answer skip the pool:
+their job is stored already succeeded. Quizzes generated by jobs are
+added to the cache.
+
+A job whose process died would stay pending or running; jobs running
+for longer than settings.AI_QUIZ_JOB_TIMEOUT, or still waiting for a pool
+thread settings.AI_QUIZ_QUEUE_TIMEOUT after they were created, are
+therefore reported as failed when read.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .ai_cache import cache_key, get_ai_quiz_cache, serve
+from .ai_quiz import AIQuizError, generate_quiz
+from .models import AIQuizJob
+
+logger = logging.getLogger(__name__)
+
+# Seconds between database reads while long-polling
+POLL_INTERVAL = 0.5
+
+_executor = None
+_executor_lock = threading.Lock()
+_finished_events = {}
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.AI_QUIZ_WORKERS, thread_name_prefix='ai-quiz')
+        return _executor
+
+
+def create_job(topic, difficulty, question_count):
+    """
+    Store a generation job and queue it once the surrounding transaction
+    commits, or store it finished when the cache holds a matching quiz
+    """
+    cached = get_ai_quiz_cache().get(cache_key(topic, difficulty, question_count))
+    if cached is not None:
+        now = timezone.now()
+        return AIQuizJob.objects.create(
+            topic=topic, difficulty=difficulty, question_count=question_count,
+            status=AIQuizJob.STATUS_SUCCEEDED, result=serve(cached), started_at=now, finished_at=now
+        )
+
+    job = AIQuizJob.objects.create(topic=topic, difficulty=difficulty, question_count=question_count)
+    transaction.on_commit(lambda: _queue_job(job.id))
+    return job
+
+
+def _queue_job(job_id):
+    # Only jobs that reach the pool get an event; run_job removes it again
+    _finished_events[job_id] = threading.Event()
+    try:
+        _get_executor().submit(run_job, job_id)
+    except RuntimeError:
+        _finished_events.pop(job_id, None)
+        raise
+
+
+def run_job(job_id):
+    """Generate the quiz of a pending job and store the outcome (runs in a pool thread)"""
+    try:
+        claimed = AIQuizJob.objects.filter(id=job_id, status=AIQuizJob.STATUS_PENDING).update(
+            status=AIQuizJob.STATUS_RUNNING, started_at=timezone.now()
+        )
+        if not claimed:
+            return
+
+        job = AIQuizJob.objects.get(id=job_id)
+        try:
+            job.result = generate_quiz(job.topic, job.difficulty, job.question_count)
+            job.status = AIQuizJob.STATUS_SUCCEEDED
+            get_ai_quiz_cache().put(cache_key(job.topic, job.difficulty, job.question_count), job.result)
+        except AIQuizError as e:
+            job.status = AIQuizJob.STATUS_FAILED
+            job.error = e.message
+            job.error_status = e.status_code
+        except Exception as e:
+            logger.error(f'AI quiz job {job_id} crashed: {e}', exc_info=True)
+            job.status = AIQuizJob.STATUS_FAILED
+            job.error = 'Failed to generate quiz. Please try again later.'
+            job.error_status = 500
+
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'result', 'error', 'error_status', 'finished_at'])
+    finally:
+        event = _finished_events.pop(job_id, None)
+        if event:
+            event.set()
+        # Pool threads outlive requests, so nothing else closes their connection
+        connection.close()
+
+
+def _expire_if_stale(job):
+    if job.is_finished:
+        return job
+    now = timezone.now()
+    if job.status == AIQuizJob.STATUS_RUNNING:
+        stale = job.started_at < now - timedelta(seconds=settings.AI_QUIZ_JOB_TIMEOUT)
+    else:
+        stale = job.created_at < now - timedelta(seconds=settings.AI_QUIZ_QUEUE_TIMEOUT)
+    if not stale:
+        return job
+    AIQuizJob.objects.filter(id=job.id, status=job.status).update(
+        status=AIQuizJob.STATUS_FAILED,
+        error='Quiz generation timed out. Please try again.',
+        error_status=504,
+        finished_at=now
+    )
+    job.refresh_from_db()
+    return job
+
+
+def wait_for_job(job_id, timeout=0):
+    """
+    Read a job, waiting up to `timeout` seconds for it to finish.
+
+    Raises:
+        AIQuizJob.DoesNotExist: No job with this id
+    """
+    deadline = time.monotonic() + timeout
+    event = _finished_events.get(job_id)
+
+    while True:
+        job = _expire_if_stale(AIQuizJob.objects.get(id=job_id))
+        remaining = deadline - time.monotonic()
+        if job.is_finished or remaining <= 0:
+            return job
+        if event:
+            event.wait(min(remaining, POLL_INTERVAL))
+        else:
+            time.sleep(min(remaining, POLL_INTERVAL))
+
+
+def purge_old_jobs(max_age=timedelta(days=1)):
+    """Delete jobs created more than `max_age` ago; returns the number deleted"""
+    old_jobs = AIQuizJob.objects.filter(created_at__lt=timezone.now() - max_age)
+    for job_id in old_jobs.values_list('id', flat=True):
+        _finished_events.pop(job_id, None)
+    deleted, _ = old_jobs.delete()
+    return deleted
+
+
+def job_payload(job):
+    """API representation of a job"""
+    payload = {
+        'id': str(job.id),
+        'status': job.status,
+        'created_at': job.created_at.isoformat(),
+    }
+    if job.status == AIQuizJob.STATUS_SUCCEEDED:
+        payload['quiz'] = job.result
+    elif job.status == AIQuizJob.STATUS_FAILED:
+        payload['error'] = job.error
+        payload['error_status'] = job.error_status
+    return payload
@@ -0,0 +1,448 @@
+"""
+AI quiz generation.
+
+Builds the prompt, calls a text generation provider, validates the reply
+and shapes it into the QuizDetail format the app renders. The provider is
+selected with settings.AI_QUIZ_PROVIDER:
+
+- 'gemini': Google Gemini, configured with GEMINI_API_KEY
+- 'fake': FakeProvider, a deterministic local generator for development
+  and tests that never touches the network
+
+Generation is slow and retried with backoff, so it runs in the AI job
+worker pool (see ai_jobs) rather than in request threads. Providers can
+also stream their reply as it is produced (see ai_stream).
+
+Requests for more than settings.AI_QUIZ_SHARD_SIZE questions are split
+into shards, generated concurrently by a process-wide pool of
+AI_QUIZ_SHARD_WORKERS threads. Each shard is retried on its own, and
+questions repeated across shards are replaced by a top-up prompt that
+lists the questions to avoid.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from .importing import points_for_difficulty
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ['easy', 'medium', 'hard', 'any']
+GEMINI_MODEL = 'gemini-2.5-flash-lite'
+
+# Substrings of provider errors worth retrying
+RETRYABLE_ERRORS = ['overloaded', '503', '502', '504', 'timeout', 'network', 'fetch']
+
+
+class AIQuizError(Exception):
+    """A generation failure, with the message and HTTP status to report to the client"""
+
+    def __init__(self, message, status_code=500, retryable=False):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+def validate_request(data):
+    """
+    Read and validate generation parameters from request data.
+
+    Returns:
+        tuple: (topic, difficulty, question_count)
+    """
+    difficulty = data.get('difficulty', 'any')
+    topic = str(data.get('topic', '') or '').strip()
+    try:
+        question_count = int(data.get('question_count', 10))
+    except (TypeError, ValueError):
+        raise AIQuizError('Question count must be a number', 400)
+
+    if difficulty not in DIFFICULTIES:
+        raise AIQuizError('Invalid difficulty level', 400)
+    if question_count < 1 or question_count > 50:
+        raise AIQuizError('Question count must be between 1 and 50', 400)
+    return topic, difficulty, question_count
+
+
+def build_prompt(topic, difficulty, question_count, avoid=(), part=None):
+    """
+    Prompt asking for `question_count` questions as a single JSON object,
+    none of them repeating a question text in `avoid`. `part` is the
+    (number, total) of a shard of a larger quiz.
+    """
+    topic_text = f"about {topic}" if topic else "on general knowledge topics"
+    difficulty_text = (
+        "mixed difficulty levels (include a variety of easy, medium, and hard questions)"
+        if difficulty == 'any' else f"{difficulty} difficulty level"
+    )
+    avoid_text = ''.join(f"\n- {question}" for question in avoid)
+    part_text = (
+        f"This is part {part[0]} of {part[1]} of a larger quiz: cover different aspects of the topic "
+        f"than the other parts would." if part else ''
+    )
+
+    return f"""Generate a quiz {topic_text} with the following specifications:
+
+Difficulty: {difficulty_text}
+Number of questions: {question_count}
+
+Requirements:
+- Each question should have exactly 4 multiple choice options (A, B, C, D)
+- Only one option should be correct
+- Questions should be appropriate for {difficulty_text}
+- Include a mix of topics if no specific topic is provided
+- Make questions engaging and educational
+
+Please respond with ONLY a valid JSON object in this exact format:
+{{
+  "title": "Generated Quiz Title",
+  "description": "Brief description of the quiz",
+  "questions": [
+    {{
+      "question": "What is the question text?",
+      "options": ["Option A", "Option B", "Option C", "Option D"],
+      "correct_answer": "Option A",
+      "difficulty": "{difficulty if difficulty != 'any' else 'easy" (or "medium" or "hard" for each question individually)'}",
+      "type": "multiple_choice"
+    }}
+  ]
+}}
+
+{f'IMPORTANT: For mixed difficulty, assign each question a specific difficulty level ("easy", "medium", or "hard") based on its complexity. Make sure to include a good mix of all three difficulty levels.' if difficulty == 'any' else ''}
+
+{part_text}
+{f'Do not repeat any of these questions:{avoid_text}' if avoid else ''}
+
+Generate exactly {question_count} questions. Do not include any text before or after the JSON object."""
+
+
+def parse_quiz_response(response_text, question_count):
+    """
+    Parse and validate a provider reply.
+
+    Raises:
+        ValueError: The reply is not valid JSON (json.JSONDecodeError) or
+        does not hold `question_count` well-formed questions
+    """
+    response_text = response_text.strip()
+
+    # Remove markdown code blocks if present
+    if response_text.startswith('```json'):
+        response_text = response_text.replace('```json', '', 1).replace('```', '', 1).strip()
+    elif response_text.startswith('```'):
+        response_text = response_text.replace('```', '', 1).replace('```', '', 1).strip()
+
+    quiz_data = json.loads(response_text)
+
+    if not quiz_data or not isinstance(quiz_data, dict):
+        raise ValueError('Invalid quiz data format')
+
+    if not isinstance(quiz_data.get('questions'), list) or len(quiz_data['questions']) != question_count:
+        raise ValueError(f'Expected {question_count} questions, got {len(quiz_data.get("questions", []))}')
+
+    for question in quiz_data['questions']:
+        validate_question(question)
+    return quiz_data
+
+
+def validate_question(question):
+    """Raise ValueError unless a generated question has text, 4 options and a correct answer among them"""
+    if not isinstance(question, dict):
+        raise ValueError('Invalid question format')
+    if not question.get('question') or not isinstance(question.get('options'), list) or len(question['options']) != 4:
+        raise ValueError('Invalid question format')
+    if not question.get('correct_answer') or question['correct_answer'] not in question['options']:
+        raise ValueError('Invalid correct answer')
+
+
+def question_key(generated):
+    """Case and whitespace insensitive text of a generated question, for spotting repeats"""
+    return ' '.join(str(generated['question']).casefold().split())
+
+
+def transform_question(generated, number, difficulty):
+    """A validated generated question in QuizDetail format, numbered from 1"""
+    return {
+        'id': number,
+        'question_text': generated['question'],
+        'question_type': 'multiple_choice',
+        'points': points_for_difficulty(str(generated.get('difficulty', difficulty)).lower()),
+        'order': number,
+        'choices': [
+            {
+                'id': j + 1,
+                'choice_text': option,
+                'is_correct': option == generated['correct_answer']
+            }
+            for j, option in enumerate(generated['options'])
+        ]
+    }
+
+
+def transform_quiz(quiz_data, difficulty, question_count):
+    """A validated generated quiz in QuizDetail format"""
+    questions = [
+        transform_question(generated, i + 1, difficulty)
+        for i, generated in enumerate(quiz_data['questions'])
+    ]
+
+    return {
+        'id': int(time.time() * 1000),  # Unique ID based on timestamp
+        'title': quiz_data.get('title', f'{difficulty.title()} Quiz'),
+        'description': quiz_data.get('description', f'A {difficulty} difficulty quiz with {question_count} questions'),
+        'created_at': timezone.now().isoformat(),
+        'questions': questions,
+        'total_points': sum(question['points'] for question in questions)
+    }
+
+
+def classify_error(exc):
+    """Map a provider or parsing failure to an AIQuizError"""
+    if isinstance(exc, AIQuizError):
+        return exc
+    if isinstance(exc, json.JSONDecodeError):
+        return AIQuizError('Failed to parse AI response. Please try again.', 500, retryable=True)
+    if isinstance(exc, ValueError):
+        # Malformed quiz (wrong question count, bad answer): ask again
+        return AIQuizError('The AI returned an invalid quiz. Please try again.', 500, retryable=True)
+
+    error_message = str(exc).lower()
+    retryable = any(keyword in error_message for keyword in RETRYABLE_ERRORS)
+
+    if 'api_key' in error_message or 'api key' in error_message:
+        return AIQuizError('Invalid API key. Please check your Gemini API key configuration.', 503)
+    if 'overloaded' in error_message or '503' in error_message:
+        return AIQuizError(
+            'AI service is currently overloaded. Please wait a moment and try again.', 503, retryable
+        )
+    if 'quota' in error_message or 'limit' in error_message:
+        return AIQuizError('API quota exceeded. Please try again later or check your API usage limits.', 429)
+    if 'timeout' in error_message:
+        return AIQuizError(
+            'Request timed out. Please check your internet connection and try again.', 504, retryable
+        )
+    return AIQuizError(
+        'Failed to generate quiz. The AI service may be temporarily unavailable. Please try again in a few moments.',
+        500, retryable
+    )
+
+
+class GeminiProvider:
+    """Google Gemini text generation"""
+
+    def __init__(self, api_key, model_name=GEMINI_MODEL):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt):
+        """Yield the reply text piece by piece as the model produces it"""
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+
+class FakeProvider:
+    """
+    Offline provider returning well-formed quizzes for the prompt's topic,
+    difficulty and question count.
+
+    Args:
+        latency: Seconds each call takes
+        fail_first: Number of initial calls that fail with a retryable error
+            (streamed calls fail halfway through their reply)
+        chunk_size: Characters per streamed chunk
+    """
+
+    def __init__(self, latency=0.0, fail_first=0, chunk_size=64):
+        self.latency = latency
+        self.failures_left = fail_first
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def _start_call(self):
+        """Count a call; True when it should fail"""
+        with self.lock:
+            self.calls += 1
+            fail = self.failures_left > 0
+            if fail:
+                self.failures_left -= 1
+            return fail
+
+    def generate(self, prompt):
+        fail = self._start_call()
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError('503 The model is overloaded')
+        return json.dumps(self.quiz_for(prompt))
+
+    def stream(self, prompt):
+        """Yield a fenced, indented reply in chunks, spreading the latency over them"""
+        fail = self._start_call()
+        text = f"```json\n{json.dumps(self.quiz_for(prompt), indent=2)}\n```"
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        for i, chunk in enumerate(chunks):
+            if fail and i == len(chunks) // 2:
+                raise RuntimeError('503 The model is overloaded')
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield chunk
+
+    def quiz_for(self, prompt):
+        count = int(re.search(r'Number of questions: (\d+)', prompt).group(1))
+        topic_match = re.search(r'Generate a quiz about (.+?) with', prompt)
+        topic = topic_match.group(1) if topic_match else 'General Knowledge'
+        fixed_difficulty = re.search(r'Difficulty: (easy|medium|hard) difficulty', prompt)
+        avoid = set(re.findall(r'^- (.+)$', prompt, re.MULTILINE))
+        part = re.search(r'This is part (\d+) of', prompt)
+
+        questions = []
+        number = (int(part.group(1)) - 1) * 100 if part else 0
+        while len(questions) < count:
+            number += 1
+            if f'{topic} question {number}?' in avoid:
+                continue
+            options = [f'{topic} answer {number}.{k}' for k in range(4)]
+            questions.append({
+                'question': f'{topic} question {number}?',
+                'options': options,
+                'correct_answer': options[number % 4],
+                'difficulty': fixed_difficulty.group(1) if fixed_difficulty else DIFFICULTIES[number % 3],
+                'type': 'multiple_choice',
+            })
+        return {'title': f'{topic.title()} Quiz', 'description': f'{count} questions about {topic}', 'questions': questions}
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def _create_provider():
+    provider_name = getattr(settings, 'AI_QUIZ_PROVIDER', 'gemini')
+
+    if provider_name == 'gemini':
+        if not settings.GEMINI_API_KEY:
+            return None
+        return GeminiProvider(settings.GEMINI_API_KEY)
+
+    if provider_name == 'fake':
+        return FakeProvider(latency=settings.AI_QUIZ_FAKE_LATENCY)
+
+    raise ImproperlyConfigured(f'Unknown AI_QUIZ_PROVIDER: {provider_name}')
+
+
+def get_provider():
+    """The process-wide provider, or None when generation is not configured"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = _create_provider()
+        return _provider
+
+
+def set_provider(provider):
+    """Replace the process-wide provider (None resets it to the configured one)"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
+_shard_executor = None
+_shard_executor_lock = threading.Lock()
+
+
+def _get_shard_executor():
+    global _shard_executor
+    with _shard_executor_lock:
+        if _shard_executor is None:
+            _shard_executor = ThreadPoolExecutor(
+                max_workers=settings.AI_QUIZ_SHARD_WORKERS, thread_name_prefix='ai-quiz-shard'
+            )
+        return _shard_executor
+
+
+def shard_sizes(question_count, shard_size):
+    """Split a question count into as few near-equal shards of at most `shard_size` as possible"""
+    shards = -(-question_count // shard_size)
+    return [question_count // shards + (1 if i < question_count % shards else 0) for i in range(shards)]
+
+
+def generate_quiz(topic, difficulty, question_count, provider=None):
+    """
+    Generate a validated quiz, in concurrent shards when it is large.
+
+    Returns:
+        dict: The quiz in QuizDetail format
+
+    Raises:
+        AIQuizError: Generation failed for good or after all retries
+    """
+    provider = provider or get_provider()
+    if provider is None:
+        raise AIQuizError('Gemini API key is not configured. Please add your API key to the .env file.', 503)
+
+    sizes = shard_sizes(question_count, settings.AI_QUIZ_SHARD_SIZE)
+    if len(sizes) == 1:
+        return transform_quiz(_generate_part(provider, topic, difficulty, question_count), difficulty, question_count)
+
+    futures = [
+        _get_shard_executor().submit(_generate_part, provider, topic, difficulty, size, part=(i + 1, len(sizes)))
+        for i, size in enumerate(sizes)
+    ]
+    try:
+        parts = [future.result() for future in futures]
+    except AIQuizError:
+        for future in futures:
+            future.cancel()
+        raise
+
+    first = parts[0]
+    questions = []
+    seen = set()
+    for attempt in range(settings.AI_QUIZ_MAX_RETRIES + 1):
+        for generated in (question for part in parts for question in part['questions']):
+            if question_key(generated) not in seen and len(questions) < question_count:
+                seen.add(question_key(generated))
+                questions.append(generated)
+        missing = question_count - len(questions)
+        if not missing or attempt == settings.AI_QUIZ_MAX_RETRIES:
+            break
+        logger.info(f'{missing} AI quiz questions were repeated across shards; asking for replacements')
+        avoid = [generated['question'] for generated in questions]
+        parts = [_generate_part(provider, topic, difficulty, missing, avoid=avoid)]
+
+    if len(questions) < question_count:
+        raise AIQuizError('The AI returned an invalid quiz. Please try again.', 500)
+    return transform_quiz({**first, 'questions': questions}, difficulty, question_count)
+
+
+def _generate_part(provider, topic, difficulty, question_count, avoid=(), part=None):
+    """One prompt's validated quiz data, retrying transient failures and invalid replies"""
+    prompt = build_prompt(topic, difficulty, question_count, avoid=avoid, part=part)
+    max_retries = settings.AI_QUIZ_MAX_RETRIES
+
+    for attempt in range(max_retries + 1):
+        try:
+            return parse_quiz_response(provider.generate(prompt), question_count)
+        except Exception as e:
+            error = classify_error(e)
+            if not error.retryable or attempt == max_retries:
+                logger.warning(f'AI quiz generation failed after {attempt + 1} attempts: {e}')
+                raise error
+            delay = settings.AI_QUIZ_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+            logger.info(f'AI quiz generation failed ({e}); retrying in {delay:.1f}s')
+            time.sleep(delay)
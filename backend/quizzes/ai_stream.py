@@ -0,0 +1,245 @@
+"""
+Streaming AI quiz generation.
+
+Instead of waiting for the whole reply, the provider's text stream is fed
+to QuestionStreamParser, which picks each question object out of the
+reply's "questions" array as soon as its closing brace arrives. Every
+question that validates is sent to the client right away, so the first
+question arrives after a fraction of the generation time.
+
+quiz_events yields the records of one stream:
+
+    {"type": "quiz", "id", "title", "description", "created_at", "question_count"}
+    {"type": "question", ...}    one per question, in QuizDetail format
+    {"type": "done", "question_count", "total_points"}
+or, once something failed for good:
+    {"type": "error", "error", "status"}
+
+Questions that fail validation or repeat an earlier one are dropped. If
+the reply ends short or the stream breaks off, only the missing questions
+are asked for again (listing the ones already sent as questions to avoid),
+up to settings.AI_QUIZ_MAX_RETRIES more times. Complete quizzes go into the
+AI quiz cache, and cached quizzes are replayed without calling the provider.
+"""
+import json
+import logging
+import random
+import re
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .ai_cache import cache_key, get_ai_quiz_cache, serve
+from .ai_quiz import (
+    AIQuizError, build_prompt, classify_error, get_provider, question_key, transform_question, validate_question
+)
+
+logger = logging.getLogger(__name__)
+
+QUESTIONS_ARRAY = re.compile(r'"questions"\s*:\s*\[')
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
+def _loads_tolerant(text):
+    """Parse a JSON value, forgiving trailing commas; None if it still does not parse"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return json.loads(TRAILING_COMMA.sub(r'\1', text))
+    except ValueError:
+        return None
+
+
+class QuestionStreamParser:
+    """
+    Incremental parser for a streamed quiz reply.
+
+    Text before the "questions" array (code fences, title, description) is
+    kept as the head; inside the array, strings, escapes and nesting are
+    tracked across chunks so each top-level object is parsed as soon as it
+    is complete. Anything after the array is ignored.
+
+    Usage:
+        parser = QuestionStreamParser()
+        for chunk in chunks:
+            for question in parser.feed(chunk):
+                ...
+    """
+
+    def __init__(self):
+        self.head = ''
+        self.buffer = ''
+        self.in_array = False
+        self.done = False
+        self.pos = 0  # next character of buffer to scan
+        self.start = None  # buffer index where the current object starts
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, text):
+        """Add a chunk of the reply; returns the objects completed by it (None for unparsable ones)"""
+        if self.done:
+            return []
+        if not self.in_array:
+            self.head += text
+            match = QUESTIONS_ARRAY.search(self.head)
+            if not match:
+                return []
+            self.in_array = True
+            self.head, text = self.head[:match.start()], self.head[match.end():]
+
+        self.buffer += text
+        completed = []
+        for i in range(self.pos, len(self.buffer)):
+            char = self.buffer[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                if self.depth == 0:
+                    self.start = i
+                self.depth += 1
+            elif char in '}]':
+                if self.depth == 0:
+                    # End of the questions array
+                    self.done = True
+                    break
+                self.depth -= 1
+                if self.depth == 0:
+                    completed.append(_loads_tolerant(self.buffer[self.start:i + 1]))
+                    self.start = None
+
+        # Keep only the unfinished object
+        consumed = self.start if self.start is not None else len(self.buffer)
+        self.buffer = self.buffer[consumed:]
+        self.pos = len(self.buffer)
+        if self.start is not None:
+            self.start = 0
+        return completed
+
+    def field(self, name):
+        """A string field of the quiz found before the questions array, or None"""
+        match = re.search(rf'"{name}"\s*:\s*("(?:[^"\\]|\\.)*")', self.head)
+        return _loads_tolerant(match.group(1)) if match else None
+
+
+def stream_quiz(topic, difficulty, question_count, provider=None):
+    """
+    Yield quiz, question and done (or error) records while the quiz is generated.
+
+    Returns:
+        dict: The complete quiz in QuizDetail format, or None when generation failed
+    """
+    provider = provider or get_provider()
+    if provider is None:
+        error = AIQuizError('Gemini API key is not configured. Please add your API key to the .env file.', 503)
+        yield {'type': 'error', 'error': error.message, 'status': error.status_code}
+        return None
+
+    header = None
+    questions = []
+    seen = set()
+    max_retries = settings.AI_QUIZ_MAX_RETRIES
+
+    for attempt in range(max_retries + 1):
+        parser = QuestionStreamParser()
+        error = None
+        try:
+            prompt = build_prompt(
+                topic, difficulty, question_count - len(questions),
+                avoid=[question['question_text'] for question in questions]
+            )
+            for chunk in provider.stream(prompt):
+                for generated in parser.feed(chunk):
+                    if header is None:
+                        header = {
+                            'type': 'quiz',
+                            'id': int(time.time() * 1000),
+                            'title': parser.field('title') or f'{difficulty.title()} Quiz',
+                            'description': parser.field('description')
+                            or f'A {difficulty} difficulty quiz with {question_count} questions',
+                            'created_at': timezone.now().isoformat(),
+                            'question_count': question_count,
+                        }
+                        yield header
+                    try:
+                        validate_question(generated)
+                    except ValueError as e:
+                        logger.info(f'Dropping streamed question: {e}')
+                        continue
+                    if len(questions) == question_count or question_key(generated) in seen:
+                        continue
+                    seen.add(question_key(generated))
+                    question = transform_question(generated, len(questions) + 1, difficulty)
+                    questions.append(question)
+                    yield {'type': 'question', **question}
+        except Exception as e:
+            error = classify_error(e)
+
+        if len(questions) == question_count:
+            break
+        if error is None:
+            error = AIQuizError('The AI returned an invalid quiz. Please try again.', 500, retryable=True)
+        if not error.retryable or attempt == max_retries:
+            logger.warning(
+                f'Streamed AI quiz stopped at {len(questions)}/{question_count} questions '
+                f'after {attempt + 1} attempts: {error.message}'
+            )
+            yield {'type': 'error', 'error': error.message, 'status': error.status_code}
+            return None
+        delay = settings.AI_QUIZ_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+        logger.info(
+            f'Streamed AI quiz has {len(questions)}/{question_count} questions ({error.message}); '
+            f'asking for the rest in {delay:.1f}s'
+        )
+        time.sleep(delay)
+
+    total_points = sum(question['points'] for question in questions)
+    yield {'type': 'done', 'question_count': len(questions), 'total_points': total_points}
+    return {
+        'id': header['id'],
+        'title': header['title'],
+        'description': header['description'],
+        'created_at': header['created_at'],
+        'questions': questions,
+        'total_points': total_points,
+    }
+
+
+def replay_quiz(quiz):
+    """The records of a stream that produced `quiz`"""
+    yield {
+        'type': 'quiz',
+        'id': quiz['id'],
+        'title': quiz['title'],
+        'description': quiz['description'],
+        'created_at': quiz['created_at'],
+        'question_count': len(quiz['questions']),
+    }
+    for question in quiz['questions']:
+        yield {'type': 'question', **question}
+    yield {'type': 'done', 'question_count': len(quiz['questions']), 'total_points': quiz['total_points']}
+
+
+def quiz_events(topic, difficulty, question_count):
+    """Records of a streamed generation, served from the AI quiz cache when possible"""
+    key = cache_key(topic, difficulty, question_count)
+    cache = get_ai_quiz_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        yield from replay_quiz(serve(cached))
+        return
+
+    quiz = yield from stream_quiz(topic, difficulty, question_count)
+    if quiz is not None:
+        cache.put(key, quiz)
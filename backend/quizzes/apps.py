@@ -9,6 +9,9 @@ class QuizzesConfig(AppConfig):
     name = 'quizzes'
 
     def ready(self):
+        # Register cache invalidation handlers
+        from . import signals  # noqa: F401
+
         # Only start scheduler in the main process (not during migrations, etc.)
         if os.environ.get('RUN_MAIN'):
             from .scheduler import start_scheduler
@@ -0,0 +1,125 @@
+"""
+Response caching for quiz content.
+
+Rendered JSON for the quiz list and quiz details is stored in the Django
+cache under a key that includes a global content version. Any change to
+quizzes, questions or choices bumps the version, which makes every cached
+payload unreachable at once. Cached payloads carry an ETag so clients can
+revalidate with If-None-Match and get a 304 without a body.
+
+The version lives in the database (ContentVersion), so bumps made by the
+import commands or by another worker reach every process even when the
+cache backend is per process. Each process re-reads it at most every
+settings.QUIZ_CONTENT_VERSION_CHECK_INTERVAL seconds.
+"""
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+
+from .models import ContentVersion
+
+_state = threading.local()
+
+# Last version read or written by this process, and when (time.monotonic())
+_known_version = {'version': None, 'checked_at': 0.0}
+_version_lock = threading.Lock()
+
+
+def _initial_version():
+    # Time based so a version lost to eviction never reuses an older number
+    return int(time.time() * 1000)
+
+
+def _remember_version(version):
+    with _version_lock:
+        _known_version['version'] = version
+        _known_version['checked_at'] = time.monotonic()
+    return version
+
+
+def get_content_version():
+    """Current quiz content version"""
+    with _version_lock:
+        version = _known_version['version']
+        age = time.monotonic() - _known_version['checked_at']
+    if version is not None and age < settings.QUIZ_CONTENT_VERSION_CHECK_INTERVAL:
+        return version
+    return _remember_version(ContentVersion.current(_initial_version))
+
+
+def bump_content_version():
+    """Invalidate all cached quiz content, in every process"""
+    return _remember_version(ContentVersion.bump(_initial_version))
+
+
+def invalidate_quiz_content():
+    """Bump the content version unless a deferred invalidation block is active"""
+    if getattr(_state, 'depth', 0):
+        _state.pending = True
+        return
+    bump_content_version()
+
+
+@contextmanager
+def deferred_content_invalidation():
+    """Collapse the per-row invalidations of a bulk import into a single version bump"""
+    depth = getattr(_state, 'depth', 0)
+    _state.depth = depth + 1
+    if depth == 0:
+        _state.pending = False
+    try:
+        yield
+    finally:
+        _state.depth = depth
+        if depth == 0 and _state.pending:
+            _state.pending = False
+            bump_content_version()
+
+
+def cache_key(name):
+    """Versioned cache key for a piece of quiz content"""
+    return f'quizzes:{name}:v{get_content_version()}'
+
+
+def quiz_leaderboard_key(quiz_id):
+    """Cache key of a quiz's leaderboard, dropped whenever one of its attempts changes"""
+    return cache_key(f'quiz_leaderboard:{quiz_id}')
+
+
+def cached_json_response(request, name, build_data):
+    """
+    Return rendered JSON for `name` from the cache, building it on a miss.
+
+    Args:
+        request: Incoming request, used for If-None-Match
+        name: Cache key name, unique per payload
+        build_data: Callable returning the data to render on a cache miss
+
+    Returns:
+        HttpResponse: 200 with the JSON body, or 304 when the client's ETag matches
+    """
+    key = cache_key(name)
+    cached = cache.get(key)
+
+    if cached is None:
+        content = JSONRenderer().render(build_data())
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        cached = (etag, content)
+        cache.set(key, cached, settings.QUIZ_CACHE_TIMEOUT)
+
+    etag, content = cached
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='application/json')
+
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,210 @@
+"""
+Writers and readers for quiz fixture files.
+
+JSONFixtureWriter writes Django JSON fixtures incrementally, one object at
+a time, so exports do not build the whole document in memory.
+
+The rest of the module implements a compact binary container for quiz
+fixtures (.qfx).
+
+Django's JSON fixtures repeat every field name for every object and have to
+be parsed from the start to find anything. A .qfx archive stores fixture
+data in blocks, one per category, each holding its tables column by column
+(one list per field) and optionally zlib compressed. An index at the end of
+the file records where every block starts, so a single category can be read
+without touching the rest of the file.
+
+Layout (little endian):
+
+    header   magic b'QZFX', version (u16), flags (u16), index offset (u64)
+    blocks   payload length (u32) + payload, one per category
+    index    length (u32) + JSON list of {name, slug, offset, length, counts}
+
+A block payload is JSON: {"tables": {label: {"fields": ["pk", ...],
+"columns": [[...], ...]}}}, tables in dependency order. Decoded objects
+have the usual fixture shape ({"model", "pk", "fields"}), so they go
+through the same loaders as JSON fixtures, which remain the interchange
+format.
+"""
+import json
+import struct
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+BINARY_FIXTURE_SUFFIX = '.qfx'
+
+MAGIC = b'QZFX'
+VERSION = 1
+FLAG_ZLIB = 0x1
+
+HEADER = struct.Struct('<4sHHQ')
+LENGTH = struct.Struct('<I')
+
+
+class FixtureFormatError(ValueError):
+    """Raised for files that are not valid .qfx archives"""
+
+
+def fixture_object(instance):
+    """
+    Fixture object for a model instance, as Django's serializers build it
+    for models without many-to-many fields (foreign keys as plain ids)
+    """
+    return {
+        'model': instance._meta.label_lower,
+        'pk': instance.pk,
+        'fields': {
+            field.name: field.value_from_object(instance)
+            for field in instance._meta.concrete_fields if field.serialize
+        },
+    }
+
+
+class JSONFixtureWriter:
+    """
+    Write a JSON fixture file object by object.
+
+    The output matches serializers.serialize('json', objects, indent=2).
+
+    Usage:
+        writer = JSONFixtureWriter(f)
+        for instance in queryset.iterator():
+            writer.write(fixture_object(instance))
+        writer.close()
+    """
+
+    def __init__(self, fp, indent=2):
+        self.fp = fp
+        self.indent = indent
+        self.count = 0
+        self.fp.write('[')
+
+    def write(self, obj):
+        self.fp.write(',\n' if self.count else '\n')
+        self.fp.write(json.dumps(obj, cls=DjangoJSONEncoder, indent=self.indent, ensure_ascii=False))
+        self.count += 1
+
+    def close(self):
+        self.fp.write('\n]\n')
+
+
+def _read_exactly(fp, size):
+    data = fp.read(size)
+    if len(data) != size:
+        raise FixtureFormatError('Archive is truncated')
+    return data
+
+
+class FixtureArchiveWriter:
+    """
+    Write a .qfx archive block by block.
+
+    Usage:
+        with open(path, 'wb') as f:
+            writer = FixtureArchiveWriter(f)
+            writer.add_block({'name': 'History', 'slug': 'history'}, {
+                'quizzes.quiz': (['pk', 'title'], [(1, 'History - Quiz')]),
+            })
+            writer.close()
+    """
+
+    def __init__(self, fp, compress=True):
+        self.fp = fp
+        self.flags = FLAG_ZLIB if compress else 0
+        self.index = []
+        self.fp.write(HEADER.pack(MAGIC, VERSION, self.flags, 0))
+
+    def add_block(self, category, tables):
+        """
+        Append one category's fixture data.
+
+        Args:
+            category: {'name', 'slug'} of the block's category, or None
+            tables: Model label -> (field names starting with 'pk', iterable of rows),
+                parents before children
+        """
+        encoded = {}
+        counts = {}
+        for label, (field_names, rows) in tables.items():
+            rows = list(rows)
+            columns = [list(column) for column in zip(*rows)] or [[] for _ in field_names]
+            encoded[label] = {'fields': list(field_names), 'columns': columns}
+            counts[label] = len(rows)
+
+        payload = json.dumps({'tables': encoded}, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+        if self.flags & FLAG_ZLIB:
+            payload = zlib.compress(payload)
+
+        self.index.append({
+            'name': category['name'] if category else None,
+            'slug': category['slug'] if category else '',
+            'offset': self.fp.tell(),
+            'length': len(payload),
+            'counts': counts,
+        })
+        self.fp.write(LENGTH.pack(len(payload)))
+        self.fp.write(payload)
+
+    def close(self):
+        """Write the index and point the header at it"""
+        index_offset = self.fp.tell()
+        index = json.dumps(self.index, separators=(',', ':')).encode('utf-8')
+        self.fp.write(LENGTH.pack(len(index)))
+        self.fp.write(index)
+
+        self.fp.seek(0)
+        self.fp.write(HEADER.pack(MAGIC, VERSION, self.flags, index_offset))
+        self.fp.seek(0, 2)
+
+
+class FixtureArchive:
+    """
+    Random access reader for a .qfx archive opened in binary mode.
+
+    Only the header and index are read up front; blocks are read on demand.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        magic, version, self.flags, index_offset = HEADER.unpack(_read_exactly(fp, HEADER.size))
+        if magic != MAGIC:
+            raise FixtureFormatError('Not a .qfx fixture archive')
+        if version != VERSION:
+            raise FixtureFormatError(f'Unsupported .qfx version {version}')
+        if index_offset == 0:
+            raise FixtureFormatError('Archive was not closed (no index)')
+
+        fp.seek(index_offset)
+        length, = LENGTH.unpack(_read_exactly(fp, LENGTH.size))
+        self.blocks = json.loads(_read_exactly(fp, length))
+
+    def find(self, category):
+        """Index entries of blocks whose category slug is `category` or whose name contains it"""
+        exact = [block for block in self.blocks if block['slug'] == category]
+        if exact:
+            return exact
+        return [block for block in self.blocks if block['name'] and category.lower() in block['name'].lower()]
+
+    def read_block(self, block):
+        """Decoded tables of one block: label -> {'fields', 'columns'}"""
+        self.fp.seek(block['offset'])
+        length, = LENGTH.unpack(_read_exactly(self.fp, LENGTH.size))
+        payload = _read_exactly(self.fp, length)
+        try:
+            if self.flags & FLAG_ZLIB:
+                payload = zlib.decompress(payload)
+            return json.loads(payload)['tables']
+        except (zlib.error, ValueError, KeyError) as e:
+            raise FixtureFormatError(f'Corrupt block at offset {block["offset"]}: {e}')
+
+    def iter_objects(self, blocks=None):
+        """
+        Yield fixture objects ({"model", "pk", "fields"}) of the given index
+        entries (default: every block), one block in memory at a time.
+        """
+        for block in self.blocks if blocks is None else blocks:
+            for label, table in self.read_block(block).items():
+                names = table['fields'][1:]
+                for row in zip(*table['columns']):
+                    yield {'model': label, 'pk': row[0], 'fields': dict(zip(names, row[1:]))}
@@ -0,0 +1,589 @@
+"""
+Bulk loading of quiz fixtures.
+
+Django's loaddata deserializes and saves fixture objects one at a time,
+which means one or two queries per question and choice. BulkFixtureLoader
+accepts the same fixture objects ({"model", "pk", "fields"}), buffers them
+per model and writes each batch at once: through COPY into a temporary
+table followed by a single upsert on PostgreSQL, and through bulk_create
+with update_conflicts elsewhere. Rows keep their fixture primary keys, so
+sequences are reset once loading finishes.
+
+Fixture files are read with iter_fixture_objects, which decodes one object
+at a time from a bounded buffer, so memory use does not grow with file size.
+Binary .qfx archives (see fixture_format) are read a category block at a
+time; iter_fixture_file picks the reader from the file name.
+
+Generated fixtures take their primary keys from a reserved range above
+FIXTURE_ID_BASE (see FixtureIds). Rows created later by the application or
+the import commands must never land in a block a fixture build may use, so
+on PostgreSQL the loader keeps sequences below that range; on SQLite and
+MySQL, where the next id always follows the highest one, it moves them past
+the end of the range instead. Other databases refuse generated fixtures.
+
+Like loaddata, existing rows with the same primary key are overwritten.
+Unlike loaddata, post_save signals are not sent; the quiz content version
+is bumped once at the end instead. On the bulk_create path auto_now and
+auto_now_add timestamps are set to the load time.
+"""
+import io
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+from .cache import invalidate_quiz_content
+from .fixture_format import BINARY_FIXTURE_SUFFIX, FixtureArchive, FixtureFormatError
+from .models import Category, Quiz, Question, Choice
+
+logger = logging.getLogger(__name__)
+
+# Characters read from a fixture file at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+# Fixture models in dependency order
+FIXTURE_MODELS = {
+    'quizzes.category': Category,
+    'quizzes.quiz': Quiz,
+    'quizzes.question': Question,
+    'quizzes.choice': Choice,
+}
+
+# Generated fixture ids: one block of CATEGORY_ID_BLOCK ids per source category
+# (up to MAX_FIXTURE_CATEGORY_ID) above FIXTURE_ID_BASE, and CHOICE_ID_STRIDE
+# choice ids per question id. Choice ids stay below 2**53, so clients that
+# read ids as JavaScript numbers see them exactly.
+FIXTURE_ID_BASE = 100_000_000
+CATEGORY_ID_BLOCK = 2 ** 32
+MAX_FIXTURE_CATEGORY_ID = 1023
+FIXTURE_ID_END = FIXTURE_ID_BASE + (MAX_FIXTURE_CATEGORY_ID + 1) * CATEGORY_ID_BLOCK
+CHOICE_ID_STRIDE = 8
+
+
+class FixtureError(ValueError):
+    """Raised for fixture objects the bulk loader cannot handle"""
+
+
+def iter_fixture_objects(fp, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yield the objects of a fixture file (a JSON array of objects) one at a time.
+
+    Only the unparsed tail of the file is kept in memory, so a fixture of any
+    size is read with a buffer of roughly chunk_size plus one object.
+
+    Args:
+        fp: Text file object positioned at the start of the fixture
+        chunk_size: Characters to read per refill
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def next_char():
+        # Skip whitespace, refilling as needed; returns '' at end of input
+        nonlocal buffer, position, eof
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return buffer[position:position + 1]
+            buffer, position = '', 0
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+
+    if next_char() != '[':
+        raise FixtureError('Fixture must be a JSON array')
+    position += 1
+
+    if next_char() == ']':
+        return
+
+    while True:
+        if next_char() != '{':
+            raise FixtureError('Expected a fixture object')
+
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError:
+                if eof:
+                    raise FixtureError('Fixture ends inside an object')
+                # Drop consumed text, then read more of the current object
+                buffer, position = buffer[position:], 0
+                chunk = fp.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+
+        position = end
+        yield obj
+
+        separator = next_char()
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise FixtureError(f'Expected "," or "]" after a fixture object, found {separator!r}')
+
+
+def iter_fixture_file(path, category=None):
+    """
+    Yield the objects of a JSON fixture file or a binary .qfx archive.
+
+    Args:
+        path: Fixture file path
+        category: For archives, read only the blocks of this category
+            (exact slug, or part of the name); JSON files are read whole
+    """
+    if not path.endswith(BINARY_FIXTURE_SUFFIX):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from iter_fixture_objects(f)
+        return
+
+    with open(path, 'rb') as f:
+        try:
+            archive = FixtureArchive(f)
+            blocks = archive.find(category) if category else None
+            yield from archive.iter_objects(blocks)
+        except FixtureFormatError as e:
+            raise FixtureError(str(e))
+
+
+def fixture_model(obj):
+    """Model class for a fixture object"""
+    label = obj.get('model', '').lower()
+    try:
+        return FIXTURE_MODELS[label]
+    except KeyError:
+        raise FixtureError(f'Unsupported fixture model: {obj.get("model")}')
+
+
+def row_values(model, obj):
+    """
+    Column values for a fixture object, in the order of the model's concrete fields.
+
+    Missing fields take the model default, as with loaddata.
+    """
+    if obj.get('pk') is None:
+        raise FixtureError(f'{obj.get("model")} fixture without a primary key')
+
+    fields = obj.get('fields', {})
+    values = []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            value = field.to_python(obj['pk'])
+        elif field.name in fields:
+            value = fields[field.name]
+            if field.is_relation:
+                if isinstance(value, (list, tuple)):
+                    raise FixtureError(f'Natural keys are not supported ({model.__name__}.{field.name})')
+                value = None if value is None else field.target_field.to_python(value)
+            else:
+                value = field.to_python(value)
+        else:
+            value = field.get_default()
+        values.append(value)
+    return values
+
+
+class FixtureIds:
+    """
+    Deterministic primary keys for the fixtures generated from one category.
+
+    The quiz takes the first id of the category's block. A question's id is
+    derived from its content hash, so a question keeps its id across builds
+    whatever order the source returns it in and whichever other questions
+    come with it; choice k of a question gets question id * CHOICE_ID_STRIDE
+    + k. Blocks of different categories never overlap.
+
+    Two hashes landing on the same id (unlikely in a 2**32 block) are
+    resolved by taking the next free id, so ask for the questions of a
+    build in content hash order to keep that choice stable too.
+    """
+
+    def __init__(self, category_id):
+        if not 0 <= category_id <= MAX_FIXTURE_CATEGORY_ID:
+            raise FixtureError(f'Category id must be between 0 and {MAX_FIXTURE_CATEGORY_ID}: {category_id}')
+        self.quiz = FIXTURE_ID_BASE + category_id * CATEGORY_ID_BLOCK
+        self.used = set()
+
+    def question(self, content_hash):
+        offset = int(content_hash, 16) % (CATEGORY_ID_BLOCK - 1)
+        while self.quiz + 1 + offset in self.used:
+            offset = (offset + 1) % (CATEGORY_ID_BLOCK - 1)
+        question_id = self.quiz + 1 + offset
+        self.used.add(question_id)
+        return question_id
+
+    def choice(self, question_id, index):
+        if not 0 <= index < CHOICE_ID_STRIDE:
+            raise FixtureError(f'A question has at most {CHOICE_ID_STRIDE} choices')
+        return question_id * CHOICE_ID_STRIDE + index
+
+
+def validate_fixtures(fixtures):
+    """
+    Check generated fixture objects before they are written.
+
+    Returns:
+        list: Problems found (duplicate primary keys, questions repeated
+        within a quiz, references to objects missing from the fixtures);
+        empty when the fixtures are consistent
+    """
+    problems = []
+    pks = {label: set() for label in FIXTURE_MODELS}
+    question_contents = set()
+    for obj in fixtures:
+        label = fixture_model(obj)._meta.label_lower
+        if obj['pk'] in pks[label]:
+            problems.append(f'Duplicate primary key {label} pk={obj["pk"]}')
+        pks[label].add(obj['pk'])
+
+        content_hash = obj['fields'].get('content_hash') if label == 'quizzes.question' else None
+        if content_hash:
+            if (obj['fields']['quiz'], content_hash) in question_contents:
+                problems.append(f'Question pk={obj["pk"]} repeats another question of its quiz')
+            question_contents.add((obj['fields']['quiz'], content_hash))
+
+    references = {
+        'quizzes.question': ('quiz', 'quizzes.quiz'),
+        'quizzes.choice': ('question', 'quizzes.question'),
+    }
+    for obj in fixtures:
+        label = obj['model'].lower()
+        if label in references:
+            field, target = references[label]
+            if obj['fields'][field] not in pks[target]:
+                problems.append(f'{label} pk={obj["pk"]} references missing {target} pk={obj["fields"][field]}')
+    return problems
+
+
+def sorted_fixtures(fixtures):
+    """Fixture objects ordered parents first, then by primary key"""
+    order = {label: position for position, label in enumerate(FIXTURE_MODELS)}
+    return sorted(fixtures, key=lambda obj: (order[obj['model'].lower()], obj['pk']))
+
+
+def prepare_fixture_file(path, category=None):
+    """
+    Parse and validate a fixture file (JSON or .qfx) into rows grouped by model.
+
+    Runs without touching the database, so files can be prepared in worker
+    processes and written afterwards by BulkFixtureLoader.write_rows.
+
+    Returns:
+        dict: Model label -> list of rows in concrete field order
+    """
+    rows = {label: [] for label in FIXTURE_MODELS}
+    for obj in iter_fixture_file(path, category):
+        model = fixture_model(obj)
+        rows[model._meta.label_lower].append(row_values(model, obj))
+    return rows
+
+
+def init_worker():
+    """Process pool initializer: set Django up in spawned worker processes"""
+    import django
+    django.setup()
+
+
+def _pk_index(model):
+    return model._meta.concrete_fields.index(model._meta.pk)
+
+
+def find_pk_collisions(prepared_files):
+    """
+    Primary keys used by different rows across prepared fixture files.
+
+    Identical copies of a row (e.g. a category shared by several files) are
+    not collisions; they are written once.
+
+    Args:
+        prepared_files: Mapping of file name -> prepare_fixture_file() result
+
+    Returns:
+        list: (model label, pk, [file names]) for every conflicting key
+    """
+    seen = {}
+    conflicts = {}
+    for name, rows in prepared_files.items():
+        for label, model_rows in rows.items():
+            pk_index = _pk_index(FIXTURE_MODELS[label])
+            for row in model_rows:
+                key = (label, row[pk_index])
+                first = seen.setdefault(key, (row, name))
+                if first[0] != row:
+                    conflicts.setdefault(key, [first[1]]).append(name)
+
+    return [(label, pk, names) for (label, pk), names in conflicts.items()]
+
+
+def _copy_text(value):
+    """Encode a database value for COPY ... FROM STDIN in text format"""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    text = str(value)
+    return (
+        text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+class BulkFixtureLoader:
+    """
+    Buffer fixture objects and insert them per model in batches.
+
+    Usage:
+        loader = BulkFixtureLoader()
+        for obj in fixture_objects:
+            loader.add(obj)
+        counts = loader.finish()
+    """
+
+    def __init__(self, batch_size=None, using='default', use_copy=None):
+        self.batch_size = batch_size or settings.MAX_IMPORT_BATCH_SIZE
+        self.using = using
+        connection = connections[using]
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql'
+        self.use_copy = use_copy
+        self.buffers = {model: [] for model in FIXTURE_MODELS.values()}
+        self.counts = {model: 0 for model in FIXTURE_MODELS.values()}
+        self.staging_tables = set()
+        self.started_at = time.perf_counter()
+
+    def add(self, obj):
+        """Queue one fixture object, writing its model's batch when full"""
+        model = fixture_model(obj)
+        buffer = self.buffers[model]
+        buffer.append(row_values(model, obj))
+        if len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        """Write buffered rows of `model` (default: all models), parents first"""
+        for buffered_model, buffer in self.buffers.items():
+            if buffer:
+                self.write_rows(buffered_model, buffer)
+                self.buffers[buffered_model] = []
+            if buffered_model is model:
+                break
+
+    def write_rows(self, model, rows):
+        """Write prepared rows (see row_values) of one model right away, in batches"""
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            self._write(model, batch)
+            self.counts[model] += len(batch)
+
+    def close(self):
+        """Drop the staging tables this loader created on its connection"""
+        if not self.staging_tables:
+            return
+        with connections[self.using].cursor() as cursor:
+            for staging in self.staging_tables:
+                cursor.execute(f'DROP TABLE IF EXISTS {staging}')
+        self.staging_tables.clear()
+
+    def finish(self):
+        """
+        Write remaining rows, reset sequences and invalidate cached content.
+
+        Returns:
+            dict: Number of rows written per model
+        """
+        self.flush()
+        self.close()
+        self._reset_sequences()
+        if any(self.counts.values()):
+            invalidate_quiz_content()
+
+        logger.info(f'Bulk loaded {sum(self.counts.values())} fixture rows in {self.elapsed:.2f}s')
+        return dict(self.counts)
+
+    @property
+    def elapsed(self):
+        """Seconds since the loader was created"""
+        return time.perf_counter() - self.started_at
+
+    def _write(self, model, rows):
+        if self.use_copy:
+            self._copy_upsert(model, rows)
+        else:
+            self._bulk_create(model, rows)
+
+    def _bulk_create(self, model, rows):
+        fields = model._meta.concrete_fields
+        objs = [
+            model(**{field.attname: value for field, value in zip(fields, row)})
+            for row in rows
+        ]
+        model._base_manager.using(self.using).bulk_create(
+            objs,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=[model._meta.pk.name],
+            update_fields=[field.name for field in fields if not field.primary_key],
+        )
+
+    def _copy_upsert(self, model, rows):
+        connection = connections[self.using]
+        fields = model._meta.concrete_fields
+        quote = connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        staging = quote(f'{model._meta.db_table}_fixture_load')
+        columns = ', '.join(quote(field.column) for field in fields)
+        updates = ', '.join(
+            f'{quote(field.column)} = EXCLUDED.{quote(field.column)}'
+            for field in fields if not field.primary_key
+        )
+
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(
+                _copy_text(field.get_db_prep_save(value, connection))
+                for field, value in zip(fields, row)
+            ))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        copy_sql = f'COPY {staging} ({columns}) FROM STDIN'
+        with connection.cursor() as cursor:
+            if staging in self.staging_tables:
+                cursor.execute(f'TRUNCATE {staging}')
+            else:
+                cursor.execute(f'CREATE TEMPORARY TABLE {staging} (LIKE {table} INCLUDING DEFAULTS)')
+                self.staging_tables.add(staging)
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, 'copy_expert'):  # psycopg2
+                raw_cursor.copy_expert(copy_sql, buffer)
+            else:  # psycopg 3
+                with raw_cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} '
+                f'ON CONFLICT ({quote(model._meta.pk.column)}) DO UPDATE SET {updates}'
+            )
+
+    def _reset_sequences(self):
+        reset_fixture_sequences([model for model, count in self.counts.items() if count], self.using)
+
+
+def _fixture_id_range(model):
+    """The (start, end) range generated fixture ids of a model may use"""
+    if model is Choice:
+        return FIXTURE_ID_BASE * CHOICE_ID_STRIDE, FIXTURE_ID_END * CHOICE_ID_STRIDE
+    return FIXTURE_ID_BASE, FIXTURE_ID_END
+
+
+def _holds_generated_ids(model, using):
+    start, end = _fixture_id_range(model)
+    return model._base_manager.using(using).filter(pk__gte=start, pk__lt=end).exists()
+
+
+def _sequence_below_fixture_ids_sql(connection, model):
+    # Continue after the highest id outside the generated fixture range
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    pk = quote(model._meta.pk.column)
+    highest = f'(SELECT MAX({pk}) FROM {table} WHERE {pk} < {FIXTURE_ID_BASE})'
+    return (
+        f"SELECT setval(pg_get_serial_sequence('{table}', '{model._meta.pk.column}'), "
+        f"COALESCE({highest}, 1), {highest} IS NOT NULL)"
+    )
+
+
+def _sequence_past_fixture_ids_sql(connection, model):
+    # The next id follows the highest one used on these backends, so continue after the reserved range
+    table = model._meta.db_table
+    _, end = _fixture_id_range(model)
+    if connection.vendor == 'mysql':
+        return f'ALTER TABLE {connection.ops.quote_name(table)} AUTO_INCREMENT = {end}'
+    return f"UPDATE sqlite_sequence SET seq = MAX(seq, {end - 1}) WHERE name = '{table}'"
+
+
+def reset_fixture_sequences(models, using='default'):
+    """
+    Point the id sequences of freshly loaded models away from generated fixture ids.
+
+    PostgreSQL sequences continue below FIXTURE_ID_BASE. SQLite and MySQL
+    always continue after the highest id in a table, so once a table holds
+    generated ids its sequence moves past FIXTURE_ID_END. Other backends
+    cannot be steered either way and refuse tables holding generated ids.
+
+    Raises:
+        FixtureError: Generated ids were loaded on an unsupported backend
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        statements = [_sequence_below_fixture_ids_sql(connection, model) for model in models]
+    else:
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        generated = [model for model in models if _holds_generated_ids(model, using)]
+        if generated and connection.vendor not in ('sqlite', 'mysql'):
+            raise FixtureError(
+                f'Generated fixture ids cannot be kept apart from new rows on {connection.vendor}; '
+                f'load these fixtures on PostgreSQL, MySQL or SQLite'
+            )
+        statements += [_sequence_past_fixture_ids_sql(connection, model) for model in generated]
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def _write_on_own_connection(model, batch_size, rows):
+    # Writer threads get their own connection; commit each chunk and hang up afterwards
+    loader = BulkFixtureLoader(batch_size=batch_size)
+    try:
+        with transaction.atomic():
+            loader.write_rows(model, rows)
+            loader.close()
+    finally:
+        connections.close_all()
+    return len(rows)
+
+
+def write_prepared_fixtures(prepared_files, batch_size=None, db_connections=1):
+    """
+    Write prepared fixture files model by model, parents before children.
+
+    With one connection everything goes through the caller's connection and
+    transaction. With more, each model's rows are split into chunks written
+    by at most db_connections threads, each committing its own chunks; a
+    model starts only once its parent model is fully committed.
+
+    Returns:
+        BulkFixtureLoader: The finished loader, with per-model counts and timing
+    """
+    loader = BulkFixtureLoader(batch_size=batch_size)
+
+    for label, model in FIXTURE_MODELS.items():
+        # Identical rows repeated across files are written once
+        pk_index = _pk_index(model)
+        rows = list({
+            row[pk_index]: row
+            for file_rows in prepared_files.values() for row in file_rows[label]
+        }.values())
+        if db_connections <= 1:
+            loader.write_rows(model, rows)
+            continue
+
+        chunk_size = loader.batch_size * 4
+        chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+        with ThreadPoolExecutor(max_workers=db_connections) as pool:
+            for written in pool.map(partial(_write_on_own_connection, model, loader.batch_size), chunks):
+                loader.counts[model] += written
+
+    loader.finish()
+    return loader
@@ -0,0 +1,114 @@
+"""
+Set-based grading engine for quiz submissions.
+
+The answer key for a quiz is loaded with a single query, the submitted
+answers are graded in memory and all Answer rows are written with one
+bulk_create, so the cost of a submission does not grow with the number
+of questions answered.
+"""
+from dataclasses import dataclass, field
+
+from .models import Question, Answer
+
+
+@dataclass
+class QuestionKey:
+    """Grading data for a single question"""
+    points: int
+    choice_ids: set = field(default_factory=set)
+    correct_choice_ids: set = field(default_factory=set)
+
+
+@dataclass
+class GradingResult:
+    """Outcome of grading a submission"""
+    score: int
+    answers: list
+
+
+def _to_int(value):
+    """Convert a submitted id to int, returning None for missing or malformed values"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_answer_key(quiz):
+    """
+    Load the answer key for a quiz in one query.
+
+    Args:
+        quiz: Quiz model instance
+
+    Returns:
+        dict: Mapping of question id to QuestionKey
+    """
+    rows = Question.objects.filter(quiz=quiz).values_list(
+        'id', 'points', 'choices__id', 'choices__is_correct'
+    )
+
+    answer_key = {}
+    for question_id, points, choice_id, is_correct in rows:
+        key = answer_key.get(question_id)
+        if key is None:
+            key = answer_key[question_id] = QuestionKey(points=points)
+        if choice_id is not None:
+            key.choice_ids.add(choice_id)
+            if is_correct:
+                key.correct_choice_ids.add(choice_id)
+
+    return answer_key
+
+
+def quiz_total_points(answer_key):
+    """Total points available in a quiz, computed from its answer key"""
+    return sum(key.points for key in answer_key.values())
+
+
+def grade_answers(attempt, answers_data, answer_key):
+    """
+    Grade submitted answers in memory without touching the database.
+
+    Answers referencing questions outside the quiz are ignored and choices
+    that do not belong to the answered question are treated as unanswered.
+
+    Args:
+        attempt: QuizAttempt the answers belong to
+        answers_data: List of submitted answer dicts
+        answer_key: Answer key returned by load_answer_key
+
+    Returns:
+        GradingResult: Score and unsaved Answer instances
+    """
+    score = 0
+    answers = []
+
+    for answer_data in answers_data:
+        question_id = _to_int(answer_data.get('question_id'))
+        key = answer_key.get(question_id)
+        if key is None:
+            continue
+
+        selected_choice_id = _to_int(answer_data.get('selected_choice_id'))
+        if selected_choice_id not in key.choice_ids:
+            selected_choice_id = None
+
+        is_correct = selected_choice_id in key.correct_choice_ids
+        if is_correct:
+            score += key.points
+
+        answers.append(Answer(
+            attempt=attempt,
+            question_id=question_id,
+            selected_choice_id=selected_choice_id,
+            text_answer=answer_data.get('text_answer', ''),
+            is_correct=is_correct
+        ))
+
+    return GradingResult(score=score, answers=answers)
+
+
+def save_graded_answers(result):
+    """Persist all graded answers with a single bulk insert"""
+    return Answer.objects.bulk_create(result.answers)
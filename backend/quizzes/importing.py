@@ -0,0 +1,159 @@
+"""
+Bulk insertion of imported questions and choices.
+
+Import commands stage unsaved Question and Choice instances and write them
+with one INSERT per batch of questions and one per batch of choices,
+instead of one INSERT per row.
+
+Every staged question gets a content hash (Question.content_hash_for).
+Before a batch is inserted, the hashes already present in its quizzes are
+looked up with one query, and those questions are skipped, so re-running
+an import does not append duplicates.
+"""
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .cache import invalidate_quiz_content
+from .models import Question, Choice
+
+# Points awarded per question difficulty when an import does not provide them
+DIFFICULTY_POINTS = {'easy': 1, 'medium': 2, 'hard': 4}
+
+
+def points_for_difficulty(difficulty):
+    """Default points for a difficulty, treating unknown values as medium"""
+    return DIFFICULTY_POINTS.get(difficulty, DIFFICULTY_POINTS['medium'])
+
+
+@dataclass
+class ImportStats:
+    questions: int = 0
+    choices: int = 0
+    seconds: float = 0.0
+    duplicates: int = 0
+
+    def __add__(self, other):
+        return ImportStats(
+            self.questions + other.questions,
+            self.choices + other.choices,
+            self.seconds + other.seconds,
+            self.duplicates + other.duplicates
+        )
+
+    @property
+    def questions_per_second(self):
+        return self.questions / self.seconds if self.seconds > 0 else float(self.questions)
+
+    def describe(self):
+        description = (
+            f'{self.questions} questions and {self.choices} choices in {self.seconds:.2f}s '
+            f'({self.questions_per_second:,.0f} questions/sec)'
+        )
+        if self.duplicates:
+            description += f', skipped {self.duplicates} duplicates'
+        return description
+
+
+class QuestionImportBatch:
+    """
+    Stage questions with their choices and insert them in bulk.
+
+    Usage:
+        batch = QuestionImportBatch()
+        batch.add(Question(quiz=quiz, ...), [Choice(choice_text=..., is_correct=...), ...])
+        stats = batch.save()
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.MAX_IMPORT_BATCH_SIZE
+        self.staged = []
+
+    def __len__(self):
+        return len(self.staged)
+
+    def add(self, question, choices):
+        """Stage an unsaved question and its unsaved choices"""
+        choices = list(choices)
+        if not question.content_hash:
+            question.content_hash = Question.content_hash_for(
+                question.question_text, [choice.choice_text for choice in choices]
+            )
+        self.staged.append((question, choices))
+
+    def save(self):
+        """
+        Insert everything staged, batch by batch, in one transaction.
+
+        Questions whose content is already in their quiz, in the database or
+        earlier in this import, are skipped.
+
+        Returns:
+            ImportStats: Rows inserted, duplicates skipped and elapsed time
+        """
+        started_at = time.perf_counter()
+        stats = ImportStats()
+        seen = set()
+
+        with transaction.atomic():
+            for start in range(0, len(self.staged), self.batch_size):
+                staged = self.staged[start:start + self.batch_size]
+                chunk = self._new_questions(staged, seen)
+                stats.duplicates += len(staged) - len(chunk)
+                if not chunk:
+                    continue
+                questions = self._insert_questions([question for question, _ in chunk])
+
+                choices = []
+                for question, (_, question_choices) in zip(questions, chunk):
+                    for choice in question_choices:
+                        choice.question = question
+                        choices.append(choice)
+                Choice.objects.bulk_create(choices, batch_size=self.batch_size)
+
+                stats.questions += len(questions)
+                stats.choices += len(choices)
+
+        self.staged = []
+        if stats.questions:
+            invalidate_quiz_content()
+
+        stats.seconds = time.perf_counter() - started_at
+        return stats
+
+    def _new_questions(self, staged, seen):
+        """
+        Drop staged questions whose (quiz, content hash) already exists.
+
+        One query checks the whole batch against the database; `seen` holds
+        the keys accepted so far, to catch duplicates within the import.
+        """
+        quiz_ids = {question.quiz_id for question, _ in staged}
+        hashes = {question.content_hash for question, _ in staged}
+        seen.update(
+            Question.objects.filter(quiz_id__in=quiz_ids, content_hash__in=hashes)
+            .values_list('quiz_id', 'content_hash')
+        )
+
+        new = []
+        for question, choices in staged:
+            key = (question.quiz_id, question.content_hash)
+            if key not in seen:
+                seen.add(key)
+                new.append((question, choices))
+        return new
+
+    def _insert_questions(self, questions):
+        if connection.features.can_return_rows_from_bulk_insert:
+            return Question.objects.bulk_create(questions)
+
+        # Without RETURNING, read back the ids this insert allocated. Assumes no
+        # other process inserts questions meanwhile, as during an import command
+        last_id = Question.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        Question.objects.bulk_create(questions)
+        new_ids = Question.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)
+        for question, question_id in zip(questions, new_ids):
+            question.id = question_id
+        return questions
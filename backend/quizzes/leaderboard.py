@@ -0,0 +1,497 @@
+"""
+Live leaderboard index.
+
+Keeps ranked users sorted by (total_score, average_score_percentage) so that
+top-K, rank-of-user and "players around me" queries run in O(log N + K)
+without reading the stored UserProfile.rank column.
+
+Three backends are available, selected with settings.LEADERBOARD_INDEX_BACKEND:
+
+- 'sortedset': a Redis sorted set shared by all processes (the default when
+  settings.LEADERBOARD_REDIS_URL is set). Without a URL, the LocalSortedSet
+  stand-in is used instead, which implements the same commands in-process.
+- 'database': answers every query from UserProfile through the ranking
+  index (the default without Redis). Writes are no-ops, as the profile rows
+  are the index.
+- 'memory': a per-process sorted list. Each process loads it from the
+  database on first use and keeps it current from its own submissions;
+  the scheduled leaderboard job resynchronises it. Only consistent when a
+  single process serves requests.
+
+Backends that are not shared between processes report shared = False;
+views then take a user's rank from the database instead.
+
+Ranks follow RANK() semantics: users with equal keys share a position.
+"""
+import bisect
+import threading
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+
+# Averages are percentages with two decimals, so they fit below this factor
+# when folded into a single sorted-set score.
+AVERAGE_SCALE = 100
+SCORE_FACTOR = 100 * AVERAGE_SCALE + 1
+
+
+@dataclass
+class LeaderboardEntry:
+    """A ranked user as stored in the index"""
+    user_id: int
+    total_score: int
+    average_score_percentage: float
+    rank: int
+
+
+def encode_score(total_score, average):
+    """Fold (total_score, average) into one number that preserves their ordering"""
+    return total_score * SCORE_FACTOR + int(round(average * AVERAGE_SCALE))
+
+
+def decode_score(score):
+    """Inverse of encode_score"""
+    total_score, scaled_average = divmod(int(score), SCORE_FACTOR)
+    return total_score, scaled_average / AVERAGE_SCALE
+
+
+class InProcessBackend:
+    """Sorted list of encoded scores kept in order with bisect"""
+
+    shared = False
+
+    def __init__(self):
+        self._keys = []  # (-score, user_id), ascending means best first
+        self._scores = {}
+
+    def upsert(self, user_id, score):
+        self.remove(user_id)
+        bisect.insort(self._keys, (-score, user_id))
+        self._scores[user_id] = score
+
+    def remove(self, user_id):
+        score = self._scores.pop(user_id, None)
+        if score is not None:
+            index = bisect.bisect_left(self._keys, (-score, user_id))
+            del self._keys[index]
+
+    def replace(self, rows):
+        """Swap in the (user_id, score) rows as the whole index"""
+        scores = dict(rows)
+        self._keys, self._scores = sorted((-score, user_id) for user_id, score in scores.items()), scores
+
+    def score_of(self, user_id):
+        return self._scores.get(user_id)
+
+    def position_of(self, user_id):
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._keys, (-score, user_id))
+
+    def count_above(self, score):
+        # Keys are (-score, user_id); every strictly higher score sorts first
+        return bisect.bisect_left(self._keys, (-score,))
+
+    def slice(self, start, stop):
+        return [(user_id, -neg_score) for neg_score, user_id in self._keys[start:stop]]
+
+    def count(self):
+        return len(self._keys)
+
+
+class LocalSortedSet:
+    """
+    In-process stand-in for a Redis sorted set.
+
+    Implements the subset of redis-py's sorted-set commands used by
+    SortedSetBackend, with the same argument conventions, so the backend
+    can run without a Redis server.
+    """
+
+    def __init__(self):
+        self._sets = {}
+
+    def _get(self, name):
+        return self._sets.setdefault(name, {'entries': [], 'scores': {}})
+
+    def zadd(self, name, mapping):
+        zset = self._get(name)
+        added = 0
+        for member, score in mapping.items():
+            old_score = zset['scores'].get(member)
+            if old_score is not None:
+                del zset['entries'][bisect.bisect_left(zset['entries'], (old_score, member))]
+            else:
+                added += 1
+            bisect.insort(zset['entries'], (score, member))
+            zset['scores'][member] = score
+        return added
+
+    def zrem(self, name, *members):
+        zset = self._get(name)
+        removed = 0
+        for member in members:
+            score = zset['scores'].pop(member, None)
+            if score is not None:
+                del zset['entries'][bisect.bisect_left(zset['entries'], (score, member))]
+                removed += 1
+        return removed
+
+    def zscore(self, name, member):
+        return self._get(name)['scores'].get(member)
+
+    def zcard(self, name):
+        return len(self._get(name)['entries'])
+
+    def zcount(self, name, low, high):
+        entries = self._get(name)['entries']
+        start = self._bound(entries, low, upper=False)
+        stop = self._bound(entries, high, upper=True)
+        return max(0, stop - start)
+
+    def zrevrank(self, name, member):
+        zset = self._get(name)
+        score = zset['scores'].get(member)
+        if score is None:
+            return None
+        return len(zset['entries']) - 1 - bisect.bisect_left(zset['entries'], (score, member))
+
+    def zrevrange(self, name, start, end, withscores=False):
+        entries = self._get(name)['entries']
+        size = len(entries)
+        if start < 0:
+            start = max(size + start, 0)
+        if end < 0:
+            end = size + end
+        ordered = entries[::-1][start:end + 1]
+        if withscores:
+            return [(member, score) for score, member in ordered]
+        return [member for score, member in ordered]
+
+    def delete(self, *names):
+        return sum(1 for name in names if self._sets.pop(name, None) is not None)
+
+    def rename(self, src, dst):
+        self._sets[dst] = self._sets.pop(src)
+        return True
+
+    def pipeline(self):
+        return _LocalPipeline(self)
+
+    @staticmethod
+    def _bound(entries, value, upper):
+        """Translate a Redis range bound ('-inf', '+inf', '(x' or x) into a list index"""
+        if value in ('-inf', float('-inf')):
+            return 0
+        if value in ('+inf', float('inf')):
+            return len(entries)
+        exclusive = isinstance(value, str) and value.startswith('(')
+        number = float(value[1:] if exclusive else value)
+        if upper:
+            # Entries with score <= number (or < number when exclusive)
+            if exclusive:
+                return bisect.bisect_left(entries, (number,))
+            return bisect.bisect_right(entries, (number, _MAX_MEMBER))
+        if exclusive:
+            return bisect.bisect_right(entries, (number, _MAX_MEMBER))
+        return bisect.bisect_left(entries, (number,))
+
+
+class _MaxMember:
+    """Sorts after every member, used to build inclusive upper bounds"""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_MAX_MEMBER = _MaxMember()
+
+
+class _LocalPipeline:
+    """Queues LocalSortedSet commands until execute(), like a redis-py pipeline"""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.client, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+class SortedSetBackend:
+    """Index stored in a Redis sorted set (or a LocalSortedSet stand-in)"""
+
+    # Members per ZADD when rebuilding, to keep each command a reasonable size
+    REPLACE_CHUNK_SIZE = 10000
+
+    def __init__(self, client, key='quizzes:leaderboard', shared=True):
+        self.client = client
+        self.key = key
+        self.shared = shared
+
+    def upsert(self, user_id, score):
+        self.client.zadd(self.key, {str(user_id): score})
+
+    def remove(self, user_id):
+        self.client.zrem(self.key, str(user_id))
+
+    def replace(self, rows):
+        """
+        Build the new set under a temporary key and RENAME it over the live
+        one, all in one pipeline, so readers never see a partial board
+        """
+        temporary_key = f'{self.key}:rebuild:{uuid.uuid4().hex}'
+        pipeline = self.client.pipeline()
+        chunk = {}
+        added = 0
+        for user_id, score in rows:
+            chunk[str(user_id)] = score
+            if len(chunk) == self.REPLACE_CHUNK_SIZE:
+                pipeline.zadd(temporary_key, chunk)
+                added += len(chunk)
+                chunk = {}
+        if chunk:
+            pipeline.zadd(temporary_key, chunk)
+            added += len(chunk)
+
+        # RENAME fails on a missing key, so an empty board just drops the live one
+        if added:
+            pipeline.rename(temporary_key, self.key)
+        else:
+            pipeline.delete(self.key)
+        pipeline.execute()
+
+    def score_of(self, user_id):
+        score = self.client.zscore(self.key, str(user_id))
+        return None if score is None else int(score)
+
+    def position_of(self, user_id):
+        return self.client.zrevrank(self.key, str(user_id))
+
+    def count_above(self, score):
+        return self.client.zcount(self.key, f'({score}', '+inf')
+
+    def slice(self, start, stop):
+        if stop <= start:
+            return []
+        members = self.client.zrevrange(self.key, start, stop - 1, withscores=True)
+        return [(int(member), int(score)) for member, score in members]
+
+    def count(self):
+        return self.client.zcard(self.key)
+
+
+class DatabaseBackend:
+    """
+    Reads the board from UserProfile rows through the ranking index.
+
+    Profiles are saved before the index is told about them, so writes are
+    no-ops. Ties are ordered by user id.
+    """
+
+    shared = True
+
+    def _ranked(self):
+        from .models import UserProfile
+
+        return UserProfile.objects.filter(total_quizzes_completed__gt=0)
+
+    def upsert(self, user_id, score):
+        pass
+
+    def remove(self, user_id):
+        pass
+
+    def replace(self, rows):
+        pass
+
+    @staticmethod
+    def _above(score):
+        total_score, average = decode_score(score)
+        return Q(total_score__gt=total_score) | Q(total_score=total_score, average_score_percentage__gt=average)
+
+    def score_of(self, user_id):
+        row = self._ranked().filter(user_id=user_id).values_list('total_score', 'average_score_percentage').first()
+        return None if row is None else encode_score(*row)
+
+    def position_of(self, user_id):
+        score = self.score_of(user_id)
+        if score is None:
+            return None
+        total_score, average = decode_score(score)
+        return self._ranked().filter(
+            self._above(score) |
+            Q(total_score=total_score, average_score_percentage=average, user_id__lt=user_id)
+        ).count()
+
+    def count_above(self, score):
+        return self._ranked().filter(self._above(score)).count()
+
+    def slice(self, start, stop):
+        if stop <= start:
+            return []
+        rows = self._ranked().order_by('-total_score', '-average_score_percentage', 'user_id').values_list(
+            'user_id', 'total_score', 'average_score_percentage'
+        )[start:stop]
+        return [(user_id, encode_score(total_score, average)) for user_id, total_score, average in rows]
+
+    def count(self):
+        return self._ranked().count()
+
+
+class LeaderboardIndex:
+    """Rank queries over a leaderboard backend"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.RLock()
+
+    @property
+    def shared(self):
+        """Whether every process reads the same index"""
+        return self.backend.shared
+
+    def update(self, user_id, total_score, average, total_quizzes_completed=1):
+        """Insert or move a user; users without completed quizzes are unranked"""
+        with self.lock:
+            if total_quizzes_completed > 0:
+                self.backend.upsert(user_id, encode_score(total_score, average))
+            else:
+                self.backend.remove(user_id)
+
+    def update_profile(self, profile):
+        """Sync a UserProfile's current statistics into the index"""
+        self.update(
+            profile.user_id,
+            profile.total_score,
+            profile.average_score_percentage,
+            profile.total_quizzes_completed
+        )
+
+    def remove(self, user_id):
+        with self.lock:
+            self.backend.remove(user_id)
+
+    def rebuild(self, rows):
+        """Replace the index contents with (user_id, total_score, average) rows"""
+        with self.lock:
+            self.backend.replace(
+                (user_id, encode_score(total_score, average)) for user_id, total_score, average in rows
+            )
+
+    def count(self):
+        return self.backend.count()
+
+    def rank_of(self, user_id):
+        """Live rank of a user, or 0 when the user is unranked"""
+        with self.lock:
+            score = self.backend.score_of(user_id)
+            if score is None:
+                return 0
+            return self.backend.count_above(score) + 1
+
+    def top(self, limit):
+        """The best `limit` ranked users"""
+        return self.range(0, limit)
+
+    def around(self, user_id, radius=5):
+        """Users within `radius` positions above and below the given user"""
+        with self.lock:
+            position = self.backend.position_of(user_id)
+            if position is None:
+                return []
+            start = max(position - radius, 0)
+            return self.range(start, position + radius + 1)
+
+    def range(self, start, stop):
+        """Entries for positions [start, stop) with their RANK() values"""
+        with self.lock:
+            rows = self.backend.slice(start, stop)
+            entries = []
+            previous_score = None
+            rank = 0
+            for offset, (user_id, score) in enumerate(rows):
+                if offset == 0:
+                    rank = self.backend.count_above(score) + 1
+                elif score != previous_score:
+                    rank = start + offset + 1
+                previous_score = score
+
+                total_score, average = decode_score(score)
+                entries.append(LeaderboardEntry(user_id, total_score, average, rank))
+            return entries
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def _create_backend():
+    backend_name = getattr(settings, 'LEADERBOARD_INDEX_BACKEND', 'database')
+
+    if backend_name == 'database':
+        return DatabaseBackend()
+
+    if backend_name == 'memory':
+        return InProcessBackend()
+
+    if backend_name == 'sortedset':
+        redis_url = getattr(settings, 'LEADERBOARD_REDIS_URL', '')
+        if not redis_url:
+            return SortedSetBackend(LocalSortedSet(), shared=False)
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured(
+                'LEADERBOARD_REDIS_URL is set but the redis package is not installed'
+            )
+        return SortedSetBackend(redis.Redis.from_url(redis_url, decode_responses=True))
+
+    raise ImproperlyConfigured(f'Unknown LEADERBOARD_INDEX_BACKEND: {backend_name}')
+
+
+def rebuild_leaderboard_index():
+    """Reload the index from the stored UserProfile statistics"""
+    from .models import UserProfile
+
+    global _index, _index_loaded
+    with _index_lock:
+        if _index is None:
+            _index = LeaderboardIndex(_create_backend())
+
+        rows = UserProfile.objects.filter(
+            total_quizzes_completed__gt=0
+        ).values_list('user_id', 'total_score', 'average_score_percentage').iterator()
+        _index.rebuild(rows)
+        _index_loaded = True
+        return _index
+
+
+def get_leaderboard_index():
+    """Return the process-wide leaderboard index, loading it on first use"""
+    if _index_loaded:
+        return _index
+    return rebuild_leaderboard_index()
+
+
+def reset_leaderboard_index():
+    """Drop the process-wide index so the next access reloads it"""
+    global _index, _index_loaded
+    with _index_lock:
+        _index = None
+        _index_loaded = False
@@ -0,0 +1,138 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+import random
+import time
+from quizzes.models import Quiz, Question, Choice, QuizAttempt, Answer
+from quizzes.grading import load_answer_key, grade_answers, save_graded_answers
+
+
+class _Rollback(Exception):
+    """Raised to discard the benchmark data once measurements are taken"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the set-based grading engine against per-answer ORM grading'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--questions',
+            type=int,
+            nargs='+',
+            default=[10, 50, 200],
+            help='Question counts to benchmark (default: 10 50 200)'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Number of submissions graded per question count (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'questions':>10} | {'path':<10} | {'queries':>8} | {'avg ms':>9}"
+        )
+        self.stdout.write('-' * 46)
+
+        # Everything runs inside a transaction that is rolled back at the end
+        try:
+            with transaction.atomic():
+                for question_count in options['questions']:
+                    self._benchmark(question_count, options['runs'])
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _benchmark(self, question_count, runs):
+        """Benchmark both grading paths for a quiz of the given size"""
+        quiz, answers_data = self._create_quiz(question_count)
+
+        for label, grade in [('legacy', self._grade_legacy), ('engine', self._grade_engine)]:
+            elapsed = 0.0
+            queries = 0
+
+            for run in range(runs):
+                user = User.objects.create(username=f'bench_{label}_{question_count}_{run}')
+                attempt = QuizAttempt.objects.create(user=user, quiz=quiz)
+
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    grade(quiz, attempt, answers_data)
+                    elapsed += time.perf_counter() - start
+                queries += len(context.captured_queries)
+
+            self.stdout.write(
+                f'{question_count:>10} | {label:<10} | {queries // runs:>8} | '
+                f'{elapsed / runs * 1000:>9.2f}'
+            )
+
+    def _create_quiz(self, question_count):
+        """Create a throwaway quiz and a fully answered submission payload"""
+        quiz = Quiz.objects.create(title=f'Grading benchmark ({question_count} questions)')
+        Question.objects.bulk_create([
+            Question(quiz=quiz, question_text=f'Question {i + 1}', order=i + 1)
+            for i in range(question_count)
+        ])
+
+        # Re-read ids in case the backend cannot return them from bulk inserts
+        question_ids = list(quiz.questions.values_list('id', flat=True))
+        Choice.objects.bulk_create([
+            Choice(question_id=question_id, choice_text=f'Choice {j + 1}', is_correct=(j == 0))
+            for question_id in question_ids
+            for j in range(4)
+        ])
+
+        choices_by_question = {}
+        for choice_id, question_id in Choice.objects.filter(
+            question__quiz=quiz
+        ).values_list('id', 'question_id'):
+            choices_by_question.setdefault(question_id, []).append(choice_id)
+
+        answers_data = [
+            {
+                'question_id': str(question_id),
+                'selected_choice_id': str(random.choice(choice_ids)),
+            }
+            for question_id, choice_ids in choices_by_question.items()
+        ]
+        return quiz, answers_data
+
+    def _grade_legacy(self, quiz, attempt, answers_data):
+        """Per-answer grading as previously done in submit_quiz"""
+        score = 0
+        for answer_data in answers_data:
+            try:
+                question = Question.objects.get(id=answer_data.get('question_id'), quiz=quiz)
+            except Question.DoesNotExist:
+                continue
+
+            is_correct = False
+            selected_choice = None
+            selected_choice_id = answer_data.get('selected_choice_id')
+            if selected_choice_id:
+                try:
+                    selected_choice = Choice.objects.get(id=selected_choice_id, question=question)
+                    is_correct = selected_choice.is_correct
+                except Choice.DoesNotExist:
+                    pass
+
+            if is_correct:
+                score += question.points
+
+            Answer.objects.create(
+                attempt=attempt,
+                question=question,
+                selected_choice=selected_choice,
+                text_answer=answer_data.get('text_answer', ''),
+                is_correct=is_correct
+            )
+        return score
+
+    def _grade_engine(self, quiz, attempt, answers_data):
+        """Set-based grading used by submit_quiz"""
+        answer_key = load_answer_key(quiz)
+        result = grade_answers(attempt, answers_data, answer_key)
+        save_graded_answers(result)
+        return result.score
@@ -1,18 +1,24 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.core import serializers
 from django.conf import settings
-import requests
-import time
 import html
 import json
 import os
-import uuid
+import random
 from datetime import datetime
 from django.utils import timezone
+from quizzes.fixture_loader import FixtureIds, validate_fixtures, sorted_fixtures
+from quizzes.importing import points_for_difficulty
+from quizzes.models import Question
+from quizzes.opentdb import OpenTDBClient, OpenTDBError
 
 
 class Command(BaseCommand):
-    help = 'Create quiz fixtures from OpenTDB (Open Trivia Database) without importing to database'
+    help = (
+        'Create quiz fixtures from OpenTDB (Open Trivia Database) without importing to database. '
+        'Ids come from a reserved range per category and question content, so rebuilt fixtures '
+        'reload over earlier ones; load them with load_quiz_fixtures on PostgreSQL, MySQL or SQLite.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -24,7 +30,7 @@ class Command(BaseCommand):
             '--amount',
             type=int,
             default=10,
-            help='Number of questions per category (default: 10)'
+            help='Number of questions per category (default: 10, more than 50 is paged)'
         )
         parser.add_argument(
             '--difficulty',
@@ -52,43 +58,47 @@ class Command(BaseCommand):
             action='store_true',
             help='Create separate files per category'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.OPENTDB_MAX_WORKERS,
+            help='Categories fetched concurrently with --all (requests stay rate limited)'
+        )
 
     def handle(self, *args, **options):
-        if options['list_categories']:
-            self.list_categories()
-        elif options['all']:
-            self.create_all_category_fixtures(
-                options['amount'],
-                options['output_dir'],
-                options['split_files']
-            )
-        elif options['category_id']:
-            self.create_category_fixtures(
-                options['category_id'],
-                options['amount'],
-                options['difficulty'],
-                options['output_dir']
-            )
-        else:
-            raise CommandError('Please specify --list-categories, --category-id, or --all')
+        # One timestamp per build, so regenerating from the same data changes nothing else
+        self.built_at = timezone.now().isoformat()
+
+        with OpenTDBClient() as self.client:
+            if options['list_categories']:
+                self.list_categories()
+            elif options['all']:
+                self.create_all_category_fixtures(
+                    options['amount'],
+                    options['output_dir'],
+                    options['split_files'],
+                    options['workers']
+                )
+            elif options['category_id']:
+                self.create_category_fixtures(
+                    options['category_id'],
+                    options['amount'],
+                    options['difficulty'],
+                    options['output_dir']
+                )
+            else:
+                raise CommandError('Please specify --list-categories, --category-id, or --all')
 
     def list_categories(self):
         """List all available categories from OpenTDB"""
         self.stdout.write("Fetching categories from OpenTDB...")
+        categories = self.get_categories()
 
-        try:
-            response = requests.get("https://opentdb.com/api_category.php")
-            response.raise_for_status()
-            categories = response.json().get('trivia_categories', [])
-
-            self.stdout.write(f"\nFound {len(categories)} categories:")
-            self.stdout.write("-" * 50)
-            for category in categories:
-                self.stdout.write(f"ID: {category['id']:2d} | {category['name']}")
-            self.stdout.write("-" * 50)
-
-        except requests.RequestException as e:
-            raise CommandError(f"Error fetching categories: {e}")
+        self.stdout.write(f"\nFound {len(categories)} categories:")
+        self.stdout.write("-" * 50)
+        for category in categories:
+            self.stdout.write(f"ID: {category['id']:2d} | {category['name']}")
+        self.stdout.write("-" * 50)
 
     def create_category_fixtures(self, category_id, amount, difficulty, output_dir):
         """Create fixtures for a specific category"""
@@ -110,7 +120,7 @@ class Command(BaseCommand):
             return
 
         # Create fixtures
-        fixtures = self.create_quiz_fixtures(category_name, questions_data)
+        fixtures = self.create_quiz_fixtures(category_id, category_name, questions_data)
 
         # Save to file
         self.save_fixtures(fixtures, output_dir, f"{self.sanitize_filename(category_name)}_fixtures.json")
@@ -121,8 +131,8 @@ class Command(BaseCommand):
             )
         )
 
-    def create_all_category_fixtures(self, amount_per_category, output_dir, split_files):
-        """Create fixtures from all categories"""
+    def create_all_category_fixtures(self, amount_per_category, output_dir, split_files, workers):
+        """Create fixtures from all categories, fetching several at a time"""
         categories = self.get_categories()
         self.stdout.write(f"Creating fixtures: {amount_per_category} questions per category...")
 
@@ -133,13 +143,19 @@ class Command(BaseCommand):
         total_questions = 0
         successful_categories = 0
 
-        for i, category in enumerate(categories, 1):
-            self.stdout.write(f"[{i}/{len(categories)}] Processing: {category['name']}")
+        fetched = self.client.fetch_categories(categories, amount_per_category, max_workers=workers)
+        for i, (category, questions_data, error) in enumerate(fetched, 1):
+            self.stdout.write(f"[{i}/{len(categories)}] Fetched: {category['name']}")
+
+            if error:
+                self.stdout.write(
+                    self.style.WARNING(f"Failed to process {category['name']}: {error}")
+                )
+                continue
 
             try:
-                questions_data = self.fetch_questions(category['id'], amount_per_category)
                 if questions_data:
-                    fixtures = self.create_quiz_fixtures(category['name'], questions_data)
+                    fixtures = self.create_quiz_fixtures(category['id'], category['name'], questions_data)
 
                     if split_files:
                         # Save individual category file
@@ -153,9 +169,6 @@ class Command(BaseCommand):
                     total_questions += len(questions_data)
                     successful_categories += 1
 
-                # Rate limiting
-                time.sleep(1)
-
             except Exception as e:
                 self.stdout.write(
                     self.style.WARNING(f"Failed to process {category['name']}: {e}")
@@ -177,46 +190,28 @@ class Command(BaseCommand):
     def get_categories(self):
         """Fetch categories from OpenTDB"""
         try:
-            response = requests.get("https://opentdb.com/api_category.php")
-            response.raise_for_status()
-            return response.json().get('trivia_categories', [])
-        except requests.RequestException as e:
+            return self.client.categories()
+        except OpenTDBError as e:
             raise CommandError(f"Error fetching categories: {e}")
 
     def fetch_questions(self, category_id, amount, difficulty=None):
         """Fetch questions for a category"""
-        params = {
-            'amount': amount,
-            'category': category_id,
-            'type': 'multiple'
-        }
-
-        if difficulty:
-            params['difficulty'] = difficulty
-
         try:
-            response = requests.get("https://opentdb.com/api.php", params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            if data.get('response_code') != 0:
-                self.stdout.write(
-                    self.style.WARNING(f"OpenTDB API error code: {data.get('response_code')}")
-                )
-                return []
-
-            return data.get('results', [])
-
-        except requests.RequestException as e:
+            return self.client.fetch_questions(category_id, amount, difficulty)
+        except OpenTDBError as e:
             self.stdout.write(self.style.WARNING(f"Error fetching questions: {e}"))
             return []
 
-    def create_quiz_fixtures(self, category_name, questions_data):
-        """Create fixture objects for quiz and questions"""
+    def create_quiz_fixtures(self, category_id, category_name, questions_data):
+        """Create fixture objects for quiz and questions, with ids from the category's block
+
+        Question ids come from the content hash, so rebuilding a category keeps every question
+        that is still there on its old id and reloading the new build updates it in place.
+        """
         fixtures = []
 
-        # Generate unique IDs
-        quiz_id = self.generate_fixture_id()
+        ids = FixtureIds(category_id)
+        quiz_id = ids.quiz
         quiz_title = f"{category_name} - Quiz"
         quiz_description = f"Quiz containing {len(questions_data)} questions from {category_name}"
 
@@ -227,85 +222,95 @@ class Command(BaseCommand):
             "fields": {
                 "title": quiz_title,
                 "description": quiz_description,
-                "created_at": timezone.now().isoformat(),
-                "updated_at": timezone.now().isoformat(),
+                "created_at": self.built_at,
+                "updated_at": self.built_at,
                 "is_active": True,
                 "is_ai_generated": False
             }
         }
         fixtures.append(quiz_fixture)
 
-        # Create question and choice fixtures
+        # Hash every question first: ids and order follow the content hash, so a question keeps
+        # its id whatever order OpenTDB returns it in
+        hashed = {}
         for i, q_data in enumerate(questions_data):
             try:
-                # Determine points based on difficulty
-                difficulty = q_data.get('difficulty', 'medium')
-                if difficulty == 'easy':
-                    points = 1
-                elif difficulty == 'medium':
-                    points = 2
-                elif difficulty == 'hard':
-                    points = 4
-                else:
-                    points = 2  # Default to medium
-
-                # Create question fixture
-                question_id = self.generate_fixture_id()
-                question_fixture = {
-                    "model": "quizzes.question",
-                    "pk": question_id,
-                    "fields": {
-                        "quiz": quiz_id,
-                        "question_text": html.unescape(q_data['question']),
-                        "question_type": "multiple_choice",
-                        "difficulty": difficulty,
-                        "points": points,
-                        "order": i + 1
-                    }
-                }
-                fixtures.append(question_fixture)
-
-                # Create choice fixtures
+                question_text = html.unescape(q_data['question'])
                 all_answers = [q_data['correct_answer']] + q_data['incorrect_answers']
-
-                # Shuffle answers for randomization
-                import random
-                random.shuffle(all_answers)
-
-                for answer in all_answers:
-                    choice_fixture = {
-                        "model": "quizzes.choice",
-                        "pk": self.generate_fixture_id(),
-                        "fields": {
-                            "question": question_id,
-                            "choice_text": html.unescape(answer),
-                            "is_correct": (answer == q_data['correct_answer'])
-                        }
-                    }
-                    fixtures.append(choice_fixture)
-
+                content_hash = Question.content_hash_for(
+                    question_text, [html.unescape(answer) for answer in all_answers]
+                )
             except Exception as e:
                 self.stdout.write(
                     self.style.WARNING(f"Error processing question {i + 1}: {e}")
                 )
+                continue
+            if content_hash in hashed:
+                self.stdout.write(
+                    self.style.WARNING(f"Skipping question {i + 1}: it repeats an earlier question")
+                )
+                continue
+            hashed[content_hash] = (q_data, question_text, all_answers)
+
+        # Create question and choice fixtures
+        for order, content_hash in enumerate(sorted(hashed), 1):
+            q_data, question_text, all_answers = hashed[content_hash]
+            difficulty = q_data.get('difficulty', 'medium')
+
+            # Create question fixture
+            question_id = ids.question(content_hash)
+            question_fixture = {
+                "model": "quizzes.question",
+                "pk": question_id,
+                "fields": {
+                    "quiz": quiz_id,
+                    "question_text": question_text,
+                    "question_type": "multiple_choice",
+                    "difficulty": difficulty,
+                    "points": points_for_difficulty(difficulty),
+                    "order": order,
+                    "content_hash": content_hash
+                }
+            }
+
+            # Shuffle answers, the same way on every build of this question
+            random.Random(content_hash).shuffle(all_answers)
+
+            choice_fixtures = []
+            for k, answer in enumerate(all_answers):
+                choice_fixture = {
+                    "model": "quizzes.choice",
+                    "pk": ids.choice(question_id, k),
+                    "fields": {
+                        "question": question_id,
+                        "choice_text": html.unescape(answer),
+                        "is_correct": (answer == q_data['correct_answer'])
+                    }
+                }
+                choice_fixtures.append(choice_fixture)
+
+            fixtures.append(question_fixture)
+            fixtures.extend(choice_fixtures)
 
         return fixtures
 
     def save_fixtures(self, fixtures, output_dir, filename):
-        """Save fixtures to JSON file"""
+        """Validate fixtures and save them to a JSON file in primary key order"""
+        problems = validate_fixtures(fixtures)
+        if problems:
+            for problem in problems[:10]:
+                self.stdout.write(self.style.ERROR(f"  {problem}"))
+            raise CommandError(f"{len(problems)} problems in fixtures for {filename}; nothing was written")
+
         os.makedirs(output_dir, exist_ok=True)
 
         filepath = os.path.join(output_dir, filename)
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(fixtures, f, indent=2, ensure_ascii=False)
+            json.dump(sorted_fixtures(fixtures), f, indent=2, ensure_ascii=False)
 
         file_size = os.path.getsize(filepath)
         self.stdout.write(f"Created fixture file: {filepath} ({file_size:,} bytes)")
 
-    def generate_fixture_id(self):
-        """Generate unique ID for fixture objects"""
-        return int(str(uuid.uuid4().int)[:8])
-
     def sanitize_filename(self, filename):
         """Sanitize filename for safe file creation"""
         import re
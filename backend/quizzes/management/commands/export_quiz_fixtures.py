@@ -1,11 +1,12 @@
 from django.core.management.base import BaseCommand
-from django.core import serializers
+from django.db.models import Prefetch
 from django.conf import settings
 from django.utils import timezone
 import django
 import os
 import json
-from quizzes.models import Quiz, Question, Choice
+from quizzes.fixture_format import BINARY_FIXTURE_SUFFIX, FixtureArchiveWriter, JSONFixtureWriter, fixture_object
+from quizzes.models import Category, Quiz, Question, Choice
 
 
 class Command(BaseCommand):
@@ -38,6 +39,23 @@ class Command(BaseCommand):
             action='store_true',
             help='Split into separate files by category'
         )
+        parser.add_argument(
+            '--format',
+            choices=['json', 'binary'],
+            default='json',
+            help='json: Django fixtures (default); binary: .qfx archive with a per-category index'
+        )
+        parser.add_argument(
+            '--no-compress',
+            action='store_true',
+            help='Store binary archive blocks uncompressed'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Questions read per query when writing JSON fixtures (default: 2000)'
+        )
 
     def handle(self, *args, **options):
         output_dir = options['output_dir']
@@ -45,6 +63,8 @@ class Command(BaseCommand):
         category_filter = options['category']
         max_quizzes = options['max_quizzes']
         split_files = options['split_files']
+        binary = options['format'] == 'binary'
+        chunk_size = options['chunk_size']
 
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
@@ -56,7 +76,7 @@ class Command(BaseCommand):
             quiz_queryset = quiz_queryset.filter(is_ai_generated=False)
 
         if category_filter:
-            quiz_queryset = quiz_queryset.filter(title__icontains=category_filter)
+            quiz_queryset = quiz_queryset.filter(category__in=Category.matching(category_filter))
 
         if max_quizzes:
             quiz_queryset = quiz_queryset[:max_quizzes]
@@ -68,106 +88,108 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('No quizzes found matching criteria'))
             return
 
-        if split_files:
-            self._export_split_by_category(quiz_queryset, output_dir)
+        if binary:
+            self._export_binary(quiz_queryset, output_dir, split_files, not options['no_compress'])
+        elif split_files:
+            self._export_split_by_category(quiz_queryset, output_dir, chunk_size)
         else:
-            self._export_single_file(quiz_queryset, output_dir)
+            self._export_single_file(quiz_queryset, output_dir, chunk_size)
 
         self.stdout.write(
             self.style.SUCCESS(f'Successfully exported {quiz_count} quizzes to {output_dir}/')
         )
 
-    def _export_single_file(self, quiz_queryset, output_dir):
+    def _export_single_file(self, quiz_queryset, output_dir, chunk_size):
         """Export all data to a single fixture file"""
-        all_objects = []
-
-        # Export quizzes
-        for quiz in quiz_queryset:
-            all_objects.append(quiz)
-
-            # Export questions for this quiz
-            for question in quiz.questions.all():
-                all_objects.append(question)
-
-                # Export choices for this question
-                for choice in question.choices.all():
-                    all_objects.append(choice)
-
-        # Serialize all objects
-        fixture_data = serializers.serialize('json', all_objects, indent=2)
-
-        # Write to file
         output_file = os.path.join(output_dir, 'quiz_fixtures.json')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(fixture_data)
+        self._write_json_fixture(output_file, self._quiz_ids_by_category(quiz_queryset), chunk_size)
 
         self.stdout.write(f"Exported to: {output_file}")
 
-    def _export_split_by_category(self, quiz_queryset, output_dir):
+    def _export_split_by_category(self, quiz_queryset, output_dir, chunk_size):
         """Export data split by category into separate files"""
-        categories = {}
-
-        # Group quizzes by category (extracted from title)
-        for quiz in quiz_queryset:
-            category = self._extract_category(quiz.title)
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(quiz)
+        for category, quiz_ids in self._quiz_ids_by_category(quiz_queryset).items():
+            # Write to category-specific file
+            safe_category = self._sanitize_filename(category.name if category else 'General Knowledge')
+            output_file = os.path.join(output_dir, f'{safe_category}_fixtures.json')
+            self._write_json_fixture(output_file, {category: quiz_ids}, chunk_size)
+
+            self.stdout.write(f"Exported {len(quiz_ids)} quizzes to: {output_file}")
+
+    def _quiz_ids_by_category(self, quiz_queryset):
+        """Quiz ids grouped by category (None for uncategorised quizzes)"""
+        quiz_ids = {}
+        for quiz_id, category_id in quiz_queryset.values_list('id', 'category_id'):
+            quiz_ids.setdefault(category_id, []).append(quiz_id)
+
+        categories = Category.objects.in_bulk([category_id for category_id in quiz_ids if category_id])
+        return {categories.get(category_id): ids for category_id, ids in quiz_ids.items()}
+
+    def _write_json_fixture(self, output_file, groups, chunk_size):
+        """
+        Stream categories, quizzes, questions and choices to a JSON fixture.
+
+        Questions are read chunk_size at a time, each chunk with one query for
+        its choices, so memory and queries per chunk do not grow with the export.
+        """
+        quiz_ids = [quiz_id for ids in groups.values() for quiz_id in ids]
+        questions = (
+            Question.objects.filter(quiz_id__in=quiz_ids)
+            .order_by('quiz_id', 'id')
+            .prefetch_related(Prefetch('choices', queryset=Choice.objects.order_by('id')))
+        )
 
-        # Export each category to separate file
-        for category, quizzes in categories.items():
-            category_objects = []
+        with open(output_file, 'w', encoding='utf-8') as f:
+            writer = JSONFixtureWriter(f)
 
-            for quiz in quizzes:
-                category_objects.append(quiz)
+            # Categories first so loaddata can resolve the quiz foreign keys
+            for category in groups:
+                if category:
+                    writer.write(fixture_object(category))
 
-                # Add questions and choices
-                for question in quiz.questions.all():
-                    category_objects.append(question)
+            for quiz in Quiz.objects.filter(id__in=quiz_ids).order_by('id').iterator(chunk_size=chunk_size):
+                writer.write(fixture_object(quiz))
 
-                    for choice in question.choices.all():
-                        category_objects.append(choice)
+            for question in questions.iterator(chunk_size=chunk_size):
+                writer.write(fixture_object(question))
+                for choice in question.choices.all():
+                    writer.write(fixture_object(choice))
 
-            # Serialize category data
-            fixture_data = serializers.serialize('json', category_objects, indent=2)
+            writer.close()
 
-            # Write to category-specific file
-            safe_category = self._sanitize_filename(category)
-            output_file = os.path.join(output_dir, f'{safe_category}_fixtures.json')
+    def _export_binary(self, quiz_queryset, output_dir, split_files, compress):
+        """Export to a .qfx archive with one block per category (one archive per category when splitting)"""
+        groups = self._quiz_ids_by_category(quiz_queryset)
 
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(fixture_data)
-
-            self.stdout.write(f"Exported {len(quizzes)} quizzes to: {output_file}")
-
-    def _extract_category(self, title):
-        """Extract category from quiz title"""
-        # Common category patterns
-        if 'science' in title.lower():
-            return 'Science'
-        elif 'history' in title.lower():
-            return 'History'
-        elif 'geography' in title.lower():
-            return 'Geography'
-        elif 'sport' in title.lower():
-            return 'Sports'
-        elif 'entertainment' in title.lower():
-            if 'film' in title.lower() or 'movie' in title.lower():
-                return 'Entertainment_Film'
-            elif 'music' in title.lower():
-                return 'Entertainment_Music'
-            elif 'book' in title.lower():
-                return 'Entertainment_Books'
-            elif 'video' in title.lower() or 'game' in title.lower():
-                return 'Entertainment_Video_Games'
-            else:
-                return 'Entertainment'
-        elif 'art' in title.lower():
-            return 'Art'
-        elif 'animal' in title.lower():
-            return 'Animals'
+        if split_files:
+            for category, quiz_ids in groups.items():
+                name = self._sanitize_filename(category.name if category else 'General Knowledge')
+                self._write_archive(
+                    os.path.join(output_dir, f'{name}{BINARY_FIXTURE_SUFFIX}'), {category: quiz_ids}, compress
+                )
         else:
-            return 'General_Knowledge'
+            self._write_archive(os.path.join(output_dir, f'quiz_fixtures{BINARY_FIXTURE_SUFFIX}'), groups, compress)
+
+    def _write_archive(self, output_file, groups, compress):
+        with open(output_file, 'wb') as f:
+            writer = FixtureArchiveWriter(f, compress=compress)
+            for category, quiz_ids in groups.items():
+                tables = {}
+                if category:
+                    tables['quizzes.category'] = self._table(Category, Category.objects.filter(id=category.id))
+                tables['quizzes.quiz'] = self._table(Quiz, Quiz.objects.filter(id__in=quiz_ids))
+                tables['quizzes.question'] = self._table(Question, Question.objects.filter(quiz_id__in=quiz_ids))
+                tables['quizzes.choice'] = self._table(Choice, Choice.objects.filter(question__quiz_id__in=quiz_ids))
+                writer.add_block({'name': category.name, 'slug': category.slug} if category else None, tables)
+            writer.close()
+
+        self.stdout.write(f"Exported to: {output_file} ({os.path.getsize(output_file):,} bytes)")
+
+    def _table(self, model, queryset):
+        """(field names, rows) of a queryset in primary key order, in fixture field naming"""
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        rows = queryset.order_by('pk').values_list('pk', *[field.attname for field in fields])
+        return ['pk'] + [field.name for field in fields], rows.iterator()
 
     def _sanitize_filename(self, filename):
         """Sanitize filename for safe file creation"""
@@ -1,10 +1,12 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from django.conf import settings
-import requests
-import time
 import html
+import random
 from quizzes.models import Quiz, Question, Choice
+from quizzes.cache import deferred_content_invalidation
+from quizzes.importing import QuestionImportBatch, ImportStats, points_for_difficulty
+from quizzes.opentdb import OpenTDBClient, OpenTDBError
 
 
 class Command(BaseCommand):
@@ -20,7 +22,7 @@ class Command(BaseCommand):
             '--amount',
             type=int,
             default=10,
-            help='Number of questions to import per category (default: 10)'
+            help='Number of questions to import per category (default: 10, more than 50 is paged)'
         )
         parser.add_argument(
             '--difficulty',
@@ -37,42 +39,46 @@ class Command(BaseCommand):
             action='store_true',
             help='List all available categories'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.OPENTDB_MAX_WORKERS,
+            help='Categories fetched concurrently with --all (requests stay rate limited)'
+        )
 
     def handle(self, *args, **options):
+        self.import_stats = ImportStats()
+
         # Check if data ingestion is enabled
         if not getattr(settings, 'ENABLE_DATA_INGESTION', True) and not options['list_categories']:
             raise CommandError('Data ingestion is disabled. Set ENABLE_DATA_INGESTION=True in settings to enable.')
 
-        if options['list_categories']:
-            self.list_categories()
-        elif options['all']:
-            self.import_all_categories(options['amount'])
-        elif options['category_id']:
-            self.import_category(
-                options['category_id'],
-                options['amount'],
-                options['difficulty']
-            )
-        else:
-            raise CommandError('Please specify --list-categories, --category-id, or --all')
+        with OpenTDBClient() as self.client:
+            if options['list_categories']:
+                self.list_categories()
+            elif options['all']:
+                with deferred_content_invalidation():
+                    self.import_all_categories(options['amount'], options['workers'])
+            elif options['category_id']:
+                with deferred_content_invalidation():
+                    self.import_category(
+                        options['category_id'],
+                        options['amount'],
+                        options['difficulty']
+                    )
+            else:
+                raise CommandError('Please specify --list-categories, --category-id, or --all')
 
     def list_categories(self):
         """List all available categories from OpenTDB"""
         self.stdout.write("Fetching categories from OpenTDB...")
+        categories = self.get_categories()
 
-        try:
-            response = requests.get("https://opentdb.com/api_category.php")
-            response.raise_for_status()
-            categories = response.json().get('trivia_categories', [])
-
-            self.stdout.write(f"\nFound {len(categories)} categories:")
-            self.stdout.write("-" * 50)
-            for category in categories:
-                self.stdout.write(f"ID: {category['id']:2d} | {category['name']}")
-            self.stdout.write("-" * 50)
-
-        except requests.RequestException as e:
-            raise CommandError(f"Error fetching categories: {e}")
+        self.stdout.write(f"\nFound {len(categories)} categories:")
+        self.stdout.write("-" * 50)
+        for category in categories:
+            self.stdout.write(f"ID: {category['id']:2d} | {category['name']}")
+        self.stdout.write("-" * 50)
 
     def import_category(self, category_id, amount, difficulty):
         """Import questions for a specific category"""
@@ -102,19 +108,26 @@ class Command(BaseCommand):
             )
         )
 
-    def import_all_categories(self, amount_per_category):
-        """Import questions from all categories"""
+    def import_all_categories(self, amount_per_category, workers):
+        """Import questions from all categories, fetching several at a time"""
         categories = self.get_categories()
         self.stdout.write(f"Starting bulk import: {amount_per_category} questions per category...")
 
         total_imported = 0
         successful_categories = 0
 
-        for i, category in enumerate(categories, 1):
-            self.stdout.write(f"[{i}/{len(categories)}] Processing: {category['name']}")
+        # Fetches run in worker threads; database writes stay on this thread
+        fetched = self.client.fetch_categories(categories, amount_per_category, max_workers=workers)
+        for i, (category, questions_data, error) in enumerate(fetched, 1):
+            self.stdout.write(f"[{i}/{len(categories)}] Fetched: {category['name']}")
+
+            if error:
+                self.stdout.write(
+                    self.style.WARNING(f"Failed to import {category['name']}: {error}")
+                )
+                continue
 
             try:
-                questions_data = self.fetch_questions(category['id'], amount_per_category)
                 if questions_data:
                     imported_count = self.create_quiz_and_questions(
                         category['name'],
@@ -123,9 +136,6 @@ class Command(BaseCommand):
                     total_imported += imported_count
                     successful_categories += 1
 
-                # Rate limiting
-                time.sleep(1)
-
             except Exception as e:
                 self.stdout.write(
                     self.style.WARNING(f"Failed to import {category['name']}: {e}")
@@ -138,41 +148,20 @@ class Command(BaseCommand):
                 f"Questions: {total_imported}"
             )
         )
+        self.stdout.write(f"Inserted {self.import_stats.describe()}")
 
     def get_categories(self):
         """Fetch categories from OpenTDB"""
         try:
-            response = requests.get("https://opentdb.com/api_category.php")
-            response.raise_for_status()
-            return response.json().get('trivia_categories', [])
-        except requests.RequestException as e:
+            return self.client.categories()
+        except OpenTDBError as e:
             raise CommandError(f"Error fetching categories: {e}")
 
     def fetch_questions(self, category_id, amount, difficulty=None):
         """Fetch questions for a category"""
-        params = {
-            'amount': amount,
-            'category': category_id,
-            'type': 'multiple'
-        }
-
-        if difficulty:
-            params['difficulty'] = difficulty
-
         try:
-            response = requests.get("https://opentdb.com/api.php", params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            if data.get('response_code') != 0:
-                self.stdout.write(
-                    self.style.WARNING(f"OpenTDB API error code: {data.get('response_code')}")
-                )
-                return []
-
-            return data.get('results', [])
-
-        except requests.RequestException as e:
+            return self.client.fetch_questions(category_id, amount, difficulty)
+        except OpenTDBError as e:
             self.stdout.write(self.style.WARNING(f"Error fetching questions: {e}"))
             return []
 
@@ -193,50 +182,40 @@ class Command(BaseCommand):
         else:
             self.stdout.write(f"  Using existing quiz: {quiz_title}")
 
-        # Import questions
-        imported_count = 0
+        # Stage questions and choices, then insert them in bulk
+        batch = QuestionImportBatch()
         for i, q_data in enumerate(questions_data):
             try:
-                # Determine points based on difficulty
                 difficulty = q_data.get('difficulty', 'medium')
-                if difficulty == 'easy':
-                    points = 1
-                elif difficulty == 'medium':
-                    points = 2
-                elif difficulty == 'hard':
-                    points = 4
-                else:
-                    points = 2  # Default to medium
-
-                # Create question
-                question = Question.objects.create(
+                question = Question(
                     quiz=quiz,
                     question_text=html.unescape(q_data['question']),
                     question_type='multiple_choice',
                     difficulty=difficulty,
-                    points=points,
+                    points=points_for_difficulty(difficulty),
                     order=i + 1
                 )
 
-                # Create choices
-                all_answers = [q_data['correct_answer']] + q_data['incorrect_answers']
-
                 # Shuffle answers
-                import random
+                all_answers = [q_data['correct_answer']] + q_data['incorrect_answers']
                 random.shuffle(all_answers)
 
-                for answer in all_answers:
-                    Choice.objects.create(
-                        question=question,
+                choices = [
+                    Choice(
                         choice_text=html.unescape(answer),
                         is_correct=(answer == q_data['correct_answer'])
                     )
-
-                imported_count += 1
+                    for answer in all_answers
+                ]
+                batch.add(question, choices)
 
             except Exception as e:
                 self.stdout.write(
                     self.style.WARNING(f"  Error importing question {i + 1}: {e}")
                 )
 
-        return imported_count
\ No newline at end of file
+        stats = batch.save()
+        self.import_stats += stats
+        self.stdout.write(f"  Inserted {stats.describe()}")
+
+        return stats.questions
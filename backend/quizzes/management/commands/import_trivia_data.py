@@ -2,6 +2,8 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction, IntegrityError
 from django.conf import settings
 from quizzes.models import Quiz, Question, Choice
+from quizzes.cache import deferred_content_invalidation
+from quizzes.importing import QuestionImportBatch, ImportStats, points_for_difficulty
 import json
 import os
 from pathlib import Path
@@ -39,6 +41,7 @@ class Command(BaseCommand):
             raise CommandError('Data ingestion is disabled. Set ENABLE_DATA_INGESTION=True in settings to enable.')
 
         self.stdout.write(self.style.SUCCESS('Starting trivia data import...'))
+        self.import_stats = ImportStats()
         
         # Determine data directory
         data_dir = self._get_data_directory(options.get('data_dir'))
@@ -58,28 +61,31 @@ class Command(BaseCommand):
         success_count = 0
         error_count = 0
         
-        for file_path in files_to_import:
-            try:
-                if self._import_quiz_file(file_path, options):
-                    success_count += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(f'Successfully imported: {file_path.name}')
-                    )
-                else:
+        # Invalidate cached quiz content once for the whole import
+        with deferred_content_invalidation():
+            for file_path in files_to_import:
+                try:
+                    if self._import_quiz_file(file_path, options):
+                        success_count += 1
+                        self.stdout.write(
+                            self.style.SUCCESS(f'Successfully imported: {file_path.name}')
+                        )
+                    else:
+                        error_count += 1
+                        self.stdout.write(
+                            self.style.WARNING(f'Skipped (duplicate): {file_path.name}')
+                        )
+                except Exception as e:
                     error_count += 1
                     self.stdout.write(
-                        self.style.WARNING(f'Skipped (duplicate): {file_path.name}')
+                        self.style.ERROR(f'Failed to import {file_path.name}: {str(e)}')
                     )
-            except Exception as e:
-                error_count += 1
-                self.stdout.write(
-                    self.style.ERROR(f'Failed to import {file_path.name}: {str(e)}')
-                )
         
         # Summary
         self.stdout.write(self.style.SUCCESS(f'\nImport Summary:'))
         self.stdout.write(f'  - Successfully imported: {success_count}')
         self.stdout.write(f'  - Errors/Skipped: {error_count}')
+        self.stdout.write(f'  - Inserted: {self.import_stats.describe()}')
         self.stdout.write(f'  - Total quizzes in database: {Quiz.objects.count()}')
 
     def _get_data_directory(self, data_dir_arg):
@@ -132,24 +138,14 @@ class Command(BaseCommand):
                     is_active=quiz_info.get('is_active', True)
                 )
                 
-                # Create questions and choices
+                # Stage questions and choices, then insert them in bulk
+                batch = QuestionImportBatch()
                 for q_data in questions_data:
                     # Determine points based on difficulty if not explicitly provided
                     difficulty = q_data.get('difficulty', 'medium')
-                    if 'points' in q_data:
-                        points = q_data['points']
-                    else:
-                        # Use difficulty-based scoring
-                        if difficulty == 'easy':
-                            points = 1
-                        elif difficulty == 'medium':
-                            points = 2
-                        elif difficulty == 'hard':
-                            points = 4
-                        else:
-                            points = 2  # Default to medium
+                    points = q_data.get('points', points_for_difficulty(difficulty))
 
-                    question = Question.objects.create(
+                    question = Question(
                         quiz=quiz,
                         question_text=q_data['question_text'],
                         question_type=q_data.get('question_type', 'multiple_choice'),
@@ -157,17 +153,20 @@ class Command(BaseCommand):
                         points=points,
                         order=q_data.get('order', 0)
                     )
-                    
-                    # Create choices
-                    for choice_data in q_data['choices']:
-                        Choice.objects.create(
-                            question=question,
+                    choices = [
+                        Choice(
                             choice_text=choice_data['choice_text'],
                             is_correct=choice_data['is_correct']
                         )
+                        for choice_data in q_data['choices']
+                    ]
+                    batch.add(question, choices)
+
+                stats = batch.save()
+                self.import_stats += stats
                 
                 self.stdout.write(f'  Created quiz: {quiz.title}')
-                self.stdout.write(f'  Questions: {len(questions_data)}')
+                self.stdout.write(f'  Inserted {stats.describe()}')
                 self.stdout.write(f'  Total points: {quiz_info.get("total_points", "N/A")}')
                 
                 return True
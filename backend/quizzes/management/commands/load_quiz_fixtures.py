@@ -1,15 +1,27 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.core.management import call_command
-from django.db import transaction
+from django.db import connection, connections, transaction
 from django.conf import settings
 import os
 import glob
-import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
 from quizzes.models import Quiz, Question, Choice
+from quizzes.cache import deferred_content_invalidation
+from quizzes.fixture_format import BINARY_FIXTURE_SUFFIX
+from quizzes.fixture_loader import (
+    BulkFixtureLoader, FixtureError, iter_fixture_file, fixture_model, row_values,
+    prepare_fixture_file, find_pk_collisions, write_prepared_fixtures, init_worker, reset_fixture_sequences
+)
 
 
 class Command(BaseCommand):
-    help = 'Load quiz fixtures for deployment initialization'
+    help = (
+        'Load quiz fixtures (JSON or binary .qfx archives) for deployment initialization. '
+        'Fixtures from create_opentdb_fixtures use reserved ids, which are only kept apart from '
+        'new rows on PostgreSQL, MySQL and SQLite; other databases refuse them.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -21,7 +33,7 @@ class Command(BaseCommand):
         parser.add_argument(
             '--category',
             type=str,
-            help='Load fixtures for specific category only'
+            help='Load fixtures for specific category only (JSON files by name, .qfx archives by block)'
         )
         parser.add_argument(
             '--clear-existing',
@@ -38,13 +50,41 @@ class Command(BaseCommand):
             action='store_true',
             help='Skip confirmation prompts'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.MAX_IMPORT_BATCH_SIZE,
+            help='Rows per bulk insert batch'
+        )
+        parser.add_argument(
+            '--use-loaddata',
+            action='store_true',
+            help="Load through Django's loaddata (one save per object) instead of bulk inserts"
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Parse and validate fixture files in this many processes before writing'
+        )
+        parser.add_argument(
+            '--db-connections',
+            type=int,
+            default=1,
+            help='With --workers, write through up to this many database connections '
+                 '(more than one commits per chunk instead of in a single transaction)'
+        )
 
     def handle(self, *args, **options):
         fixtures_dir = options['fixtures_dir']
-        category_filter = options['category']
+        category_filter = self.category_filter = options['category']
         clear_existing = options['clear_existing']
         dry_run = options['dry_run']
         force = options['force']
+        batch_size = options['batch_size']
+        use_loaddata = options['use_loaddata']
+        workers = options['workers']
+        db_connections = options['db_connections']
 
         # Check if fixtures directory exists
         if not os.path.exists(fixtures_dir):
@@ -59,7 +99,8 @@ class Command(BaseCommand):
         else:
             pattern = os.path.join(fixtures_dir, '*_fixtures.json')
 
-        fixture_files = glob.glob(pattern)
+        # Binary archives carry a category index, so they are filtered block by block
+        fixture_files = glob.glob(pattern) + glob.glob(os.path.join(fixtures_dir, f'*{BINARY_FIXTURE_SUFFIX}'))
 
         if not fixture_files:
             self.stdout.write(
@@ -72,6 +113,9 @@ class Command(BaseCommand):
             file_size = os.path.getsize(file)
             self.stdout.write(f"  - {os.path.basename(file)} ({file_size:,} bytes)")
 
+        if use_loaddata and any(file.endswith(BINARY_FIXTURE_SUFFIX) for file in fixture_files):
+            raise CommandError(f'loaddata cannot read {BINARY_FIXTURE_SUFFIX} archives; load them without --use-loaddata')
+
         if dry_run:
             self.stdout.write(self.style.WARNING('DRY RUN: No data will be loaded'))
             self._preview_fixtures(fixture_files)
@@ -89,13 +133,38 @@ class Command(BaseCommand):
                 self.stdout.write('Cancelled')
                 return
 
+        # Parse, validate and check primary keys in worker processes before any write
+        prepared = None
+        if workers > 1 and not use_loaddata:
+            prepared = self._prepare_in_pool(fixture_files, workers)
+
+        if db_connections > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite allows a single writer; using one connection'))
+            db_connections = 1
+        parallel_writes = prepared is not None and db_connections > 1
+
         # Load fixtures
         try:
-            with transaction.atomic():
+            with deferred_content_invalidation(), (nullcontext() if parallel_writes else transaction.atomic()):
                 if clear_existing:
                     self._clear_existing_data()
 
-                self._load_fixtures(fixture_files)
+                if use_loaddata:
+                    self._load_fixtures(fixture_files)
+                elif prepared is not None:
+                    self._write_prepared(prepared, batch_size, db_connections)
+                else:
+                    self._bulk_load_fixtures(fixture_files, batch_size)
+
+                # loaddata bypasses Quiz.save(), so categorise fixtures that predate categories
+                categorised = Quiz.assign_categories()
+                if categorised:
+                    self.stdout.write(f'Assigned categories to {categorised} quizzes')
+
+                # Likewise for content hashes of fixtures written without them
+                hashed = Question.backfill_content_hashes(batch_size)
+                if hashed:
+                    self.stdout.write(f'Computed content hashes for {hashed} questions')
 
             self.stdout.write(
                 self.style.SUCCESS(f'Successfully loaded {len(fixture_files)} fixture files')
@@ -111,81 +180,141 @@ class Command(BaseCommand):
         """Clear existing quiz data"""
         self.stdout.write('Clearing existing quiz data...')
 
-        # Delete in proper order to respect foreign key constraints
-        Choice.objects.all().delete()
-        Question.objects.all().delete()
+        # Questions and choices go with their quizzes, without rehashing anything on the way
         Quiz.objects.all().delete()
 
         self.stdout.write('Existing data cleared')
 
-    def _load_fixtures(self, fixture_files):
-        """Load fixture files"""
-        total_quizzes = 0
-        total_questions = 0
-        total_choices = 0
+    def _read_fixture(self, fixture_file, handle_object):
+        """
+        Stream one fixture file, passing each object to handle_object.
+
+        Returns:
+            tuple: (Counter of objects per model label, first three quiz titles)
+        """
+        counts = Counter()
+        quiz_titles = []
+
+        for obj in iter_fixture_file(fixture_file, self.category_filter):
+            handle_object(obj)
+            label = obj.get('model', '').lower()
+            counts[label] += 1
+            if label == 'quizzes.quiz' and len(quiz_titles) < 3:
+                quiz_titles.append(obj['fields']['title'])
+
+        return counts, quiz_titles
+
+    def _describe(self, counts):
+        return (
+            f"{counts['quizzes.quiz']} quizzes, {counts['quizzes.question']} questions, "
+            f"{counts['quizzes.choice']} choices"
+        )
+
+    def _bulk_load_fixtures(self, fixture_files, batch_size):
+        """Load fixture files with batched bulk inserts (COPY on PostgreSQL)"""
+        loader = BulkFixtureLoader(batch_size=batch_size)
+        method = 'COPY' if loader.use_copy else 'bulk_create'
+        total_counts = Counter()
 
         for fixture_file in fixture_files:
             self.stdout.write(f'Loading {os.path.basename(fixture_file)}...')
+            counts, _ = self._read_fixture(fixture_file, loader.add)
+            total_counts.update(counts)
+            self.stdout.write(f'  Queued: {self._describe(counts)}')
 
-            # Load fixture data
-            with open(fixture_file, 'r', encoding='utf-8') as f:
-                fixture_data = json.load(f)
+        loader.finish()
+        total_rows = sum(total_counts.values())
+        rate = total_rows / loader.elapsed if loader.elapsed > 0 else float(total_rows)
 
-            # Count objects by model
-            quizzes = [obj for obj in fixture_data if obj['model'] == 'quizzes.quiz']
-            questions = [obj for obj in fixture_data if obj['model'] == 'quizzes.question']
-            choices = [obj for obj in fixture_data if obj['model'] == 'quizzes.choice']
-
-            total_quizzes += len(quizzes)
-            total_questions += len(questions)
-            total_choices += len(choices)
-
-            # Use Django's loaddata command to load the fixture
-            call_command('loaddata', fixture_file, verbosity=0)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Total loaded: {self._describe(total_counts)} in {loader.elapsed:.2f}s '
+                f'({rate:,.0f} rows/sec via {method})'
+            )
+        )
 
-            self.stdout.write(
-                f'  Loaded: {len(quizzes)} quizzes, {len(questions)} questions, {len(choices)} choices'
+    def _prepare_in_pool(self, fixture_files, workers):
+        """Prepare fixture files in a process pool and refuse colliding primary keys"""
+        # Forked workers must not inherit open database connections
+        connections.close_all()
+
+        prepared = {}
+        with ProcessPoolExecutor(max_workers=min(workers, len(fixture_files)), initializer=init_worker) as pool:
+            futures = {
+                pool.submit(prepare_fixture_file, path, self.category_filter): path
+                for path in fixture_files
+            }
+            for future in as_completed(futures):
+                name = os.path.basename(futures[future])
+                prepared[name] = future.result()
+                counts = Counter({label: len(rows) for label, rows in prepared[name].items()})
+                self.stdout.write(f'Prepared {name}: {self._describe(counts)}')
+
+        collisions = find_pk_collisions(prepared)
+        if collisions:
+            for label, pk, names in collisions[:10]:
+                self.stdout.write(self.style.ERROR(f'  {label} pk={pk} in {", ".join(names)}'))
+            raise CommandError(
+                f'{len(collisions)} primary keys are used by different rows in the fixtures; nothing was loaded'
             )
+        return prepared
+
+    def _write_prepared(self, prepared, batch_size, db_connections):
+        """Write files prepared by the process pool"""
+        loader = write_prepared_fixtures(prepared, batch_size=batch_size, db_connections=db_connections)
+        counts = Counter({model._meta.label_lower: count for model, count in loader.counts.items()})
+        total_rows = sum(counts.values())
+        rate = total_rows / loader.elapsed if loader.elapsed > 0 else float(total_rows)
+        method = 'COPY' if loader.use_copy else 'bulk_create'
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'Total loaded: {total_quizzes} quizzes, {total_questions} questions, {total_choices} choices'
+                f'Total loaded: {self._describe(counts)} in {loader.elapsed:.2f}s '
+                f'({rate:,.0f} rows/sec via {method} on {db_connections} connection(s))'
             )
         )
 
-    def _preview_fixtures(self, fixture_files):
-        """Preview what would be loaded"""
-        total_quizzes = 0
-        total_questions = 0
-        total_choices = 0
+    def _load_fixtures(self, fixture_files):
+        """Load fixture files through loaddata"""
+        total_counts = Counter()
 
         for fixture_file in fixture_files:
-            with open(fixture_file, 'r', encoding='utf-8') as f:
-                fixture_data = json.load(f)
+            self.stdout.write(f'Loading {os.path.basename(fixture_file)}...')
 
-            quizzes = [obj for obj in fixture_data if obj['model'] == 'quizzes.quiz']
-            questions = [obj for obj in fixture_data if obj['model'] == 'quizzes.question']
-            choices = [obj for obj in fixture_data if obj['model'] == 'quizzes.choice']
+            # Use Django's loaddata command to load the fixture
+            call_command('loaddata', fixture_file, verbosity=0)
 
-            total_quizzes += len(quizzes)
-            total_questions += len(questions)
-            total_choices += len(choices)
+            counts, _ = self._read_fixture(fixture_file, lambda obj: None)
+            total_counts.update(counts)
+            self.stdout.write(f'  Loaded: {self._describe(counts)}')
 
-            self.stdout.write(
-                f'{os.path.basename(fixture_file)}: '
-                f'{len(quizzes)} quizzes, {len(questions)} questions, {len(choices)} choices'
-            )
+        # loaddata leaves sequences after the highest loaded id, inside the generated fixture range
+        reset_fixture_sequences([Quiz, Question, Choice])
+
+        self.stdout.write(self.style.SUCCESS(f'Total loaded: {self._describe(total_counts)}'))
+
+    def _preview_fixtures(self, fixture_files):
+        """Preview and validate what would be loaded"""
+        total_counts = Counter()
+
+        def validate(obj):
+            row_values(fixture_model(obj), obj)
+
+        for fixture_file in fixture_files:
+            try:
+                counts, quiz_titles = self._read_fixture(fixture_file, validate)
+            except FixtureError as e:
+                self.stdout.write(self.style.ERROR(f'{os.path.basename(fixture_file)}: invalid fixture: {e}'))
+                continue
+            total_counts.update(counts)
+
+            self.stdout.write(f'{os.path.basename(fixture_file)}: {self._describe(counts)}')
 
             # Show quiz titles
-            for quiz_obj in quizzes[:3]:  # Show first 3 quiz titles
-                title = quiz_obj['fields']['title']
+            for title in quiz_titles:
                 self.stdout.write(f'  - {title}')
 
-            if len(quizzes) > 3:
-                self.stdout.write(f'  ... and {len(quizzes) - 3} more quizzes')
+            if counts['quizzes.quiz'] > 3:
+                self.stdout.write(f"  ... and {counts['quizzes.quiz'] - 3} more quizzes")
 
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'TOTAL PREVIEW: {total_quizzes} quizzes, {total_questions} questions, {total_choices} choices'
-            )
-        )
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'TOTAL PREVIEW: {self._describe(total_counts)}'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from quizzes.opentdb_stub import OpenTDBStubServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the OpenTDB API (set OPENTDB_BASE_URL to its URL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8765,
+            help='Port to listen on (default: 8765)'
+        )
+        parser.add_argument(
+            '--questions-per-category',
+            type=int,
+            default=200,
+            help='Questions available in each category (default: 200)'
+        )
+
+    def handle(self, *args, **options):
+        server = OpenTDBStubServer(
+            questions_per_category=options['questions_per_category'],
+            port=options['port']
+        )
+        self.stdout.write(self.style.SUCCESS(f'OpenTDB stub listening on {server.url}'))
+        self.stdout.write(f'Use it with OPENTDB_BASE_URL={server.url}')
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping')
+        finally:
+            server.httpd.server_close()
@@ -1,42 +1,72 @@
 from django.core.management.base import BaseCommand
+from django.conf import settings
 from django.utils import timezone
-from quizzes.models import UserProfile
+from quizzes.models import UserProfile, LeaderboardDirtyUser
+from quizzes.leaderboard import rebuild_leaderboard_index
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
     help = 'Update leaderboard statistics and rankings'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Recompute all profiles with one grouped aggregate and a bulk update'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only recompute users in the dirty set and re-rank the range they moved through'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'MAX_IMPORT_BATCH_SIZE', 1000),
+            help='Rows per bulk_update batch on backends without UPDATE ... FROM'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(
             self.style.SUCCESS(f'Starting leaderboard update at {timezone.now()}')
         )
 
         try:
-            # Get all user profiles
-            profiles = UserProfile.objects.all()
-            profile_count = profiles.count()
+            start_time = time.perf_counter()
+
+            if options['incremental']:
+                self._update_incremental(options['batch_size'], start_time)
+                return
 
-            if profile_count == 0:
+            started_at = timezone.now()
+            if options['bulk']:
+                updated_count = UserProfile.bulk_recompute(batch_size=options['batch_size'])
+            else:
+                updated_count = self._update_per_profile()
+
+            # A full recompute covers every change recorded before it started
+            LeaderboardDirtyUser.clear(before=started_at)
+
+            if updated_count == 0:
                 self.stdout.write(
                     self.style.WARNING('No user profiles found to update')
                 )
                 return
 
-            # Update stats for all profiles
-            updated_count = 0
-            for profile in profiles:
-                profile.update_stats()
-                updated_count += 1
+            # Resynchronise the live leaderboard index with the recomputed stats
+            rebuild_leaderboard_index()
 
+            elapsed = time.perf_counter() - start_time
+            rate = updated_count / elapsed if elapsed > 0 else float(updated_count)
             self.stdout.write(
-                self.style.SUCCESS(f'Updated statistics for {updated_count} user profiles')
+                self.style.SUCCESS(
+                    f'Updated {updated_count} user profiles in {elapsed:.2f}s '
+                    f'({rate:,.0f} rows/sec)'
+                )
             )
-
-            # Update all ranks
-            UserProfile.update_all_ranks()
-
             self.stdout.write(
                 self.style.SUCCESS(f'Successfully updated leaderboard rankings at {timezone.now()}')
             )
@@ -46,4 +76,38 @@ class Command(BaseCommand):
                 self.style.ERROR(f'Error updating leaderboard: {str(e)}')
             )
             logger.error(f'Leaderboard update failed: {str(e)}', exc_info=True)
-            raise
\ No newline at end of file
+            raise
+
+    def _update_incremental(self, batch_size, start_time):
+        """Recompute only the users whose statistics changed since the last run"""
+        updated_count, reranked_count = UserProfile.incremental_update(batch_size=batch_size)
+
+        if updated_count == 0:
+            self.stdout.write('No leaderboard changes since the last update')
+            return
+
+        elapsed = time.perf_counter() - start_time
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Recomputed {updated_count} changed profiles and re-ranked '
+                f'{reranked_count} profiles in {elapsed:.2f}s'
+            )
+        )
+
+    def _update_per_profile(self):
+        """Recompute each profile separately, then rewrite all ranks"""
+        profiles = UserProfile.objects.all()
+        if not profiles.exists():
+            return 0
+
+        # Update stats for all profiles
+        updated_count = 0
+        for profile in profiles:
+            profile.update_stats()
+            updated_count += 1
+
+        self.stdout.write(f'Updated statistics for {updated_count} user profiles')
+
+        # Update all ranks
+        UserProfile.update_all_ranks()
+        return updated_count
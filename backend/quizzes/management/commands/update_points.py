@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from quizzes.models import Question
+from quizzes.cache import bump_content_version
 
 class Command(BaseCommand):
     help = 'Updates the points for questions based on their difficulty.'
@@ -13,4 +14,7 @@ class Command(BaseCommand):
         medium_questions.update(points=2)
         easy_questions.update(points=1)
 
+        # Queryset updates bypass the save signals, so invalidate cached quizzes here
+        bump_content_version()
+
         self.stdout.write(self.style.SUCCESS('Successfully updated points for questions.'))
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-16 09:00
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_total_points_possible(apps, schema_editor):
+    """Populate total_points_possible from existing completed attempts"""
+    QuizAttempt = apps.get_model('quizzes', 'QuizAttempt')
+    UserProfile = apps.get_model('quizzes', 'UserProfile')
+
+    totals = QuizAttempt.objects.filter(
+        is_completed=True,
+        quiz__is_ai_generated=False
+    ).values('user_id').annotate(total=Sum('total_points'))
+
+    for row in totals:
+        UserProfile.objects.filter(user_id=row['user_id']).update(
+            total_points_possible=row['total'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0004_quiz_is_ai_generated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='total_points_possible',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_total_points_possible, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-16 19:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quizzes', '0005_userprofile_total_points_possible'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardDirtyUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('previous_total_score', models.IntegerField(blank=True, null=True)),
+                ('previous_average', models.FloatField(blank=True, null=True)),
+                ('marked_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
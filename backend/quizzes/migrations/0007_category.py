@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-16 19:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.text import slugify
+
+
+def backfill_categories(apps, schema_editor):
+    """Create categories from existing public quiz titles and link the quizzes"""
+    Category = apps.get_model('quizzes', 'Category')
+    Quiz = apps.get_model('quizzes', 'Quiz')
+
+    quiz_ids_by_slug = {}
+    names = {}
+    titles = Quiz.objects.filter(is_active=True, is_ai_generated=False).values_list('id', 'title')
+    for quiz_id, title in titles.iterator():
+        # Category name and slug are limited to 100 characters, quiz titles to 200
+        name = title.split(' - ')[0].strip()[:100].strip()
+        slug = slugify(name)[:100].strip('-')
+        if slug:
+            quiz_ids_by_slug.setdefault(slug, []).append(quiz_id)
+            names.setdefault(slug, name)
+
+    for slug, quiz_ids in quiz_ids_by_slug.items():
+        category = Category.objects.create(name=names[slug], slug=slug)
+        Quiz.objects.filter(id__in=quiz_ids).update(category=category)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0006_leaderboarddirtyuser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quizzes', to='quizzes.category'),
+        ),
+        migrations.RunPython(backfill_categories, migrations.RunPython.noop),
+    ]
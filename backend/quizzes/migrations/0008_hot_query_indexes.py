@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-16 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0007_category'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['quiz', 'difficulty'], name='question_quiz_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['quiz', '-score', 'completed_at'], name='attempt_quiz_board_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['user', '-completed_at'], name='attempt_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['started_at'], name='attempt_started_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['total_quizzes_completed', 'rank'], name='profile_completed_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('total_quizzes_completed__gt', 0)), fields=['-total_score', '-average_score_percentage'], name='profile_ranking_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-16 21:05
+
+import hashlib
+import html
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def content_hash(question_text, choice_texts):
+    # Frozen copy of Question.content_hash_for
+    def normalize(text):
+        return ' '.join(html.unescape(text).split()).casefold()
+
+    choices = sorted(normalize(text) for text in choice_texts)
+    content = '\x1f'.join([normalize(question_text)] + choices)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def backfill_content_hashes(apps, schema_editor):
+    """
+    Hash existing questions batch by batch.
+
+    Duplicates already in a quiz keep a NULL hash (the first copy gets the
+    hash), so the unique constraint added next can be created without
+    deleting questions that attempts may have answered.
+    """
+    Question = apps.get_model('quizzes', 'Question')
+    Choice = apps.get_model('quizzes', 'Choice')
+
+    seen = set()
+    last_id = 0
+    while True:
+        questions = list(
+            Question.objects.filter(id__gt=last_id).order_by('id').only('id', 'quiz_id', 'question_text')[:BATCH_SIZE]
+        )
+        if not questions:
+            break
+        last_id = questions[-1].id
+
+        choice_texts = {}
+        choices = Choice.objects.filter(question_id__in=[q.id for q in questions]).values_list('question_id', 'choice_text')
+        for question_id, text in choices:
+            choice_texts.setdefault(question_id, []).append(text)
+
+        hashed = []
+        for question in questions:
+            key = (question.quiz_id, content_hash(question.question_text, choice_texts.get(question.id, [])))
+            if key not in seen:
+                seen.add(key)
+                question.content_hash = key[1]
+                hashed.append(question)
+        Question.objects.bulk_update(hashed, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0008_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True),
+        ),
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+    ]
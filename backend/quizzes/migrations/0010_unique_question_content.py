@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0009_question_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='question',
+            constraint=models.UniqueConstraint(fields=('quiz', 'content_hash'), name='unique_question_content_per_quiz'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-16 19:56
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0010_unique_question_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIQuizJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('topic', models.CharField(blank=True, max_length=200)),
+                ('difficulty', models.CharField(default='any', max_length=10)),
+                ('question_count', models.IntegerField(default=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('error_status', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='ai_job_status_created_idx')],
+            },
+        ),
+    ]
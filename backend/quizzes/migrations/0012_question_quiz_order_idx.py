@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0011_aiquizjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['quiz', 'order', 'id'], name='question_quiz_order_idx'),
+        ),
+    ]
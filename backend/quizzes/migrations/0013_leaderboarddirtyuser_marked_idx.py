@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0012_question_quiz_order_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboarddirtyuser',
+            index=models.Index(fields=['marked_at', 'id'], name='dirty_user_marked_idx'),
+        ),
+    ]
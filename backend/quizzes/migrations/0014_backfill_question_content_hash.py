@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:10
+
+import hashlib
+import html
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def content_hash(question_text, choice_texts):
+    # Frozen copy of Question.content_hash_for
+    def normalize(text):
+        return ' '.join(html.unescape(text).split()).casefold()
+
+    choices = sorted(normalize(text) for text in choice_texts)
+    content = '\x1f'.join([normalize(question_text)] + choices)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def backfill_missing_hashes(apps, schema_editor):
+    """
+    Hash questions saved without one since 0009 (fixture loads, admin edits).
+
+    Repeats within a quiz keep a NULL hash, as in 0009.
+    """
+    Question = apps.get_model('quizzes', 'Question')
+    Choice = apps.get_model('quizzes', 'Choice')
+
+    last_id = 0
+    while True:
+        questions = list(
+            Question.objects.filter(content_hash__isnull=True, id__gt=last_id)
+            .order_by('id').only('id', 'quiz_id', 'question_text')[:BATCH_SIZE]
+        )
+        if not questions:
+            break
+        last_id = questions[-1].id
+
+        choice_texts = {}
+        choices = Choice.objects.filter(question_id__in=[q.id for q in questions]).values_list('question_id', 'choice_text')
+        for question_id, text in choices:
+            choice_texts.setdefault(question_id, []).append(text)
+
+        keys = {
+            question.id: (question.quiz_id, content_hash(question.question_text, choice_texts.get(question.id, [])))
+            for question in questions
+        }
+        taken = set(
+            Question.objects.filter(
+                quiz_id__in={quiz_id for quiz_id, _ in keys.values()},
+                content_hash__in={key[1] for key in keys.values()}
+            ).values_list('quiz_id', 'content_hash')
+        )
+
+        hashed = []
+        for question in questions:
+            key = keys[question.id]
+            if key not in taken:
+                taken.add(key)
+                question.content_hash = key[1]
+                hashed.append(question)
+        Question.objects.bulk_update(hashed, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0013_leaderboarddirtyuser_marked_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_missing_hashes, migrations.RunPython.noop),
+    ]
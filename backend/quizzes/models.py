@@ -1,10 +1,68 @@
-from django.db import models
+import hashlib
+import html
+import uuid
+
+from django.db import models, connection, transaction
 from django.contrib.auth.models import User
-from django.db.models import Sum, Avg, Count
+from django.db.models import Sum, Avg, Count, F, Q, Value, FloatField, ExpressionWrapper, Window
+from django.db.models.functions import Coalesce, NullIf, Round, Rank
+from django.utils import timezone
+from django.utils.text import slugify
+
+class Category(models.Model):
+    NAME_MAX_LENGTH = 100
+
+    name = models.CharField(max_length=NAME_MAX_LENGTH, unique=True)
+    slug = models.SlugField(max_length=NAME_MAX_LENGTH, unique=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'categories'
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def name_from_title(cls, title):
+        """Category part of a quiz title such as 'Science: Computers - Quiz', cut to fit the name field"""
+        return title.split(' - ')[0].strip()[:cls.NAME_MAX_LENGTH].strip()
+
+    @classmethod
+    def slug_for(cls, name):
+        """Slug of a category name, cut to fit the slug field"""
+        return slugify(name)[:cls.NAME_MAX_LENGTH].strip('-')
+
+    @classmethod
+    def for_title(cls, title):
+        """Get or create the category a quiz title belongs to"""
+        name = cls.name_from_title(title)
+        slug = cls.slug_for(name)
+        if not slug:
+            return None
+        category, _ = cls.objects.get_or_create(slug=slug, defaults={'name': name})
+        return category
+
+    @classmethod
+    def matching(cls, name):
+        """
+        Categories selected by a user supplied name.
+
+        An exact slug match wins; otherwise fall back to a substring match on
+        the (small) category table, so 'Science' still selects every
+        'Science: ...' category.
+        """
+        slug = cls.slug_for(name)
+        exact = cls.objects.filter(slug=slug)
+        if slug and exact.exists():
+            return exact
+        return cls.objects.filter(name__icontains=name.strip())
 
 class Quiz(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
+    category = models.ForeignKey(
+        Category, related_name='quizzes', null=True, blank=True, on_delete=models.SET_NULL
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
@@ -13,6 +71,37 @@ class Quiz(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Public quizzes are categorised from their title; saved custom results stay uncategorised
+        if self.category_id is None and self.is_active and not self.is_ai_generated:
+            self.category = Category.for_title(self.title)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def assign_categories(cls):
+        """
+        Categorise active quizzes that have no category yet, e.g. rows written by
+        loaddata, which bypasses save(). Returns the number of quizzes updated.
+        """
+        titles = cls.objects.filter(
+            category__isnull=True, is_active=True, is_ai_generated=False
+        ).values_list('id', 'title')
+
+        quiz_ids_by_slug = {}
+        names = {}
+        for quiz_id, title in titles:
+            name = Category.name_from_title(title)
+            slug = Category.slug_for(name)
+            if slug:
+                quiz_ids_by_slug.setdefault(slug, []).append(quiz_id)
+                names.setdefault(slug, name)
+
+        updated = 0
+        for slug, quiz_ids in quiz_ids_by_slug.items():
+            category, _ = Category.objects.get_or_create(slug=slug, defaults={'name': names[slug]})
+            updated += cls.objects.filter(id__in=quiz_ids).update(category=category)
+        return updated
+
 class Question(models.Model):
     QUESTION_TYPES = [
         ('multiple_choice', 'Multiple Choice'),
@@ -32,17 +121,135 @@ class Question(models.Model):
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default='medium')
     points = models.IntegerField(default=1)
     order = models.IntegerField(default=0)
+    # Fingerprint of the question and its choices (see content_hash_for), kept current
+    # by signals and load_quiz_fixtures; NULL for a repeat within the same quiz
+    content_hash = models.CharField(max_length=40, null=True, blank=True, editable=False)
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            # Custom quiz pools filter a category's quizzes by difficulty
+            models.Index(fields=['quiz', 'difficulty'], name='question_quiz_difficulty_idx'),
+            # Cursor pages and streams walk a quiz's questions in (order, id) order
+            models.Index(fields=['quiz', 'order', 'id'], name='question_quiz_order_idx'),
+        ]
+        constraints = [
+            # A quiz holds each question once; also serves the importers' existence checks
+            models.UniqueConstraint(fields=['quiz', 'content_hash'], name='unique_question_content_per_quiz'),
+        ]
     
     def __str__(self):
         return f"{self.quiz.title} - {self.question_text[:50]}"
 
+    @staticmethod
+    def content_hash_for(question_text, choice_texts):
+        """
+        SHA-1 of the normalized question text and its sorted choices.
+
+        Text is HTML-unescaped, whitespace-collapsed and case-folded, so the
+        same question imported raw or unescaped, or with its choices in a
+        different order, gets the same hash.
+        """
+        def normalize(text):
+            return ' '.join(html.unescape(text).split()).casefold()
+
+        choices = sorted(normalize(text) for text in choice_texts)
+        content = '\x1f'.join([normalize(question_text)] + choices)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def refresh_content_hash(self):
+        """
+        Recompute content_hash from the stored text and choices.
+
+        Called when the question or one of its choices is saved or deleted.
+        A question that repeats another one of its quiz keeps a NULL hash.
+        """
+        content_hash = Question.content_hash_for(
+            self.question_text, self.choices.values_list('choice_text', flat=True)
+        )
+        duplicate = Question.objects.filter(
+            quiz_id=self.quiz_id, content_hash=content_hash
+        ).exclude(pk=self.pk).exists()
+        if duplicate:
+            content_hash = None
+        if content_hash != self.content_hash:
+            self.content_hash = content_hash
+            Question.objects.filter(pk=self.pk).update(content_hash=content_hash)
+
+    @classmethod
+    def backfill_content_hashes(cls, batch_size=2000):
+        """
+        Hash questions written without one, e.g. by fixture loads, batch by batch.
+
+        Like refresh_content_hash, repeats within a quiz keep a NULL hash.
+        Returns the number of questions hashed.
+        """
+        hashed_count = 0
+        last_id = 0
+        while True:
+            questions = list(
+                cls.objects.filter(content_hash__isnull=True, id__gt=last_id)
+                .order_by('id').only('id', 'quiz_id', 'question_text')[:batch_size]
+            )
+            if not questions:
+                return hashed_count
+            last_id = questions[-1].id
+
+            choice_texts = {}
+            choices = Choice.objects.filter(
+                question_id__in=[question.id for question in questions]
+            ).values_list('question_id', 'choice_text')
+            for question_id, text in choices:
+                choice_texts.setdefault(question_id, []).append(text)
+
+            keys = {
+                question.id: (
+                    question.quiz_id,
+                    cls.content_hash_for(question.question_text, choice_texts.get(question.id, []))
+                )
+                for question in questions
+            }
+            taken = set(
+                cls.objects.filter(
+                    quiz_id__in={quiz_id for quiz_id, _ in keys.values()},
+                    content_hash__in={content_hash for _, content_hash in keys.values()}
+                ).values_list('quiz_id', 'content_hash')
+            )
+
+            hashed = []
+            for question in questions:
+                key = keys[question.id]
+                if key not in taken:
+                    taken.add(key)
+                    question.content_hash = key[1]
+                    hashed.append(question)
+            cls.objects.bulk_update(hashed, ['content_hash'], batch_size=batch_size)
+            hashed_count += len(hashed)
+
+    @classmethod
+    def refresh_content_hashes(cls, question_ids, batch_size=500):
+        """refresh_content_hash for each of the given questions, once each"""
+        question_ids = sorted(set(question_ids))
+        for start in range(0, len(question_ids), batch_size):
+            for question in cls.objects.filter(pk__in=question_ids[start:start + batch_size]):
+                question.refresh_content_hash()
+
+
+class ChoiceQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete the choices, then rehash each question that lost some once"""
+        question_ids = set(self.order_by().values_list('question_id', flat=True).distinct())
+        deleted = super().delete()
+        Question.refresh_content_hashes(question_ids)
+        return deleted
+
+
 class Choice(models.Model):
     question = models.ForeignKey(Question, related_name='choices', on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
     is_correct = models.BooleanField(default=False)
+
+    objects = ChoiceQuerySet.as_manager()
     
     def __str__(self):
         return self.choice_text
@@ -59,6 +266,22 @@ class QuizAttempt(models.Model):
     
     class Meta:
         unique_together = ['user', 'quiz']
+        indexes = [
+            # Per-quiz leaderboard: best completed attempts first
+            models.Index(
+                fields=['quiz', '-score', 'completed_at'],
+                name='attempt_quiz_board_idx',
+                condition=Q(is_completed=True),
+            ),
+            # A user's most recent completed attempts
+            models.Index(
+                fields=['user', '-completed_at'],
+                name='attempt_user_recent_idx',
+                condition=Q(is_completed=True),
+            ),
+            # Date based cleanup
+            models.Index(fields=['started_at'], name='attempt_started_at_idx'),
+        ]
     
     @property
     def percentage(self):
@@ -92,36 +315,105 @@ class UserProfile(models.Model):
     total_score = models.IntegerField(default=0)
     total_quizzes_completed = models.IntegerField(default=0)
     average_score_percentage = models.FloatField(default=0.0)
+    total_points_possible = models.IntegerField(default=0)  # Sum of total_points over counted attempts
     rank = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # Fields written by the bulk and incremental recompute paths
+    STATS_FIELDS = [
+        'total_quizzes_completed', 'total_score', 'total_points_possible',
+        'average_score_percentage', 'updated_at'
+    ]
     
     def update_stats(self):
-        """Update user statistics based on completed attempts (excluding AI-generated quizzes)"""
-        completed_attempts = QuizAttempt.objects.filter(
+        """
+        Recompute user statistics from all completed attempts (excluding AI-generated quizzes).
+
+        Submissions update the profile incrementally through record_attempt; this full
+        recompute is the repair path used by maintenance jobs and data cleanup.
+        """
+        stats = QuizAttempt.objects.filter(
             user=self.user,
             is_completed=True,
             quiz__is_ai_generated=False
+        ).aggregate(
+            completed=Count('id'),
+            total=Sum('score'),
+            possible=Sum('total_points'),
+            average=Avg('score') * 100.0 / NullIf(Avg('total_points'), 0.0)
         )
-        
-        self.total_quizzes_completed = completed_attempts.count()
-        self.total_score = completed_attempts.aggregate(
-            total=Sum('score')
-        )['total'] or 0
-        
-        if self.total_quizzes_completed > 0:
-            avg_percentage = completed_attempts.aggregate(
-                avg=Avg('score') * 100.0 / Avg('total_points')
-            )['avg'] or 0
-            self.average_score_percentage = round(avg_percentage, 2)
-        else:
-            self.average_score_percentage = 0.0
-            
+
+        self.total_quizzes_completed = stats['completed']
+        self.total_score = stats['total'] or 0
+        self.total_points_possible = stats['possible'] or 0
+        self.average_score_percentage = round(stats['average'] or 0, 2)
+
         self.save()
+
+    def record_attempt(self, attempt):
+        """
+        Apply a newly completed attempt to the stored statistics.
+
+        The counters are updated with a single atomic F-expression UPDATE, so the
+        cost does not depend on the number of attempts the user has made and
+        concurrent submissions cannot lose increments.
+        """
+        if not attempt.is_completed or attempt.quiz.is_ai_generated:
+            return
+
+        new_total_score = F('total_score') + attempt.score
+        new_points_possible = F('total_points_possible') + attempt.total_points
+
+        # Same definition as update_stats: sum of scores over sum of available points
+        average = Coalesce(
+            Round(
+                ExpressionWrapper(
+                    new_total_score * 100.0 / NullIf(new_points_possible, 0),
+                    output_field=FloatField()
+                ),
+                2
+            ),
+            Value(0.0)
+        )
+
+        UserProfile.objects.filter(pk=self.pk).update(
+            total_score=new_total_score,
+            total_quizzes_completed=F('total_quizzes_completed') + 1,
+            total_points_possible=new_points_possible,
+            average_score_percentage=average,
+            updated_at=timezone.now()
+        )
+        self.refresh_from_db(fields=[
+            'total_score', 'total_quizzes_completed', 'total_points_possible',
+            'average_score_percentage', 'updated_at'
+        ])
     
+    def get_current_rank(self):
+        """
+        Live rank derived on read (RANK() semantics, ties share a position).
+
+        Counts the ranked profiles ahead of this one on (total_score,
+        average_score_percentage) without writing to any other row.
+        Users without completed quizzes are unranked (0).
+        """
+        if self.total_quizzes_completed == 0:
+            return 0
+
+        ahead = UserProfile.objects.filter(total_quizzes_completed__gt=0).filter(
+            Q(total_score__gt=self.total_score) |
+            Q(total_score=self.total_score, average_score_percentage__gt=self.average_score_percentage)
+        ).count()
+        return ahead + 1
+
     @classmethod
     def update_all_ranks(cls):
-        """Update ranks for all users based on total score (excluding AI quizzes)"""
+        """
+        Update stored ranks for all users based on total score (excluding AI quizzes).
+
+        This rewrites every ranked row and is only meant for batch maintenance;
+        request paths read live ranks through get_current_rank or the leaderboard index.
+        """
         # Only rank users who have completed non-AI quizzes
         profiles = cls.objects.filter(
             total_quizzes_completed__gt=0
@@ -130,13 +422,387 @@ class UserProfile(models.Model):
         # Reset all ranks to 0 first
         cls.objects.all().update(rank=0)
 
-        # Assign ranks only to qualifying users
+        # Assign ranks only to qualifying users; equal keys share a rank
+        previous_key = None
         for index, profile in enumerate(profiles, 1):
-            profile.rank = index
+            if profile.leaderboard_key != previous_key:
+                rank = index
+                previous_key = profile.leaderboard_key
+            profile.rank = rank
             profile.save(update_fields=['rank'])
     
+    @classmethod
+    def bulk_recompute(cls, batch_size=1000):
+        """
+        Recompute totals, averages and stored ranks for every profile at once.
+
+        Uses a single UPDATE ... FROM statement on PostgreSQL, otherwise one
+        grouped aggregate over QuizAttempt followed by batched bulk_update.
+
+        Returns:
+            int: Number of profiles updated
+        """
+        if connection.vendor == 'postgresql':
+            return cls._bulk_recompute_sql()
+        return cls._bulk_recompute_orm(batch_size)
+
+    @classmethod
+    def _bulk_recompute_sql(cls):
+        profile_table = cls._meta.db_table
+        attempt_table = QuizAttempt._meta.db_table
+        quiz_table = Quiz._meta.db_table
+
+        sql = f"""
+            WITH stats AS (
+                SELECT a.user_id,
+                       COUNT(*) AS completed,
+                       SUM(a.score) AS score,
+                       SUM(a.total_points) AS possible
+                FROM {attempt_table} a
+                JOIN {quiz_table} q ON q.id = a.quiz_id
+                WHERE a.is_completed AND NOT q.is_ai_generated
+                GROUP BY a.user_id
+            ), computed AS (
+                SELECT p.id,
+                       COALESCE(s.completed, 0) AS completed,
+                       COALESCE(s.score, 0) AS score,
+                       COALESCE(s.possible, 0) AS possible,
+                       CASE WHEN COALESCE(s.possible, 0) > 0
+                            THEN ROUND(s.score * 100.0 / s.possible, 2)
+                            ELSE 0 END AS average
+                FROM {profile_table} p
+                LEFT JOIN stats s ON s.user_id = p.user_id
+            ), ranked AS (
+                SELECT c.*,
+                       CASE WHEN c.completed > 0
+                            THEN RANK() OVER (PARTITION BY c.completed > 0
+                                              ORDER BY c.score DESC, c.average DESC)
+                            ELSE 0 END AS rank
+                FROM computed c
+            )
+            UPDATE {profile_table} AS p
+            SET total_quizzes_completed = r.completed,
+                total_score = r.score,
+                total_points_possible = r.possible,
+                average_score_percentage = r.average,
+                rank = r.rank,
+                updated_at = %s
+            FROM ranked r
+            WHERE p.id = r.id
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [timezone.now()])
+            return cursor.rowcount
+
+    @classmethod
+    def _bulk_recompute_orm(cls, batch_size):
+        stats = cls._attempt_stats()
+
+        now = timezone.now()
+        profiles = list(cls.objects.only('id', 'user_id'))
+        for profile in profiles:
+            profile._apply_stats(stats.get(profile.user_id), now)
+
+        # RANK(): equal (total_score, average) pairs share a position
+        ranked = sorted(
+            (p for p in profiles if p.total_quizzes_completed > 0),
+            key=lambda p: (-p.total_score, -p.average_score_percentage)
+        )
+        previous_key = None
+        for position, profile in enumerate(ranked, 1):
+            key = (profile.total_score, profile.average_score_percentage)
+            if key != previous_key:
+                rank = position
+                previous_key = key
+            profile.rank = rank
+        for profile in profiles:
+            if profile.total_quizzes_completed == 0:
+                profile.rank = 0
+
+        with transaction.atomic():
+            cls.objects.bulk_update(
+                profiles, cls.STATS_FIELDS + ['rank'], batch_size=batch_size
+            )
+        return len(profiles)
+
+    @staticmethod
+    def _attempt_stats(user_ids=None):
+        """Per-user completed attempt totals from one grouped aggregate"""
+        attempts = QuizAttempt.objects.filter(
+            is_completed=True,
+            quiz__is_ai_generated=False
+        )
+        if user_ids is not None:
+            attempts = attempts.filter(user_id__in=user_ids)
+
+        return {
+            row['user_id']: row
+            for row in attempts.values('user_id').annotate(
+                completed=Count('id'),
+                score=Sum('score'),
+                possible=Sum('total_points')
+            )
+        }
+
+    def _apply_stats(self, row, now):
+        """Set statistics fields from an _attempt_stats row (None means no attempts)"""
+        self.total_quizzes_completed = row['completed'] if row else 0
+        self.total_score = (row['score'] or 0) if row else 0
+        self.total_points_possible = (row['possible'] or 0) if row else 0
+        if self.total_points_possible > 0:
+            self.average_score_percentage = round(
+                self.total_score * 100.0 / self.total_points_possible, 2
+            )
+        else:
+            self.average_score_percentage = 0.0
+        self.updated_at = now
+
+    @property
+    def leaderboard_key(self):
+        """(total_score, average) ordering key, or None when the user is unranked"""
+        if self.total_quizzes_completed == 0:
+            return None
+        return (self.total_score, self.average_score_percentage)
+
+    @classmethod
+    def incremental_update(cls, batch_size=1000, limit=None):
+        """
+        Recompute stats for users in the dirty set and re-rank only what moved.
+
+        A user moving from key A to key B can only change the stored rank of
+        profiles whose key lies between A and B, so only that key range is
+        re-ranked. Ranks above it are unchanged; ranks inside it are offset by
+        the number of profiles above it.
+
+        With a limit, only the `limit` longest-waiting users are processed and
+        the rest stay in the dirty set.
+
+        Returns:
+            tuple: (profiles recomputed, profiles re-ranked)
+        """
+        dirty_entries = LeaderboardDirtyUser.objects.order_by('marked_at', 'pk')
+        if limit is not None:
+            dirty_entries = dirty_entries[:limit]
+        dirty_entries = list(dirty_entries)
+        if not dirty_entries:
+            return 0, 0
+
+        user_ids = [entry.user_id for entry in dirty_entries]
+        stats = cls._attempt_stats(user_ids)
+        profiles = list(cls.objects.filter(user_id__in=user_ids))
+
+        now = timezone.now()
+        keys = [entry.previous_key for entry in dirty_entries]
+        for profile in profiles:
+            profile._apply_stats(stats.get(profile.user_id), now)
+            keys.append(profile.leaderboard_key)
+            if profile.total_quizzes_completed == 0:
+                profile.rank = 0
+
+        with transaction.atomic():
+            cls.objects.bulk_update(
+                profiles, cls.STATS_FIELDS + ['rank'], batch_size=batch_size
+            )
+            reranked = cls._rerank_range(keys, batch_size)
+
+            # Entries marked again while this ran have a later marked_at and stay for the next run
+            last_marked_at = max(entry.marked_at for entry in dirty_entries)
+            for start in range(0, len(dirty_entries), batch_size):
+                LeaderboardDirtyUser.objects.filter(
+                    pk__in=[entry.pk for entry in dirty_entries[start:start + batch_size]],
+                    marked_at__lte=last_marked_at
+                ).delete()
+
+        from .leaderboard import get_leaderboard_index
+        leaderboard_index = get_leaderboard_index()
+        for profile in profiles:
+            leaderboard_index.update_profile(profile)
+
+        return len(profiles), reranked
+
+    @classmethod
+    def _rerank_range(cls, keys, batch_size):
+        """Rewrite stored ranks for ranked profiles whose key lies within the span of keys"""
+        ranked_keys = [key for key in keys if key is not None]
+        if not ranked_keys:
+            return 0
+
+        high_score, high_average = max(ranked_keys)
+        above_high = (
+            Q(total_score__gt=high_score) |
+            Q(total_score=high_score, average_score_percentage__gt=high_average)
+        )
+        in_range = ~above_high
+
+        # An unranked old or new key extends the range to the bottom of the table
+        if None not in keys:
+            low_score, low_average = min(ranked_keys)
+            in_range &= (
+                Q(total_score__gt=low_score) |
+                Q(total_score=low_score, average_score_percentage__gte=low_average)
+            )
+
+        ranked_profiles = cls.objects.filter(total_quizzes_completed__gt=0)
+        offset = ranked_profiles.filter(above_high).count()
+
+        reranked = [
+            cls(id=profile_id, rank=offset + window_rank)
+            for profile_id, window_rank in ranked_profiles.filter(in_range).annotate(
+                window_rank=Window(
+                    expression=Rank(),
+                    order_by=[F('total_score').desc(), F('average_score_percentage').desc()]
+                )
+            ).values_list('id', 'window_rank')
+        ]
+        cls.objects.bulk_update(reranked, ['rank'], batch_size=batch_size)
+        return len(reranked)
+
     def __str__(self):
         return f"{self.user.username} - Rank #{self.rank}"
     
     class Meta:
         ordering = ['rank']
+        indexes = [
+            # Ranked profiles in stored rank order
+            models.Index(fields=['total_quizzes_completed', 'rank'], name='profile_completed_rank_idx'),
+            # Live ranking: RANK() windows, rank counts and the leaderboard index rebuild
+            models.Index(
+                fields=['-total_score', '-average_score_percentage'],
+                name='profile_ranking_idx',
+                condition=Q(total_quizzes_completed__gt=0),
+            ),
+        ]
+
+
+class LeaderboardDirtyUser(models.Model):
+    """
+    Users whose statistics changed since the last scheduled leaderboard update.
+
+    previous_total_score/previous_average hold the user's key as of the last
+    re-rank (null when the user was unranked), so the scheduled job knows
+    which rank range the change can have affected.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='+')
+    previous_total_score = models.IntegerField(null=True, blank=True)
+    previous_average = models.FloatField(null=True, blank=True)
+    marked_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Bounded updates take the longest-waiting users first; clear() drops by age
+            models.Index(fields=['marked_at', 'id'], name='dirty_user_marked_idx'),
+        ]
+
+    @property
+    def previous_key(self):
+        if self.previous_total_score is None:
+            return None
+        return (self.previous_total_score, self.previous_average)
+
+    @classmethod
+    def mark(cls, profiles):
+        """
+        Add profiles to the dirty set before their statistics change.
+
+        A user already in the set keeps the key recorded first, which is the
+        one its stored rank was computed from.
+        """
+        now = timezone.now()
+        entries = {}
+        for profile in profiles:
+            key = profile.leaderboard_key
+            entries[profile.user_id] = cls(
+                user_id=profile.user_id,
+                previous_total_score=key[0] if key else None,
+                previous_average=key[1] if key else None,
+                marked_at=now
+            )
+
+        cls.objects.bulk_create(
+            entries.values(),
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['marked_at']
+        )
+
+    @classmethod
+    def clear(cls, before):
+        """Drop entries made obsolete by a full recompute that started at `before`"""
+        cls.objects.filter(marked_at__lte=before).delete()
+
+    def __str__(self):
+        return f"{self.user_id} marked at {self.marked_at}"
+
+
+class ContentVersion(models.Model):
+    """
+    The quiz content version behind every cached quiz payload (see quizzes.cache).
+
+    A single row, so every worker process and management command reads and
+    bumps the same number whatever cache backend is configured.
+    """
+    version = models.BigIntegerField()
+
+    SINGLETON_ID = 1
+
+    @classmethod
+    def current(cls, initial):
+        """The stored version, creating the row with `initial()` if there is none yet"""
+        row, _ = cls.objects.get_or_create(pk=cls.SINGLETON_ID, defaults={'version': initial()})
+        return row.version
+
+    @classmethod
+    def bump(cls, initial):
+        """Increment the version atomically and return the new value"""
+        if not cls.objects.filter(pk=cls.SINGLETON_ID).update(version=F('version') + 1):
+            cls.current(initial)
+            cls.objects.filter(pk=cls.SINGLETON_ID).update(version=F('version') + 1)
+        return cls.objects.values_list('version', flat=True).get(pk=cls.SINGLETON_ID)
+
+    def __str__(self):
+        return f"Content version {self.version}"
+
+
+class AIQuizJob(models.Model):
+    """
+    One AI quiz generation request, run in the background by ai_jobs.
+
+    The id is a random UUID, so clients can poll their job without
+    authentication and without being able to guess other jobs.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    topic = models.CharField(max_length=200, blank=True)
+    difficulty = models.CharField(max_length=10, default='any')
+    question_count = models.IntegerField(default=10)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    result = models.JSONField(null=True, blank=True)  # Generated quiz in QuizDetail format
+    error = models.TextField(blank=True)
+    error_status = models.IntegerField(null=True, blank=True)  # HTTP status matching the error
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Expiring jobs abandoned by a dead worker process
+            models.Index(fields=['status', 'created_at'], name='ai_job_status_created_idx'),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
@@ -0,0 +1,212 @@
+"""
+Client for the Open Trivia Database (OpenTDB) API.
+
+All requests share one keep-alive session and one token bucket, so several
+categories can be fetched from a thread pool without exceeding the API's
+rate limit. Transient failures (connection errors, HTTP 429/5xx and the
+API's own rate-limit code) are retried with exponential backoff. OpenTDB
+returns at most 50 questions per request; larger amounts are paged with a
+session token, which guarantees no question is returned twice.
+
+OPENTDB_BASE_URL can point the client at quizzes.opentdb_stub for offline runs.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Largest amount OpenTDB returns per request
+MAX_AMOUNT_PER_REQUEST = 50
+
+# OpenTDB response codes
+RESPONSE_SUCCESS = 0
+RESPONSE_NO_RESULTS = 1
+RESPONSE_INVALID_PARAMETER = 2
+RESPONSE_TOKEN_NOT_FOUND = 3
+RESPONSE_TOKEN_EMPTY = 4
+RESPONSE_RATE_LIMIT = 5
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class OpenTDBError(Exception):
+    """Raised when OpenTDB cannot serve a request, even after retries"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Allows bursts of up to `capacity` requests and a sustained `rate`
+    requests per second; acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RetryableError(Exception):
+    """A failure worth retrying after a backoff"""
+
+
+class OpenTDBClient:
+    """
+    Rate limited, retrying OpenTDB client.
+
+    Args:
+        base_url: API root, OPENTDB_BASE_URL by default
+        rate: Sustained requests per second, OPENTDB_RATE_LIMIT by default
+        burst: Requests allowed back to back before the rate applies
+        max_retries: Retries per request after the first attempt
+        backoff: Base delay in seconds, doubled on every retry
+        timeout: Per request timeout in seconds
+        pool_size: Keep-alive connections kept open to the API
+    """
+
+    def __init__(self, base_url=None, rate=None, burst=1, max_retries=4, backoff=1.0,
+                 timeout=10, pool_size=8):
+        self.base_url = (base_url or settings.OPENTDB_BASE_URL).rstrip('/')
+        self.bucket = TokenBucket(rate or settings.OPENTDB_RATE_LIMIT, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get(self, path, params=None):
+        """GET a JSON document, retrying transient failures with backoff"""
+        url = f'{self.base_url}/{path}'
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                if response.status_code in RETRY_STATUS_CODES:
+                    raise RetryableError(f'HTTP {response.status_code}')
+                response.raise_for_status()
+                data = response.json()
+                if data.get('response_code') == RESPONSE_RATE_LIMIT:
+                    raise RetryableError('rate limited by OpenTDB')
+                return data
+            except (RetryableError, requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise OpenTDBError(f'{path} failed after {attempt + 1} attempts: {e}')
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f'OpenTDB {path} failed ({e}); retrying in {delay:.1f}s')
+                time.sleep(delay)
+            except (requests.RequestException, ValueError) as e:
+                raise OpenTDBError(f'{path} failed: {e}')
+
+    def categories(self):
+        """All categories as {'id', 'name'} dicts"""
+        return self._get('api_category.php').get('trivia_categories', [])
+
+    def request_token(self):
+        """A new session token; questions served with it are never repeated"""
+        data = self._get('api_token.php', {'command': 'request'})
+        if data.get('response_code') != RESPONSE_SUCCESS:
+            raise OpenTDBError(f'Could not get a session token (code {data.get("response_code")})')
+        return data['token']
+
+    def fetch_questions(self, category_id, amount, difficulty=None, token=None):
+        """
+        Fetch up to `amount` distinct multiple choice questions for a category.
+
+        Pages through the API 50 questions at a time with a session token and
+        stops early when the category runs out of questions.
+        """
+        token = token or self.request_token()
+        questions = []
+        page_size = MAX_AMOUNT_PER_REQUEST
+        token_refreshes = 0
+
+        while len(questions) < amount:
+            params = {
+                'amount': min(page_size, amount - len(questions)),
+                'category': category_id,
+                'type': 'multiple',
+                'token': token,
+            }
+            if difficulty:
+                params['difficulty'] = difficulty
+
+            data = self._get('api.php', params)
+            code = data.get('response_code')
+
+            if code == RESPONSE_SUCCESS:
+                results = data.get('results') or []
+                if not results:
+                    # A success without questions would otherwise be requested forever
+                    logger.warning(
+                        f'OpenTDB returned no questions for category {category_id}; '
+                        f'stopping at {len(questions)}/{amount}'
+                    )
+                    break
+                questions.extend(results)
+            elif code == RESPONSE_NO_RESULTS and params['amount'] > 1:
+                # Fewer questions left than requested: ask for smaller pages
+                page_size = max(1, params['amount'] // 2)
+            elif code in (RESPONSE_NO_RESULTS, RESPONSE_TOKEN_EMPTY):
+                break
+            elif code == RESPONSE_TOKEN_NOT_FOUND and token_refreshes < 3:
+                token = self.request_token()
+                token_refreshes += 1
+            else:
+                raise OpenTDBError(f'OpenTDB API error code: {code}')
+
+        return questions
+
+    def fetch_categories(self, categories, amount, difficulty=None, max_workers=None):
+        """
+        Fetch several categories concurrently.
+
+        Yields:
+            tuple: (category, questions, error) as each category finishes;
+            error is an OpenTDBError or None
+        """
+        max_workers = max_workers or settings.OPENTDB_MAX_WORKERS
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(self.fetch_questions, category['id'], amount, difficulty): category
+                for category in categories
+            }
+            for future in as_completed(futures):
+                category = futures[future]
+                try:
+                    yield category, future.result(), None
+                except OpenTDBError as e:
+                    yield category, [], e
@@ -0,0 +1,163 @@
+"""
+Local stand-in for the OpenTDB API, for offline imports and tests.
+
+Serves api_category.php, api_token.php and api.php with generated
+questions, and implements the parts of the API the client relies on:
+the 50 question cap, session tokens that never repeat a question,
+and the NO_RESULTS / TOKEN_EMPTY response codes. It can also fail the
+first few requests to exercise retries.
+
+    with OpenTDBStubServer(questions_per_category=120) as server:
+        client = OpenTDBClient(base_url=server.url, rate=100)
+"""
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_CATEGORIES = [
+    {'id': 9, 'name': 'General Knowledge'},
+    {'id': 17, 'name': 'Science & Nature'},
+    {'id': 22, 'name': 'Geography'},
+    {'id': 23, 'name': 'History'},
+]
+
+DIFFICULTIES = ['easy', 'medium', 'hard']
+
+
+def stub_question(category, number):
+    """Deterministic question `number` of a category, in OpenTDB's shape"""
+    return {
+        'type': 'multiple',
+        'difficulty': DIFFICULTIES[number % len(DIFFICULTIES)],
+        'category': category['name'],
+        'question': f'{category["name"]} question #{number} &amp; friends?',
+        'correct_answer': f'Right {number}',
+        'incorrect_answers': [f'Wrong {number}.{k}' for k in range(3)],
+    }
+
+
+class OpenTDBStubServer:
+    """
+    Threaded HTTP server imitating OpenTDB on 127.0.0.1.
+
+    Args:
+        categories: {'id', 'name'} dicts to serve
+        questions_per_category: Questions available in every category
+        fail_first: Number of initial requests answered with HTTP 503
+        empty_pages: Number of question requests answered with a success
+            code but no results, as OpenTDB occasionally does
+        port: Port to bind, 0 for any free port
+    """
+
+    def __init__(self, categories=None, questions_per_category=100, fail_first=0, empty_pages=0, port=0):
+        self.categories = categories or DEFAULT_CATEGORIES
+        self.questions_per_category = questions_per_category
+        self.failures_left = fail_first
+        self.empty_pages_left = empty_pages
+        self.tokens = {}
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def respond(self, path, params):
+        """Return (status, payload) for a request"""
+        with self.lock:
+            self.request_count += 1
+            if self.failures_left > 0:
+                self.failures_left -= 1
+                return 503, {'error': 'temporarily unavailable'}
+
+            if path == '/api_category.php':
+                return 200, {'trivia_categories': self.categories}
+            if path == '/api_token.php':
+                return 200, self._token(params)
+            if path == '/api.php':
+                return 200, self._questions(params)
+            return 404, {'error': 'not found'}
+
+    def _token(self, params):
+        if params.get('command') == 'request':
+            token = uuid.uuid4().hex
+            self.tokens[token] = {}
+            return {'response_code': 0, 'token': token}
+        if params.get('command') == 'reset' and params.get('token') in self.tokens:
+            self.tokens[params['token']] = {}
+            return {'response_code': 0, 'token': params['token']}
+        return {'response_code': 3}
+
+    def _questions(self, params):
+        try:
+            amount = int(params.get('amount', 10))
+            category = next(c for c in self.categories if c['id'] == int(params.get('category', 0)))
+        except (ValueError, StopIteration):
+            return {'response_code': 2, 'results': []}
+        if not 1 <= amount <= 50:
+            return {'response_code': 2, 'results': []}
+
+        token = params.get('token')
+        if token and token not in self.tokens:
+            return {'response_code': 3, 'results': []}
+
+        # A token remembers how far into each category it has been served
+        served = self.tokens[token].get(category['id'], 0) if token else 0
+        remaining = self.questions_per_category - served
+        if token and remaining == 0:
+            return {'response_code': 4, 'results': []}
+        if amount > remaining:
+            return {'response_code': 1, 'results': []}
+        if self.empty_pages_left > 0:
+            self.empty_pages_left -= 1
+            return {'response_code': 0, 'results': []}
+
+        if token:
+            self.tokens[token][category['id']] = served + amount
+        results = [stub_question(category, number) for number in range(served, served + amount)]
+        return {'response_code': 0, 'results': results}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                status, payload = server.respond(url.path, params)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,56 @@
+"""
+Cursor pagination for the questions of a single quiz.
+
+Questions are ordered by (order, id). A cursor encodes the position of the
+last question of a page, so fetching the next page is an indexed range
+scan whose cost does not depend on how deep into the quiz the client is.
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that cannot be decoded"""
+
+
+def encode_cursor(question):
+    """Opaque cursor pointing just after the given question"""
+    raw = f'{question.order}:{question.id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into an (order, id) position"""
+    try:
+        order, question_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return int(order), int(question_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(f'Invalid cursor: {cursor}')
+
+
+def paginate_questions(questions, cursor, page_size):
+    """
+    Return one page of questions and the cursor for the next page.
+
+    Args:
+        questions: Question queryset for a single quiz
+        cursor: Cursor from a previous page, or None for the first page
+        page_size: Maximum number of questions to return
+
+    Returns:
+        tuple: (list of questions, next cursor or None)
+    """
+    questions = questions.order_by('order', 'id')
+
+    if cursor:
+        order, question_id = decode_cursor(cursor)
+        questions = questions.filter(Q(order__gt=order) | Q(order=order, id__gt=question_id))
+
+    # Fetch one extra row to know whether another page follows
+    page = list(questions[:page_size + 1])
+    if len(page) > page_size:
+        page = page[:page_size]
+        return page, encode_cursor(page[-1])
+    return page, None
@@ -0,0 +1,87 @@
+"""
+Question pools for custom quiz generation.
+
+A pool is the list of question ids available for one (category, difficulty)
+pair. Pools are built once per quiz content version and kept both in the
+Django cache (shared between workers) and in a small per-process table, so
+generating a custom quiz only samples ids and then fetches the k chosen
+questions with their choices, instead of loading the whole category.
+"""
+import hashlib
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import cache_key
+from .models import Category, Question
+
+# Per-process pools keyed by their versioned cache key. Keys of older content
+# versions are never read again, so the table is simply reset when it grows.
+MAX_LOCAL_POOLS = 256
+
+_local_pools = {}
+_lock = threading.Lock()
+
+
+def _pool_key(category, difficulty):
+    digest = hashlib.md5(category.strip().lower().encode()).hexdigest()
+    return cache_key(f'question_pool:{digest}:{difficulty or "any"}')
+
+
+def _build_pool(category, difficulty):
+    questions = Question.objects.filter(
+        quiz__category__in=Category.matching(category),
+        quiz__is_active=True
+    )
+    if difficulty:
+        questions = questions.filter(difficulty=difficulty)
+    return tuple(questions.order_by().values_list('id', flat=True).distinct())
+
+
+def get_question_pool(category, difficulty=None):
+    """
+    Ids of the active questions matching a category and optional difficulty.
+
+    Args:
+        category: Category name, see Category.matching
+        difficulty: 'easy', 'medium', 'hard', or None for any
+
+    Returns:
+        tuple: Question ids, valid until quiz content next changes
+    """
+    key = _pool_key(category, difficulty)
+
+    pool = _local_pools.get(key)
+    if pool is not None:
+        return pool
+
+    pool = cache.get(key)
+    if pool is None:
+        pool = _build_pool(category, difficulty)
+        cache.set(key, pool, settings.QUIZ_CACHE_TIMEOUT)
+
+    with _lock:
+        if len(_local_pools) >= MAX_LOCAL_POOLS:
+            _local_pools.clear()
+        _local_pools[key] = pool
+    return pool
+
+
+def reset_question_pools():
+    """Drop this process's pools (the shared cached copies expire with the content version)"""
+    with _lock:
+        _local_pools.clear()
+
+
+def sample_questions(pool, count):
+    """
+    Fetch `count` random questions from a pool with their choices prefetched.
+
+    Returns:
+        list: Questions in sampled order
+    """
+    selected_ids = random.sample(pool, min(count, len(pool)))
+    questions = Question.objects.filter(id__in=selected_ids).prefetch_related('choices').in_bulk()
+    return [questions[question_id] for question_id in selected_ids if question_id in questions]
@@ -9,14 +9,32 @@ logger = logging.getLogger(__name__)
 scheduler = None
 
 def update_leaderboard_job():
-    """Job function to update leaderboard statistics and rankings"""
+    """Job function to update statistics and rankings for users that changed"""
     try:
         logger.info(f"Starting scheduled leaderboard update at {timezone.now()}")
-        call_command('update_leaderboard')
+        call_command('update_leaderboard', incremental=True)
         logger.info(f"Completed scheduled leaderboard update at {timezone.now()}")
     except Exception as e:
         logger.error(f"Error in scheduled leaderboard update: {str(e)}", exc_info=True)
 
+def rebuild_leaderboard_job():
+    """Job function to recompute every profile, repairing any drift from incremental updates"""
+    try:
+        logger.info(f"Starting full leaderboard rebuild at {timezone.now()}")
+        call_command('update_leaderboard', bulk=True)
+        logger.info(f"Completed full leaderboard rebuild at {timezone.now()}")
+    except Exception as e:
+        logger.error(f"Error in full leaderboard rebuild: {str(e)}", exc_info=True)
+
+def purge_ai_jobs_job():
+    """Job function to delete AI quiz generation jobs older than a day"""
+    try:
+        from .ai_jobs import purge_old_jobs
+        deleted = purge_old_jobs()
+        logger.info(f"Purged {deleted} old AI quiz jobs")
+    except Exception as e:
+        logger.error(f"Error purging AI quiz jobs: {str(e)}", exc_info=True)
+
 def start_scheduler():
     """Start the APScheduler for periodic leaderboard updates"""
     global scheduler
@@ -37,6 +55,25 @@ def start_scheduler():
         max_instances=1  # Prevent overlapping jobs
     )
 
+    # Full recompute once a day as a repair path
+    scheduler.add_job(
+        func=rebuild_leaderboard_job,
+        trigger=IntervalTrigger(hours=24),
+        id='leaderboard_rebuild_job',
+        name='Rebuild Leaderboard Statistics',
+        replace_existing=True,
+        max_instances=1
+    )
+
+    scheduler.add_job(
+        func=purge_ai_jobs_job,
+        trigger=IntervalTrigger(hours=1),
+        id='ai_job_purge_job',
+        name='Purge Old AI Quiz Jobs',
+        replace_existing=True,
+        max_instances=1
+    )
+
     # Start the scheduler
     scheduler.start()
     logger.info("Leaderboard scheduler started - updating every 5 minutes")
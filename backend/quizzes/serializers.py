@@ -16,12 +16,17 @@ class QuestionSerializer(serializers.ModelSerializer):
 
 class QuizListSerializer(serializers.ModelSerializer):
     question_count = serializers.SerializerMethodField()
+    category = serializers.StringRelatedField()
     
     class Meta:
         model = Quiz
-        fields = ['id', 'title', 'description', 'created_at', 'question_count']
+        fields = ['id', 'title', 'description', 'category', 'created_at', 'question_count']
     
     def get_question_count(self, obj):
+        # Annotated by QuizListView; fall back to a COUNT for plain instances
+        question_count = getattr(obj, 'question_count', None)
+        if question_count is not None:
+            return question_count
         return obj.questions.count()
 
 class QuizDetailSerializer(serializers.ModelSerializer):
@@ -33,8 +38,26 @@ class QuizDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'created_at', 'questions', 'total_points']
     
     def get_total_points(self, obj):
+        # Annotated by QuizDetailView; otherwise sum the (prefetched) questions
+        if hasattr(obj, 'total_points'):
+            return obj.total_points or 0
         return sum(question.points for question in obj.questions.all())
 
+class QuizSummarySerializer(serializers.ModelSerializer):
+    """Quiz metadata sent ahead of paginated or streamed questions"""
+    total_points = serializers.SerializerMethodField()
+    question_count = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Quiz
+        fields = ['id', 'title', 'description', 'created_at', 'total_points', 'question_count']
+    
+    def get_total_points(self, obj):
+        return obj.total_points or 0
+    
+    def get_question_count(self, obj):
+        return obj.question_count
+
 class AnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Answer
@@ -62,6 +85,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
+    rank = serializers.SerializerMethodField()
     
     class Meta:
         model = UserProfile
@@ -70,10 +94,18 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'total_score', 'total_quizzes_completed', 
             'average_score_percentage', 'rank'
         ]
+    
+    def get_rank(self, obj):
+        # Views attach the rank from the live leaderboard index when available
+        current_rank = getattr(obj, 'current_rank', None)
+        if current_rank is not None:
+            return current_rank
+        return obj.get_current_rank()
 
 class LeaderboardEntrySerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     display_name = serializers.SerializerMethodField()
+    rank = serializers.SerializerMethodField()
     
     class Meta:
         model = UserProfile
@@ -82,6 +114,13 @@ class LeaderboardEntrySerializer(serializers.ModelSerializer):
             'total_quizzes_completed', 'average_score_percentage'
         ]
     
+    def get_rank(self, obj):
+        # Set by the views from the live leaderboard index
+        current_rank = getattr(obj, 'current_rank', None)
+        if current_rank is not None:
+            return current_rank
+        return obj.get_current_rank()
+    
     def get_display_name(self, obj):
         user = obj.user
         if user.first_name and user.last_name:
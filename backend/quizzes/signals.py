@@ -0,0 +1,65 @@
+"""
+Signal handlers that keep cached quiz content, cached quiz leaderboards and
+question content hashes in sync with the database
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_quiz_content, quiz_leaderboard_key
+from .models import Category, Quiz, Question, Choice, QuizAttempt
+
+
+@receiver(post_save, sender=Quiz)
+def quiz_saved(sender, instance, created, **kwargs):
+    # New inactive quizzes (saved custom results) never appear in cached content
+    if created and not instance.is_active:
+        return
+    invalidate_quiz_content()
+
+
+@receiver(post_delete, sender=Quiz)
+def quiz_deleted(sender, instance, **kwargs):
+    if instance.is_active:
+        invalidate_quiz_content()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def quiz_content_changed(sender, instance, **kwargs):
+    invalidate_quiz_content()
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, **kwargs):
+    instance.refresh_content_hash()
+
+
+def _refresh_question_hash(question_id):
+    # instance.question may be a stale copy, so hash the stored question
+    question = Question.objects.filter(pk=question_id).first()
+    if question is not None:
+        question.refresh_content_hash()
+
+
+@receiver(post_save, sender=Choice)
+def choice_saved(sender, instance, **kwargs):
+    _refresh_question_hash(instance.question_id)
+
+
+@receiver(post_delete, sender=Choice)
+def choice_deleted(sender, instance, origin=None, **kwargs):
+    # Only single deletes rehash here: queryset deletes rehash each question once afterwards
+    # (ChoiceQuerySet.delete), and choices removed with their question or quiz leave nothing to rehash
+    if isinstance(origin, Choice):
+        _refresh_question_hash(instance.question_id)
+
+
+@receiver(post_save, sender=QuizAttempt)
+@receiver(post_delete, sender=QuizAttempt)
+def quiz_attempt_changed(sender, instance, **kwargs):
+    cache.delete(quiz_leaderboard_key(instance.quiz_id))
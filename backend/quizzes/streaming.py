@@ -0,0 +1,78 @@
+"""
+Streaming responses: newline-delimited JSON (NDJSON) and server-sent events (SSE)
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+SSE_CONTENT_TYPE = 'text/event-stream'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Lets clients negotiate NDJSON with Accept or ?format=ndjson.
+
+    Streaming views return a StreamingHttpResponse themselves; this renderer
+    only renders regular (e.g. error) responses as a single JSON line.
+    """
+    media_type = NDJSON_CONTENT_TYPE
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return JSONRenderer().render(data) + b'\n'
+
+
+def ndjson_line(data):
+    """Encode one record as a line of NDJSON"""
+    return json.dumps(data, cls=DjangoJSONEncoder) + '\n'
+
+
+def ndjson_response(records):
+    """Stream an iterable of records as NDJSON"""
+    response = StreamingHttpResponse(
+        (ndjson_line(record) for record in records),
+        content_type=NDJSON_CONTENT_TYPE
+    )
+    response['X-Accel-Buffering'] = 'no'  # Let reverse proxies flush each line
+    return response
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets clients negotiate SSE with Accept: text/event-stream or ?format=sse.
+
+    Like NDJSONRenderer, it only renders regular responses, as one 'error'
+    event (or 'message' for successful ones).
+    """
+    media_type = SSE_CONTENT_TYPE
+    format = 'sse'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        response = renderer_context.get('response') if renderer_context else None
+        event = 'error' if response is not None and response.status_code >= 400 else 'message'
+        return sse_event(data, event).encode('utf-8')
+
+
+def sse_event(data, event='message'):
+    """Encode one record as a server-sent event"""
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+def sse_response(records):
+    """Stream an iterable of records as server-sent events named after their 'type'"""
+    response = StreamingHttpResponse(
+        (sse_event(record, record.get('type', 'message')) for record in records),
+        content_type=SSE_CONTENT_TYPE
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
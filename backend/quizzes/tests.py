@@ -1,3 +1,1363 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .models import (
+    AIQuizJob, Category, ContentVersion, Quiz, Question, Choice, QuizAttempt, Answer, UserProfile,
+    LeaderboardDirtyUser
+)
+from . import ai_jobs
+from .ai_cache import AIQuizCache, Prewarmer, cache_key, reset_ai_quiz_cache
+from .ai_quiz import AIQuizError, FakeProvider, generate_quiz, set_provider, shard_sizes
+from .ai_stream import QuestionStreamParser
+from .cache import deferred_content_invalidation, get_content_version
+from .fixture_format import FixtureArchive
+from .fixture_loader import (
+    CHOICE_ID_STRIDE, FIXTURE_ID_BASE, FIXTURE_ID_END, BulkFixtureLoader, FixtureError, iter_fixture_objects,
+    find_pk_collisions
+)
+from .management.commands import create_opentdb_fixtures
+from .leaderboard import LocalSortedSet, SortedSetBackend, get_leaderboard_index, reset_leaderboard_index
+from .opentdb import OpenTDBClient
+from .opentdb_stub import OpenTDBStubServer, DEFAULT_CATEGORIES, stub_question
+from .question_pool import reset_question_pools
+
+
+def create_quiz(title, question_count, choices_per_question=4):
+    """Create an active quiz with the given number of questions and choices"""
+    quiz = Quiz.objects.create(title=title)
+    for i in range(question_count):
+        question = Question.objects.create(
+            quiz=quiz, question_text=f'{title} question {i + 1}', points=2, order=i + 1
+        )
+        for j in range(choices_per_question):
+            Choice.objects.create(question=question, choice_text=f'Choice {j + 1}', is_correct=(j == 0))
+    return quiz
+
+
+# The content version is re-read at most once per check interval; keep that read out of the budgets
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    QUIZ_CONTENT_VERSION_CHECK_INTERVAL=3600
+)
+class QuizQueryBudgetTests(TestCase):
+    """Quiz list and detail must issue a fixed number of queries regardless of size"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_quiz_list_uses_single_query(self):
+        for i in range(5):
+            create_quiz(f'Quiz {i}', question_count=3)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('quiz-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 5)
+        self.assertTrue(all(quiz['question_count'] == 3 for quiz in response.json()))
+
+    def test_quiz_detail_query_count_is_independent_of_size(self):
+        small = create_quiz('Small', question_count=2)
+        large = create_quiz('Large', question_count=40)
+
+        # Quiz with annotated total, questions, choices
+        for quiz, expected_points in [(small, 4), (large, 80)]:
+            cache.clear()
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse('quiz-detail', args=[quiz.id]))
+
+            data = response.json()
+            self.assertEqual(data['total_points'], expected_points)
+            self.assertTrue(all(len(question['choices']) == 4 for question in data['questions']))
+
+    def test_cached_quiz_detail_does_not_query(self):
+        quiz = create_quiz('Cached', question_count=5)
+        url = reverse('quiz-detail', args=[quiz.id])
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ContentCacheTests(TestCase):
+    """Content changes bump the cache version; unchanged payloads revalidate with a 304"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.quiz = create_quiz('History - Quiz', question_count=2)
+
+    def assertBumps(self, change, bumps=True):
+        version = get_content_version()
+        change()
+        if bumps:
+            self.assertGreater(get_content_version(), version)
+        else:
+            self.assertEqual(get_content_version(), version)
+
+    def test_content_changes_bump_version(self):
+        question = self.quiz.questions.first()
+        choice = question.choices.first()
+
+        self.assertBumps(lambda: Choice.objects.create(question=question, choice_text='New', is_correct=False))
+        self.assertBumps(lambda: choice.save())
+        self.assertBumps(lambda: choice.delete())
+        self.assertBumps(lambda: question.save())
+        self.assertBumps(lambda: self.quiz.category.save())
+        self.assertBumps(lambda: create_quiz('Geography - Quiz', question_count=0))
+        # Saved custom results are inactive and never listed
+        self.assertBumps(lambda: Quiz.objects.create(title='Custom', is_active=False), bumps=False)
+        self.assertBumps(lambda: Quiz.objects.get(title='Custom').delete(), bumps=False)
+        self.assertBumps(lambda: self.quiz.delete())
+
+    def test_bumps_by_other_processes_reach_this_one(self):
+        url = reverse('quiz-detail', args=[self.quiz.id])
+        etag = self.client.get(url)['ETag']
+
+        # Another worker or an import command edits content and bumps the stored version
+        Choice.objects.filter(question__quiz=self.quiz).update(choice_text='Imported')
+        ContentVersion.objects.update(version=F('version') + 1)
+
+        with override_settings(QUIZ_CONTENT_VERSION_CHECK_INTERVAL=0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Imported', response.content)
+
+    def test_deferred_invalidation_bumps_once(self):
+        version = get_content_version()
+        with deferred_content_invalidation():
+            with deferred_content_invalidation():
+                create_quiz('Geography - Quiz', question_count=3)
+            self.assertEqual(get_content_version(), version)
+        self.assertEqual(get_content_version(), version + 1)
+
+    def test_etag_revalidation(self):
+        url = reverse('quiz-detail', args=[self.quiz.id])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"stale", {etag}')
+        self.assertEqual((response.status_code, response.content), (304, b''))
+        self.assertEqual(response['ETag'], etag)
+
+        choice = self.quiz.questions.first().choices.first()
+        choice.choice_text = 'Changed'
+        choice.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(b'Changed', response.content)
+
+        list_etag = self.client.get(reverse('quiz-list'))['ETag']
+        self.assertEqual(self.client.get(reverse('quiz-list'), HTTP_IF_NONE_MATCH=list_etag).status_code, 304)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QuizDetailPaginationTests(TestCase):
+    """Large quizzes can be fetched page by page or streamed"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.quiz = create_quiz('Paged', question_count=7, choices_per_question=2)
+
+    def test_cursor_pages_cover_every_question_once(self):
+        url = reverse('quiz-detail', args=[self.quiz.id])
+        seen = []
+        params = {'page_size': 3}
+
+        while True:
+            data = self.client.get(url, params).json()
+            seen.extend(question['id'] for question in data['questions'])
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+
+        self.assertEqual(data['question_count'], 7)
+        self.assertEqual(seen, list(self.quiz.questions.order_by('order', 'id').values_list('id', flat=True)))
+
+    def test_ndjson_stream_yields_header_then_questions(self):
+        response = self.client.get(
+            reverse('quiz-detail', args=[self.quiz.id]), HTTP_ACCEPT='application/x-ndjson'
+        )
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(len(lines), 8)
+        self.assertIn('"type": "quiz"', lines[0])
+        self.assertTrue(all('"type": "question"' in line for line in lines[1:]))
+
+
+# The content version is re-read at most once per check interval; keep that read out of the budgets
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    QUIZ_CONTENT_VERSION_CHECK_INTERVAL=3600
+)
+class CustomQuizPoolTests(TestCase):
+    """Custom quizzes sample from a cached id pool instead of loading the category"""
+
+    def setUp(self):
+        cache.clear()
+        reset_question_pools()
+        self.client = APIClient()
+        create_quiz('History - Part 1', question_count=30)
+        create_quiz('History - Part 2', question_count=30)
+        create_quiz('Science - Part 1', question_count=5)
+
+    def generate(self, **data):
+        return self.client.post(reverse('generate-custom-quiz'), data, format='json')
+
+    def test_warm_pool_fetches_questions_and_choices_in_two_queries(self):
+        self.generate(category='History', question_count=10)
+
+        with self.assertNumQueries(2):
+            response = self.generate(category='history', question_count=10)
+
+        data = response.json()
+        self.assertEqual(len(data['questions']), 10)
+        self.assertEqual(len({question['id'] for question in data['questions']}), 10)
+        self.assertTrue(all(len(question['choices']) == 4 for question in data['questions']))
+        self.assertTrue(all(question['question_text'].startswith('History') for question in data['questions']))
+
+    def test_malformed_requests_are_rejected(self):
+        for data in [
+            {}, {'category': '  '}, {'category': ['History']}, {'category': {'name': 'History'}},
+            {'category': 42}, {'category': 'History', 'difficulty': ['easy']},
+            {'category': 'History', 'question_count': 'ten'}, {'category': 'History', 'question_count': None},
+        ]:
+            self.assertEqual(self.generate(**data).status_code, 400, data)
+
+    def test_pool_refreshes_when_content_changes(self):
+        self.assertEqual(len(self.generate(category='Science', question_count=10).json()['questions']), 5)
+
+        create_quiz('Science - Part 2', question_count=5)
+
+        data = self.generate(category='Science', question_count=10).json()
+        self.assertEqual(len(data['questions']), 10)
+        self.assertNotIn('warning', data)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CategoryTests(TestCase):
+    """Quizzes are linked to a Category derived from their title"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_quiz_title_assigns_category(self):
+        first = create_quiz('Science: Computers - Quiz 1', question_count=1)
+        second = create_quiz('Science: Computers - Quiz 2', question_count=1)
+        create_quiz('Science & Nature - Quiz', question_count=1)
+
+        self.assertEqual(first.category.name, 'Science: Computers')
+        self.assertEqual(first.category_id, second.category_id)
+        self.assertEqual(Category.matching('science: computers').count(), 1)
+        self.assertEqual(Category.matching('Science').count(), 2)
+
+    def test_long_titles_fit_category_fields(self):
+        prefix = 'Very Long Category ' * 8
+        first = create_quiz(f'{prefix}One - Quiz', question_count=1)
+        second = create_quiz(f'{prefix}Two - Quiz', question_count=1)
+
+        self.assertGreater(len(prefix), 100)
+        self.assertEqual(first.category.name, prefix[:100].strip())
+        self.assertLessEqual(len(first.category.slug), 100)
+        self.assertFalse(first.category.slug.endswith('-'))
+        # Titles that only differ past the limit share a category
+        self.assertEqual(first.category_id, second.category_id)
+        self.assertEqual(Category.matching(f'{prefix}Three').get(), first.category)
+
+        Quiz.objects.filter(id=first.id).update(category=None)
+        Category.objects.all().delete()
+        self.assertEqual(Quiz.assign_categories(), 2)
+
+    def test_assign_categories_backfills_uncategorised_quizzes(self):
+        quiz = create_quiz('History - Quiz', question_count=1)
+        Quiz.objects.filter(id=quiz.id).update(category=None)
+
+        self.assertEqual(Quiz.assign_categories(), 1)
+        quiz.refresh_from_db()
+        self.assertEqual(quiz.category.slug, 'history')
+
+    def test_quiz_list_filters_by_category(self):
+        create_quiz('History - Quiz', question_count=1)
+        create_quiz('Geography - Quiz', question_count=1)
+
+        data = self.client.get(reverse('quiz-list'), {'category': 'History'}).json()
+        self.assertEqual([quiz['category'] for quiz in data], ['History'])
+
+
+class QuizSubmissionTests(TestCase):
+    """Submissions are graded in memory against an answer key loaded in one query"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.quiz = create_quiz('History - Quiz', question_count=4)
+        self.other = create_quiz('Geography - Quiz', question_count=1)
+        self.user = User.objects.create(username='player')
+        reset_leaderboard_index()
+        self.addCleanup(reset_leaderboard_index)
+
+    def test_grading_ignores_foreign_questions_and_choices(self):
+        q1, q2, q3, q4 = self.quiz.questions.order_by('order')
+        foreign = self.other.questions.get()
+        correct = {q.id: q.choices.get(is_correct=True).id for q in [q1, q2, q3, q4, foreign]}
+        wrong = q2.choices.filter(is_correct=False).first().id
+
+        answers = [
+            {'question_id': q1.id, 'selected_choice_id': correct[q1.id]},
+            {'question_id': q2.id, 'selected_choice_id': wrong},
+            # Correct choice of another question of the same quiz
+            {'question_id': q3.id, 'selected_choice_id': correct[q4.id]},
+            {'question_id': q4.id, 'selected_choice_id': 'not a number'},
+            {'question_id': foreign.id, 'selected_choice_id': correct[foreign.id]},
+        ]
+        response = self.client.post(reverse('submit-quiz'), {
+            'quiz_id': self.quiz.id, 'user_id': self.user.id, 'answers': answers
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['score'], response.data['total_points']), (2, 8))
+        self.assertEqual(response.data['percentage'], 25)
+
+        answers = Answer.objects.filter(attempt_id=response.data['attempt_id']).order_by('question__order')
+        self.assertEqual(
+            [(a.question_id, a.selected_choice_id, a.is_correct) for a in answers],
+            [(q1.id, correct[q1.id], True), (q2.id, wrong, False), (q3.id, None, False), (q4.id, None, False)]
+        )
+
+        response = self.client.post(reverse('submit-quiz'), {
+            'quiz_id': self.quiz.id, 'user_id': self.user.id, 'answers': []
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+def complete_attempt(user, quiz, score, total_points):
+    return QuizAttempt.objects.create(
+        user=user, quiz=quiz, score=score, total_points=total_points,
+        is_completed=True, completed_at=timezone.now()
+    )
+
+
+class UserProfileStatsTests(TestCase):
+    """Profile statistics kept incrementally match a full recompute"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='player')
+        self.profile = UserProfile.objects.create(user=self.user)
+        self.quizzes = [Quiz.objects.create(title=f'History - Quiz {i}') for i in range(3)]
+
+    def test_record_attempt_keeps_running_totals_and_average(self):
+        for quiz, (score, total_points) in zip(self.quizzes, [(3, 4), (1, 6), (5, 5)]):
+            self.profile.record_attempt(complete_attempt(self.user, quiz, score, total_points))
+
+        self.assertEqual(
+            (self.profile.total_quizzes_completed, self.profile.total_score, self.profile.total_points_possible),
+            (3, 9, 15)
+        )
+        # Sum of scores over sum of available points, not a mean of percentages
+        self.assertEqual(self.profile.average_score_percentage, 60.0)
+
+        incremental = UserProfile.objects.values_list(
+            'total_quizzes_completed', 'total_score', 'total_points_possible', 'average_score_percentage'
+        ).get(pk=self.profile.pk)
+        # One aggregate over the attempts and one save
+        with self.assertNumQueries(2):
+            self.profile.update_stats()
+        self.assertEqual(
+            incremental,
+            (self.profile.total_quizzes_completed, self.profile.total_score,
+             self.profile.total_points_possible, self.profile.average_score_percentage)
+        )
+
+    def test_record_attempt_skips_ai_and_unfinished_attempts(self):
+        ai_quiz = Quiz.objects.create(title='AI Quiz', is_ai_generated=True, is_active=False)
+        self.profile.record_attempt(complete_attempt(self.user, ai_quiz, 5, 5))
+        self.profile.record_attempt(
+            QuizAttempt.objects.create(user=self.user, quiz=self.quizzes[0], score=2, total_points=4)
+        )
+
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.total_quizzes_completed, self.profile.average_score_percentage), (0, 0.0))
+
+        self.profile.record_attempt(complete_attempt(self.user, self.quizzes[1], 0, 0))
+        self.assertEqual((self.profile.total_quizzes_completed, self.profile.average_score_percentage), (1, 0.0))
+
+
+class BulkRecomputeTests(TestCase):
+    """bulk_recompute produces the same profiles as per-user update_stats plus update_all_ranks"""
+
+    STAT_FIELDS = (
+        'user__username', 'total_quizzes_completed', 'total_score', 'total_points_possible',
+        'average_score_percentage', 'rank'
+    )
+
+    def setUp(self):
+        quizzes = [Quiz.objects.create(title=f'History - Quiz {i}') for i in range(4)]
+        ai_quiz = Quiz.objects.create(title='AI Quiz', is_ai_generated=True, is_active=False)
+        # Scores per user; ann and bob tie on score and average behind cid
+        results = {
+            'ann': [(4, 5), (2, 5)], 'bob': [(3, 5), (3, 5)], 'cid': [(1, 3), (2, 7), (4, 4)],
+            'dan': [(0, 0)], 'eve': [],
+        }
+        for username, scores in results.items():
+            user = User.objects.create(username=username)
+            UserProfile.objects.create(user=user)
+            for quiz, (score, total_points) in zip(quizzes, scores):
+                complete_attempt(user, quiz, score, total_points)
+            complete_attempt(user, ai_quiz, 9, 9)
+            QuizAttempt.objects.create(user=user, quiz=quizzes[3], score=9, total_points=9)
+
+        for profile in UserProfile.objects.all():
+            profile.update_stats()
+        UserProfile.update_all_ranks()
+        self.expected = self.snapshot()
+
+        # Stale values the recompute has to overwrite
+        UserProfile.objects.update(total_score=99, average_score_percentage=1.5, total_quizzes_completed=7, rank=3)
+
+    def snapshot(self):
+        return list(UserProfile.objects.order_by('user__username').values_list(*self.STAT_FIELDS))
+
+    def test_bulk_recompute_matches_per_user_path(self):
+        self.assertEqual(UserProfile.bulk_recompute(), 5)
+        self.assertEqual(self.snapshot(), self.expected)
+
+    def test_orm_fallback_matches_per_user_path(self):
+        UserProfile._bulk_recompute_orm(batch_size=2)
+        self.assertEqual(self.snapshot(), self.expected)
+        ranks = dict(UserProfile.objects.values_list('user__username', 'rank'))
+        self.assertEqual(ranks, {'ann': 2, 'bob': 2, 'cid': 1, 'dan': 4, 'eve': 0})
+
+
+class IncrementalUpdateTests(TestCase):
+    """Re-ranking only the moved key range gives the same stored ranks as a full re-rank"""
+
+    def setUp(self):
+        self.quizzes = [Quiz.objects.create(title=f'History - Quiz {i}') for i in range(3)]
+        self.users = {}
+        for username, score in [('ann', 9), ('bob', 7), ('cid', 5), ('dan', 3), ('eve', 1)]:
+            user = self.users[username] = User.objects.create(username=username)
+            complete_attempt(user, self.quizzes[0], score, 10)
+            UserProfile.objects.create(user=user).update_stats()
+        UserProfile.update_all_ranks()
+
+    def play(self, username, quiz, score):
+        profile = UserProfile.objects.get(user=self.users[username])
+        LeaderboardDirtyUser.mark([profile])
+        complete_attempt(self.users[username], quiz, score, 10)
+
+    def stored_ranks(self):
+        return dict(UserProfile.objects.values_list('user__username', 'rank'))
+
+    def assertMatchesFullRerank(self):
+        ranks = self.stored_ranks()
+        UserProfile.update_all_ranks()
+        self.assertEqual(ranks, self.stored_ranks())
+
+    def test_only_the_moved_range_is_reranked(self):
+        # dan passes bob and cid; ann above and eve below keep their ranks
+        self.play('dan', self.quizzes[1], 5)
+
+        self.assertEqual(UserProfile.incremental_update(), (1, 3))
+        self.assertEqual(self.stored_ranks(), {'ann': 1, 'dan': 2, 'bob': 3, 'cid': 4, 'eve': 5})
+        self.assertMatchesFullRerank()
+        self.assertFalse(LeaderboardDirtyUser.objects.exists())
+
+    def test_losing_all_attempts_unranks_and_closes_the_gap(self):
+        LeaderboardDirtyUser.mark([UserProfile.objects.get(user=self.users['bob'])])
+        QuizAttempt.objects.filter(user=self.users['bob']).delete()
+
+        UserProfile.incremental_update()
+        self.assertEqual(self.stored_ranks(), {'ann': 1, 'bob': 0, 'cid': 2, 'dan': 3, 'eve': 4})
+        self.assertMatchesFullRerank()
+
+    def test_entry_marked_again_mid_run_stays_dirty(self):
+        self.play('eve', self.quizzes[1], 10)
+        self.play('cid', self.quizzes[1], 1)
+        rerank_range = UserProfile._rerank_range
+
+        def rerank_then_play(keys, batch_size):
+            # eve finishes another quiz while the update is running
+            self.play('eve', self.quizzes[2], 10)
+            return rerank_range(keys, batch_size)
+
+        with mock.patch.object(UserProfile, '_rerank_range', side_effect=rerank_then_play):
+            self.assertEqual(UserProfile.incremental_update()[0], 2)
+        self.assertEqual(list(LeaderboardDirtyUser.objects.values_list('user__username', flat=True)), ['eve'])
+
+        UserProfile.incremental_update()
+        self.assertEqual(UserProfile.objects.get(user=self.users['eve']).total_score, 21)
+        self.assertEqual(self.stored_ranks()['eve'], 1)
+        self.assertMatchesFullRerank()
+
+    def test_limit_leaves_the_newest_entries(self):
+        for username in ['eve', 'dan', 'ann']:
+            self.play(username, self.quizzes[1], 2)
+
+        self.assertEqual(UserProfile.incremental_update(limit=2)[0], 2)
+        self.assertEqual(list(LeaderboardDirtyUser.objects.values_list('user__username', flat=True)), ['ann'])
+
+    @override_settings(LEADERBOARD_SYNC_UPDATE_LIMIT=2)
+    def test_cleanup_recomputes_a_bounded_number_of_profiles(self):
+        QuizAttempt.objects.update(started_at=timezone.now() - timedelta(days=2))
+        cutoff = (timezone.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+
+        response = APIClient().post(reverse('cleanup-quiz-data'), {'cutoff_date': cutoff}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['profiles_updated'], response.data['profiles_pending']), (2, 3))
+
+        UserProfile.incremental_update()
+        self.assertEqual(UserProfile.objects.filter(total_quizzes_completed__gt=0).count(), 0)
+        self.assertEqual(set(self.stored_ranks().values()), {0})
+
+
+def create_profile(username, total_score, average, completed=1):
+    return UserProfile.objects.create(
+        user=User.objects.create(username=username), total_score=total_score,
+        average_score_percentage=average, total_quizzes_completed=completed
+    )
+
+
+class LeaderboardRankTests(TestCase):
+    """Live ranks follow RANK() over (total_score, average): ties share a position"""
+
+    def setUp(self):
+        self.profiles = {
+            name: create_profile(name, score, average)
+            for name, score, average in [
+                ('ann', 50, 80.0), ('bob', 40, 90.0), ('cid', 40, 90.0), ('dan', 40, 70.0), ('eve', 10, 50.0)
+            ]
+        }
+        self.profiles['new'] = create_profile('new', 0, 0.0, completed=0)
+
+    def test_get_current_rank(self):
+        ranks = {name: profile.get_current_rank() for name, profile in self.profiles.items()}
+        self.assertEqual(ranks, {'ann': 1, 'bob': 2, 'cid': 2, 'dan': 4, 'eve': 5, 'new': 0})
+
+    def check_index(self, backend):
+        ids = {name: profile.user_id for name, profile in self.profiles.items()}
+        with override_settings(LEADERBOARD_INDEX_BACKEND=backend):
+            reset_leaderboard_index()
+            self.addCleanup(reset_leaderboard_index)
+            index = get_leaderboard_index()
+
+        self.assertEqual(index.count(), 5)
+        ranks = {name: index.rank_of(user_id) for name, user_id in ids.items()}
+        self.assertEqual(ranks, {'ann': 1, 'bob': 2, 'cid': 2, 'dan': 4, 'eve': 5, 'new': 0})
+
+        # Tied users share a rank in any order; a limit past the end returns everyone
+        top = index.top(10)
+        self.assertEqual([entry.rank for entry in top], [1, 2, 2, 4, 5])
+        self.assertEqual({entry.user_id for entry in top[1:3]}, {ids['bob'], ids['cid']})
+        self.assertEqual((top[1].total_score, top[1].average_score_percentage), (40, 90.0))
+        self.assertEqual([entry.rank for entry in index.top(2)], [1, 2])
+        self.assertEqual(index.top(0), [])
+
+        # Windows are clipped at both ends of the board
+        self.assertEqual([entry.rank for entry in index.around(ids['ann'], 1)], [1, 2])
+        self.assertEqual([entry.rank for entry in index.around(ids['eve'], 1)], [4, 5])
+        self.assertEqual([entry.rank for entry in index.around(ids['dan'], 10)], [1, 2, 2, 4, 5])
+        self.assertEqual(index.around(ids['new'], 2), [])
+        # A window that starts inside a tie still reports the shared rank
+        self.assertEqual([entry.rank for entry in index.around(ids['dan'], 1)], [2, 4, 5])
+
+        # Moving a user is reflected in their rank and the users they pass
+        profile = self.profiles['eve']
+        profile.total_score, profile.average_score_percentage = 45, 60.0
+        profile.save()
+        index.update_profile(profile)
+        self.assertEqual(index.rank_of(ids['eve']), 2)
+        self.assertEqual(index.rank_of(ids['dan']), 5)
+        return index
+
+    def test_database_index(self):
+        index = self.check_index('database')
+        self.assertTrue(index.shared)
+
+    def test_memory_index(self):
+        index = self.check_index('memory')
+        self.assertFalse(index.shared)
+
+    def test_sortedset_index(self):
+        self.check_index('sortedset')
+
+    def test_sortedset_rebuild_swaps_in_new_set(self):
+        client = LocalSortedSet()
+        backend = SortedSetBackend(client, key='board')
+        backend.upsert(1, 10)
+        backend.upsert(2, 20)
+
+        backend.replace([(2, 30), (3, 5)])
+        self.assertEqual(client.zrevrange('board', 0, -1, withscores=True), [('2', 30), ('3', 5)])
+        self.assertEqual(list(client._sets), ['board'])
+
+        backend.replace([])
+        self.assertEqual(client.zcard('board'), 0)
+
+    def test_leaderboard_params_validated(self):
+        client = APIClient()
+        for params in ({'limit': 'x'}, {'user_id': 'me'}, {'window': '1.5'}, {'limit': -1}):
+            response = client.get(reverse('global-leaderboard'), params)
+            self.assertEqual(response.status_code, 400, params)
+
+        response = client.get(reverse('global-leaderboard'), {'user_id': self.profiles['dan'].user_id, 'window': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user_rank'], 4)
+        self.assertEqual([entry['rank'] for entry in response.data['around_me']], [2, 4, 5])
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        QUIZ_CONTENT_VERSION_CHECK_INTERVAL=3600
+    )
+    def test_quiz_leaderboard_is_cached_until_an_attempt_changes(self):
+        cache.clear()
+        client = APIClient()
+        quiz = create_quiz('History - Quiz', question_count=1)
+        url = reverse('quiz-leaderboard', args=[quiz.id])
+        complete_attempt(self.profiles['ann'].user, quiz, 2, 2)
+        self.assertEqual(len(client.get(url).data['leaderboard']), 1)
+
+        with self.assertNumQueries(0):
+            client.get(url)
+
+        attempt = complete_attempt(self.profiles['bob'].user, quiz, 1, 2)
+        self.assertEqual([entry['username'] for entry in client.get(url).data['leaderboard']], ['ann', 'bob'])
+        attempt.delete()
+        self.assertEqual(len(client.get(url).data['leaderboard']), 1)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    LEADERBOARD_INDEX_BACKEND='database'
+)
+class QueryPlanTests(TestCase):
+    """
+    The hot request paths must be served by indexes, not sequential scans.
+
+    Each test calls a view, captures the statements it runs and EXPLAINs
+    them. On PostgreSQL sequential scans are disabled for the session, so a
+    plan that still contains one means no usable index exists. On SQLite a
+    full table scan shows up as a bare 'SCAN <table>' in EXPLAIN QUERY PLAN.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        quizzes = [create_quiz(f'History - Quiz {i}', question_count=3, choices_per_question=2) for i in range(3)]
+        for i in range(20):
+            user = User.objects.create(username=f'player{i}')
+            for j, quiz in enumerate(quizzes):
+                attempt = QuizAttempt.objects.create(
+                    user=user, quiz=quiz, score=(i + j) % 7, total_points=6,
+                    is_completed=(i + j) % 3 != 0, completed_at=now - timedelta(minutes=i + j)
+                )
+                question = quiz.questions.first()
+                Answer.objects.create(attempt=attempt, question=question, selected_choice=question.choices.first())
+            profile = UserProfile.objects.create(user=user)
+            profile.update_stats()
+
+        # Most registered users have not played recently; without them every
+        # plan over a 20-row profile table is a scan
+        idle_users = User.objects.bulk_create(User(username=f'idle{i}') for i in range(200))
+        UserProfile.objects.bulk_create(UserProfile(user=user) for user in idle_users)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+        reset_leaderboard_index()
+        self.addCleanup(reset_leaderboard_index)
+        self.client = APIClient()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                return '\n'.join(row[0] for row in cursor.fetchall())
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def assertViewUsesIndexes(self, method, url, data=None, ordered=False):
+        """
+        Call a view and check the plan of every statement it ran that reads rows.
+
+        With ordered=True the indexes must also deliver rows in order, without a sort.
+        """
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            self.skipTest(f'No plan check for {connection.vendor}')
+
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        statements = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertTrue(statements)
+        for sql in statements:
+            plan = self.explain(sql)
+            if connection.vendor == 'postgresql':
+                self.assertNotIn('Seq Scan', plan, f'{sql}\n{plan}')
+                if ordered:
+                    self.assertNotIn('Sort', plan, f'{sql}\n{plan}')
+            else:
+                full_scans = re.findall(r'SCAN (?!.*USING)(?!TEMP B-TREE).*', plan)
+                self.assertEqual(full_scans, [], f'{sql}\n{plan}')
+                if ordered:
+                    self.assertNotIn('TEMP B-TREE', plan, f'{sql}\n{plan}')
+        return response
+
+    def test_quiz_leaderboard(self):
+        quiz = Quiz.objects.first()
+        self.assertViewUsesIndexes('get', reverse('quiz-leaderboard', args=[quiz.id]))
+
+    def test_user_profile(self):
+        user = User.objects.first()
+        self.assertViewUsesIndexes('get', reverse('user-profile', args=[user.id]))
+
+    def test_global_leaderboard(self):
+        user = User.objects.first()
+        response = self.assertViewUsesIndexes(
+            'get', reverse('global-leaderboard'), {'limit': 5, 'user_id': user.id, 'window': 2}
+        )
+        self.assertTrue(response.data['around_me'])
+
+    def test_quiz_question_pages(self):
+        quiz = Quiz.objects.first()
+        url = reverse('quiz-detail', args=[quiz.id])
+        response = self.assertViewUsesIndexes('get', url, {'page_size': 2}, ordered=True)
+        self.assertViewUsesIndexes(
+            'get', url, {'page_size': 2, 'cursor': response.json()['next_cursor']}, ordered=True
+        )
+
+    def test_cleanup_quiz_data(self):
+        cutoff = (timezone.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        self.assertViewUsesIndexes('post', reverse('cleanup-quiz-data'), {'cutoff_date': cutoff})
+
+
+def quiz_fixture(quiz_id, title, question_count):
+    """Fixture objects for a quiz with four choices per question and no content hashes"""
+    objects = [{'model': 'quizzes.quiz', 'pk': quiz_id, 'fields': {'title': title, 'description': ''}}]
+    for i in range(question_count):
+        question_id = quiz_id * 100 + i
+        objects.append({
+            'model': 'quizzes.question', 'pk': question_id,
+            'fields': {'quiz': quiz_id, 'question_text': f'{title} {i}', 'difficulty': 'easy', 'points': 1}
+        })
+        objects.extend(
+            {'model': 'quizzes.choice', 'pk': question_id * 10 + j,
+             'fields': {'question': question_id, 'choice_text': str(j), 'is_correct': j == 0}}
+            for j in range(4)
+        )
+    return objects
+
+
+class BulkFixtureLoaderTests(TestCase):
+    """The bulk loader writes fixture objects like loaddata, in batches"""
+
+    def test_stream_reader_handles_objects_split_across_reads(self):
+        objects = quiz_fixture(1, 'Tricky ", ] } [ - Quiz', question_count=3)
+        text = json.dumps(objects, indent=2)
+
+        for chunk_size in [1, 7, len(text)]:
+            self.assertEqual(list(iter_fixture_objects(io.StringIO(text), chunk_size)), objects)
+
+        with self.assertRaises(FixtureError):
+            list(iter_fixture_objects(io.StringIO(text[:-10])))
+
+    def test_pk_collisions_ignore_identical_copies(self):
+        shared = {
+            'quizzes.category': [[1, 'History', 'history']],
+            'quizzes.quiz': [], 'quizzes.question': [], 'quizzes.choice': [],
+        }
+        other = {**shared, 'quizzes.quiz': [[5, 'History - A']]}
+        clash = {**shared, 'quizzes.quiz': [[5, 'History - B']]}
+
+        self.assertEqual(find_pk_collisions({'a.json': shared, 'b.json': other}), [])
+        self.assertEqual(
+            find_pk_collisions({'a.json': shared, 'b.json': other, 'c.json': clash}),
+            [('quizzes.quiz', 5, ['b.json', 'c.json'])]
+        )
+
+    def test_loads_batches_and_upserts_existing_rows(self):
+        loader = BulkFixtureLoader(batch_size=7)
+        for obj in quiz_fixture(1, 'History - Quiz', question_count=5):
+            loader.add(obj)
+        counts = loader.finish()
+
+        self.assertEqual((counts[Quiz], counts[Question], counts[Choice]), (1, 5, 20))
+        self.assertEqual(Choice.objects.filter(question__quiz_id=1, is_correct=True).count(), 5)
+
+        loader = BulkFixtureLoader()
+        for obj in quiz_fixture(1, 'History - Renamed', question_count=5):
+            loader.add(obj)
+        loader.finish()
+
+        self.assertEqual(Quiz.objects.get(id=1).title, 'History - Renamed')
+        self.assertEqual(Question.objects.count(), 5)
+
+        # New rows continue after the loaded primary keys
+        self.assertGreater(Quiz.objects.create(title='Next - Quiz').id, 1)
+
+    def test_binary_archive_round_trip_and_category_access(self):
+        create_quiz('History - Quiz', question_count=3)
+        create_quiz('Geography - Quiz', question_count=2)
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        call_command('export_quiz_fixtures', '--output-dir', output_dir, '--format', 'binary', stdout=io.StringIO())
+
+        with open(f'{output_dir}/quiz_fixtures.qfx', 'rb') as f:
+            archive = FixtureArchive(f)
+            objects = list(archive.iter_objects(archive.find('geography')))
+        self.assertEqual(
+            [obj['model'] for obj in objects],
+            ['quizzes.category', 'quizzes.quiz'] + ['quizzes.question'] * 2 + ['quizzes.choice'] * 8
+        )
+
+        expected = list(Choice.objects.order_by('id').values_list('id', 'question__question_text', 'choice_text', 'is_correct'))
+        Quiz.objects.all().delete()
+        Category.objects.all().delete()
+
+        call_command('load_quiz_fixtures', '--fixtures-dir', output_dir, '--category', 'history',
+                     '--force', stdout=io.StringIO())
+        self.assertEqual(list(Quiz.objects.values_list('title', flat=True)), ['History - Quiz'])
+
+        call_command('load_quiz_fixtures', '--fixtures-dir', output_dir, '--force', stdout=io.StringIO())
+        self.assertEqual(
+            list(Choice.objects.order_by('id').values_list('id', 'question__question_text', 'choice_text', 'is_correct')),
+            expected
+        )
+
+
+class ParallelFixtureLoadTests(TransactionTestCase):
+    """Preparing fixture files in worker processes loads the same rows as a serial load"""
+
+    def snapshot(self):
+        return {
+            'quizzes': list(Quiz.objects.order_by('id').values_list('id', 'title', 'category__slug')),
+            'questions': list(Question.objects.order_by('id').values_list('id', 'quiz_id', 'question_text', 'order')),
+            'choices': list(Choice.objects.order_by('id').values_list('id', 'question_id', 'choice_text', 'is_correct')),
+        }
+
+    def clear(self):
+        Quiz.objects.all().delete()
+        Category.objects.all().delete()
+
+    def test_workers_load_matches_serial_load(self):
+        for title, count in [('History - Quiz', 4), ('Geography - Quiz', 3), ('Science - Quiz', 5)]:
+            create_quiz(title, question_count=count)
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        call_command('export_quiz_fixtures', '--output-dir', output_dir, '--split-files', stdout=io.StringIO())
+        self.assertEqual(len(os.listdir(output_dir)), 3)
+        expected = self.snapshot()
+
+        self.clear()
+        call_command('load_quiz_fixtures', '--fixtures-dir', output_dir, '--force', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), expected)
+
+        self.clear()
+        out = io.StringIO()
+        call_command('load_quiz_fixtures', '--fixtures-dir', output_dir, '--force', '--workers', '2', stdout=out)
+        self.assertIn('Prepared', out.getvalue())
+        self.assertEqual(self.snapshot(), expected)
+        self.assertEqual(
+            (Quiz.objects.count(), Question.objects.count(), Choice.objects.count()), (3, 12, 48)
+        )
+
+
+class QuizFixtureExportTests(TestCase):
+    def test_json_export_streams_questions_in_chunks(self):
+        for i in range(3):
+            create_quiz(f'History - Quiz {i}', question_count=5)
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+
+        def export(chunk_size):
+            with CaptureQueriesContext(connection) as queries:
+                call_command('export_quiz_fixtures', '--output-dir', output_dir,
+                             '--chunk-size', str(chunk_size), stdout=io.StringIO())
+            with open(f'{output_dir}/quiz_fixtures.json') as f:
+                return len(queries), json.load(f)
+
+        queries_in_one_chunk, objects = export(15)
+        queries_in_four_chunks, _ = export(4)
+
+        # One extra choices query per extra chunk, none per question
+        self.assertEqual(queries_in_four_chunks - queries_in_one_chunk, 3)
+        self.assertEqual(
+            [obj['model'] for obj in objects[:4]],
+            ['quizzes.category', 'quizzes.quiz', 'quizzes.quiz', 'quizzes.quiz']
+        )
+        self.assertEqual(len(objects), 4 + 15 * 5)
+        for question, *choices in (objects[i:i + 5] for i in range(4, len(objects), 5)):
+            self.assertEqual({choice['fields']['question'] for choice in choices}, {question['pk']})
+
+
+class OpenTDBImportTests(TestCase):
+    """OpenTDB imports run offline against the bundled stub server"""
+
+    def setUp(self):
+        self.server = OpenTDBStubServer(questions_per_category=120).start()
+        self.addCleanup(self.server.stop)
+
+    def test_client_pages_past_fifty_without_duplicates_and_retries(self):
+        self.server.failures_left = 2
+        client = OpenTDBClient(base_url=self.server.url, rate=1000, burst=10, backoff=0.01)
+        with self.assertLogs('quizzes.opentdb', level='WARNING'):
+            questions = client.fetch_questions(9, 110)
+
+        self.assertEqual(len(questions), 110)
+        self.assertEqual(len({question['question'] for question in questions}), 110)
+        self.assertEqual(len(client.fetch_questions(9, 500)), 120)
+
+    def test_empty_success_page_stops_paging(self):
+        self.server.empty_pages_left = 1
+        client = OpenTDBClient(base_url=self.server.url, rate=1000, burst=10, backoff=0.01)
+        with self.assertLogs('quizzes.opentdb', level='WARNING') as logs:
+            self.assertEqual(client.fetch_questions(9, 60), [])
+        self.assertIn('no questions', logs.output[0])
+        self.assertEqual(len(client.fetch_questions(9, 60)), 60)
+
+    def test_import_all_categories_concurrently(self):
+        with override_settings(OPENTDB_BASE_URL=self.server.url, OPENTDB_RATE_LIMIT=1000):
+            call_command('import_opentdb', '--all', '--amount', '60', '--workers', '3', stdout=io.StringIO())
+
+        self.assertEqual(Quiz.objects.count(), len(DEFAULT_CATEGORIES))
+        self.assertEqual(Question.objects.count(), 60 * len(DEFAULT_CATEGORIES))
+        self.assertEqual(Choice.objects.filter(is_correct=True).count(), Question.objects.count())
+
+    def test_reimport_skips_existing_questions(self):
+        with override_settings(OPENTDB_BASE_URL=self.server.url, OPENTDB_RATE_LIMIT=1000):
+            call_command('import_opentdb', '--category-id', '9', '--amount', '30', stdout=io.StringIO())
+            out = io.StringIO()
+            call_command('import_opentdb', '--category-id', '9', '--amount', '40', stdout=out)
+
+        self.assertEqual(Question.objects.count(), 40)
+        self.assertIn('skipped 30 duplicates', out.getvalue())
+
+    def test_fixture_builds_are_reproducible_and_load(self):
+        def build():
+            output_dir = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, output_dir)
+            with override_settings(OPENTDB_BASE_URL=self.server.url, OPENTDB_RATE_LIMIT=1000):
+                call_command('create_opentdb_fixtures', '--all', '--amount', '60',
+                             '--output-dir', output_dir, stdout=io.StringIO())
+            with open(f'{output_dir}/opentdb_all_fixtures.json') as f:
+                objects = json.load(f)
+            for obj in objects:
+                obj['fields'].pop('created_at', None)
+                obj['fields'].pop('updated_at', None)
+            return output_dir, objects
+
+        output_dir, objects = build()
+        self.assertEqual(build()[1], objects)
+
+        # Parents first, each model in primary key order, choices numbered after their question
+        order = ['quizzes.quiz', 'quizzes.question', 'quizzes.choice']
+        self.assertEqual(objects, sorted(objects, key=lambda obj: (order.index(obj['model']), obj['pk'])))
+        for obj in objects:
+            if obj['model'] == 'quizzes.choice':
+                self.assertEqual(obj['pk'] // 8, obj['fields']['question'])
+
+        call_command('load_quiz_fixtures', '--fixtures-dir', output_dir, '--force', stdout=io.StringIO())
+        self.assertEqual(Question.objects.count(), 60 * len(DEFAULT_CATEGORIES))
+        self.assertEqual(Choice.objects.count(), 4 * 60 * len(DEFAULT_CATEGORIES))
+
+    def test_reordered_rebuild_reloads_over_earlier_build(self):
+        category = DEFAULT_CATEGORIES[0]
+        command = create_opentdb_fixtures.Command(stdout=io.StringIO())
+        command.built_at = timezone.now().isoformat()
+
+        def build(numbers):
+            output_dir = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, output_dir)
+            questions = [stub_question(category, number) for number in numbers]
+            fixtures = command.create_quiz_fixtures(category['id'], category['name'], questions)
+            command.save_fixtures(fixtures, output_dir, 'category_fixtures.json')
+            call_command('load_quiz_fixtures', '--fixtures-dir', output_dir, '--force', stdout=io.StringIO())
+
+        build(range(1, 31))
+        question = Question.objects.get(question_text__startswith=f'{category["name"]} question #20 ')
+        choice = question.choices.get(is_correct=True)
+        attempt = complete_attempt(User.objects.create(username='player'), question.quiz, 1, 1)
+        answer = Answer.objects.create(attempt=attempt, question=question, selected_choice=choice, is_correct=True)
+
+        # OpenTDB returns another random order, with some questions gone and some new
+        build(reversed(range(11, 41)))
+        self.assertEqual(Question.objects.count(), 40)
+        self.assertEqual(Question.objects.filter(content_hash__isnull=True).count(), 0)
+        answer.refresh_from_db()
+        self.assertEqual(answer.question.question_text, question.question_text)
+        self.assertEqual(answer.selected_choice.choice_text, choice.choice_text)
+        self.assertTrue(answer.selected_choice.is_correct)
+
+        # New rows stay out of the generated fixture range
+        quiz = create_quiz('History - Quiz', question_count=1)
+        for obj in [quiz, quiz.questions.get(), quiz.questions.get().choices.first()]:
+            start, end = (FIXTURE_ID_BASE, FIXTURE_ID_END)
+            if isinstance(obj, Choice):
+                start, end = start * CHOICE_ID_STRIDE, end * CHOICE_ID_STRIDE
+            self.assertFalse(start <= obj.pk < end, obj)
+
+
+class QuestionContentHashTests(TestCase):
+    def expected_hash(self, question):
+        return Question.content_hash_for(
+            question.question_text, question.choices.values_list('choice_text', flat=True)
+        )
+
+    def stored_hash(self, question):
+        return Question.objects.values_list('content_hash', flat=True).get(pk=question.pk)
+
+    def test_save_paths_keep_hash_current(self):
+        quiz = create_quiz('History - Quiz', question_count=2)
+        question = quiz.questions.first()
+        self.assertEqual(self.stored_hash(question), self.expected_hash(question))
+
+        choice = question.choices.first()
+        choice.choice_text = 'Edited'
+        choice.save()
+        self.assertEqual(self.stored_hash(question), self.expected_hash(question))
+
+        question.choices.last().delete()
+        self.assertEqual(self.stored_hash(question), self.expected_hash(question))
+
+        question.question_text = 'Rewritten'
+        question.save()
+        self.assertEqual(self.stored_hash(question), self.expected_hash(question))
+
+        # Repeats within a quiz have no hash; cascades do not rehash
+        repeat = Question.objects.create(quiz=quiz, question_text='Rewritten')
+        for choice in question.choices.all():
+            Choice.objects.create(question=repeat, choice_text=choice.choice_text)
+        self.assertIsNone(self.stored_hash(repeat))
+        quiz.delete()
+
+    def test_bulk_choice_delete_rehashes_each_question_once(self):
+        quiz = create_quiz('History - Quiz', question_count=20)
+        with mock.patch.object(Question, 'refresh_content_hash', autospec=True) as refresh:
+            Choice.objects.filter(question__quiz=quiz, is_correct=False).delete()
+        self.assertEqual(refresh.call_count, 20)
+
+        quiz = create_quiz('Geography - Quiz', question_count=5)
+        Choice.objects.filter(question__quiz=quiz, choice_text='Choice 2').delete()
+        for question in quiz.questions.all():
+            self.assertEqual(self.stored_hash(question), self.expected_hash(question))
+
+        # Cascades from quizzes and questions rehash nothing
+        with mock.patch.object(Question, 'refresh_content_hash', autospec=True) as refresh:
+            Quiz.objects.all().delete()
+        refresh.assert_not_called()
+
+    def test_fixture_loads_compute_missing_hashes(self):
+        objects = quiz_fixture(1, 'History - Quiz', question_count=3)
+        objects[0]['fields'].update(created_at='2026-01-01T00:00:00Z', updated_at='2026-01-01T00:00:00Z')
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        with open(f'{output_dir}/history_fixtures.json', 'w') as f:
+            json.dump(objects, f)
+
+        for options in [[], ['--use-loaddata']]:
+            call_command('load_quiz_fixtures', '--fixtures-dir', output_dir, '--force', '--clear-existing',
+                         *options, stdout=io.StringIO())
+            questions = Question.objects.all()
+            self.assertEqual(len(questions), 3)
+            for question in questions:
+                self.assertEqual(question.content_hash, self.expected_hash(question), options)
+
+    def test_backfill_skips_repeats(self):
+        quiz = create_quiz('History - Quiz', question_count=3)
+        first, second, third = quiz.questions.order_by('id')
+        Question.objects.filter(pk=second.pk).update(question_text=first.question_text)
+        Choice.objects.filter(question=second).delete()
+        for choice in first.choices.all():
+            Choice.objects.create(question=second, choice_text=choice.choice_text)
+        Question.objects.filter(pk__in=[first.pk, third.pk]).update(content_hash=None)
+
+        self.assertEqual(Question.backfill_content_hashes(batch_size=2), 2)
+        self.assertEqual(self.stored_hash(first), self.expected_hash(first))
+        self.assertEqual(self.stored_hash(third), self.expected_hash(third))
+        self.assertIsNone(self.stored_hash(second))
+
+    def test_hash_ignores_escaping_whitespace_case_and_choice_order(self):
+        self.assertEqual(
+            Question.content_hash_for('Tom &amp; Jerry  are?', ['Cat', 'Mouse']),
+            Question.content_hash_for('tom & jerry are?', ['mouse', 'cat'])
+        )
+        self.assertNotEqual(
+            Question.content_hash_for('Tom & Jerry are?', ['Cat', 'Mouse']),
+            Question.content_hash_for('Tom & Jerry are?', ['Cat', 'Dog'])
+        )
+
+
+@override_settings(AI_QUIZ_PROVIDER='fake', AI_QUIZ_RETRY_BACKOFF=0.01)
+class AIQuizJobTests(TransactionTestCase):
+    """AI quizzes are generated in the background job pool, against the fake provider"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.provider = FakeProvider(latency=0.3, fail_first=1)
+        set_provider(self.provider)
+        self.addCleanup(set_provider, None)
+        reset_ai_quiz_cache()
+        self.addCleanup(reset_ai_quiz_cache)
+
+    def test_job_returns_immediately_and_long_poll_delivers_quiz(self):
+        started_at = time.monotonic()
+        response = self.client.post(
+            reverse('ai-quiz-job-create'), {'topic': 'space', 'difficulty': 'hard', 'question_count': 5}, format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertLess(time.monotonic() - started_at, self.provider.latency)
+        self.assertEqual(response.data['status'], 'pending')
+
+        response = self.client.get(reverse('ai-quiz-job', args=[response.data['id']]), {'wait': 5})
+        self.assertEqual(response.data['status'], 'succeeded')
+        quiz = response.data['quiz']
+        self.assertEqual(len(quiz['questions']), 5)
+        self.assertEqual(quiz['total_points'], 5 * 4)
+        # The first call failed with a retryable error
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_legacy_endpoint_waits_for_the_job(self):
+        response = self.client.post(reverse('generate-ai-quiz'), {'question_count': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['questions']), 3)
+
+        response = self.client.post(reverse('generate-ai-quiz'), {'question_count': 99}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_legacy_endpoint_hands_slow_jobs_over_for_polling(self):
+        started_at = time.monotonic()
+        with override_settings(AI_QUIZ_LEGACY_WAIT=0):
+            response = self.client.post(reverse('generate-ai-quiz'), {'question_count': 3}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertLess(time.monotonic() - started_at, self.provider.latency)
+
+        response = self.client.get(reverse('ai-quiz-job', args=[response.data['id']]), {'wait': 5})
+        self.assertEqual(response.data['status'], 'succeeded')
+
+    def test_stale_jobs_fail_by_time_running_or_queued(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        running = AIQuizJob.objects.create(
+            topic='space', difficulty='easy', question_count=3, status=AIQuizJob.STATUS_RUNNING
+        )
+        AIQuizJob.objects.filter(id=running.id).update(created_at=long_ago, started_at=timezone.now())
+        queued = AIQuizJob.objects.create(topic='space', difficulty='easy', question_count=3)
+
+        # Time spent queued does not count against a running job
+        with override_settings(AI_QUIZ_JOB_TIMEOUT=60, AI_QUIZ_QUEUE_TIMEOUT=600):
+            self.assertEqual(ai_jobs.wait_for_job(running.id).status, AIQuizJob.STATUS_RUNNING)
+            self.assertEqual(ai_jobs.wait_for_job(queued.id).status, AIQuizJob.STATUS_PENDING)
+
+        AIQuizJob.objects.filter(id=running.id).update(started_at=long_ago)
+        AIQuizJob.objects.filter(id=queued.id).update(created_at=long_ago)
+        with override_settings(AI_QUIZ_JOB_TIMEOUT=60, AI_QUIZ_QUEUE_TIMEOUT=600):
+            for job_id in (running.id, queued.id):
+                job = ai_jobs.wait_for_job(job_id)
+                self.assertEqual((job.status, job.error_status), (AIQuizJob.STATUS_FAILED, 504))
+
+    def test_jobs_that_never_run_leave_no_wait_event(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            job = ai_jobs.create_job('space', 'easy', 3)
+            raise RuntimeError('request failed')
+        self.assertNotIn(job.id, ai_jobs._finished_events)
+        self.assertFalse(AIQuizJob.objects.filter(id=job.id).exists())
+
+    def test_repeated_request_is_served_from_cache(self):
+        first = self.client.post(reverse('generate-ai-quiz'), {'topic': 'Space!', 'question_count': 3}, format='json')
+        self.assertEqual(first.status_code, 200)
+        calls = self.provider.calls
+
+        response = self.client.post(
+            reverse('ai-quiz-job-create'), {'topic': ' SPACE ', 'question_count': 3}, format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'succeeded')
+        self.assertEqual(response.data['quiz']['questions'], first.data['questions'])
+        self.assertEqual(self.provider.calls, calls)
+
+        metrics = self.client.get(reverse('ai-quiz-cache')).data
+        self.assertEqual((metrics['hits'], metrics['misses'], metrics['stores']), (1, 1, 1))
+
+
+@override_settings(AI_QUIZ_PROVIDER='fake', AI_QUIZ_RETRY_BACKOFF=0.01)
+class AIQuizStreamTests(TestCase):
+    """Streamed generation delivers questions while the reply is still being produced"""
+
+    def setUp(self):
+        self.client = APIClient()
+        reset_ai_quiz_cache()
+        self.addCleanup(reset_ai_quiz_cache)
+        self.addCleanup(set_provider, None)
+
+    def stream(self, data, **extra):
+        response = self.client.post(reverse('ai-quiz-stream'), data, format='json', **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.streaming_content
+
+    def test_parser_handles_split_chunks_and_sloppy_json(self):
+        text = '```json\n{"title": "Braces {[", "questions": [\n' \
+               '{"question": "Is \\"}\\" a brace?", "options": ["a", "b",],},\n' \
+               '{"question": "Second"}\n], "extra": {}}\n```'
+        parser = QuestionStreamParser()
+        parsed = [question for char in text for question in parser.feed(char)]
+        self.assertEqual(parsed, [{'question': 'Is "}" a brace?', 'options': ['a', 'b']}, {'question': 'Second'}])
+        self.assertEqual(parser.field('title'), 'Braces {[')
+
+    def test_first_question_arrives_early(self):
+        set_provider(FakeProvider(latency=1.0))
+        started_at = time.monotonic()
+        records = []
+        for line in self.stream({'topic': 'volcanoes', 'question_count': 10}):
+            records.append(json.loads(line))
+            if len(records) == 2:
+                first_question_after = time.monotonic() - started_at
+        total = time.monotonic() - started_at
+
+        self.assertEqual([record['type'] for record in records], ['quiz'] + ['question'] * 10 + ['done'])
+        self.assertEqual(records[0]['title'], 'Volcanoes Quiz')
+        self.assertEqual([record['order'] for record in records[1:-1]], list(range(1, 11)))
+        self.assertLess(first_question_after, total / 3)
+
+    def test_broken_stream_only_asks_for_missing_questions(self):
+        provider = FakeProvider(fail_first=1)
+        set_provider(provider)
+        content = b''.join(self.stream({'topic': 'tides', 'question_count': 8}, HTTP_ACCEPT='text/event-stream'))
+        events = re.findall(r'event: (\w+)\ndata: (.*)\n\n', content.decode())
+
+        self.assertEqual(events[-1][0], 'done')
+        questions = [json.loads(data) for event, data in events if event == 'question']
+        self.assertEqual([question['id'] for question in questions], list(range(1, 9)))
+        self.assertEqual(len({question['question_text'] for question in questions}), 8)
+        self.assertEqual(provider.calls, 2)
+
+        # The complete quiz was cached, so the same request is replayed
+        lines = list(self.stream({'topic': 'Tides', 'question_count': 8}))
+        self.assertEqual(len(lines), 10)
+        self.assertEqual(provider.calls, 2)
+
+    def test_max_retries_counts_retries_after_the_first_attempt(self):
+        for max_retries, fail_first in [(0, 0), (1, 1)]:
+            provider = FakeProvider(fail_first=fail_first)
+            set_provider(provider)
+            with override_settings(AI_QUIZ_MAX_RETRIES=max_retries):
+                content = self.stream({'topic': f'tides {max_retries}', 'question_count': 3})
+                lines = [json.loads(line) for line in content]
+            self.assertEqual(lines[-1]['type'], 'done')
+            self.assertEqual(provider.calls, max_retries + 1)
+
+
+class OverlappingProvider(FakeProvider):
+    """Fake provider whose shards all return the same questions"""
+
+    def quiz_for(self, prompt):
+        return super().quiz_for(re.sub(r'This is part \d+ of \d+', '', prompt))
+
+
+@override_settings(AI_QUIZ_SHARD_SIZE=10, AI_QUIZ_SHARD_WORKERS=4, AI_QUIZ_RETRY_BACKOFF=0.01)
+class AIQuizShardTests(TestCase):
+    """Large AI quizzes are generated as concurrent shards"""
+
+    def test_shards_run_concurrently_and_only_failed_shard_is_retried(self):
+        self.assertEqual(shard_sizes(40, 10), [10, 10, 10, 10])
+        self.assertEqual(shard_sizes(23, 10), [8, 8, 7])
+
+        provider = FakeProvider(latency=0.3, fail_first=1)
+        started_at = time.monotonic()
+        quiz = generate_quiz('comets', 'easy', 40, provider=provider)
+
+        self.assertLess(time.monotonic() - started_at, 3 * provider.latency)
+        self.assertEqual(provider.calls, 5)
+        self.assertEqual([question['order'] for question in quiz['questions']], list(range(1, 41)))
+        self.assertEqual(len({question['question_text'] for question in quiz['questions']}), 40)
+
+    def test_questions_repeated_across_shards_are_replaced(self):
+        provider = OverlappingProvider()
+        quiz = generate_quiz('glaciers', 'medium', 12, provider=provider)
+
+        self.assertEqual(len({question['question_text'] for question in quiz['questions']}), 12)
+        # Two shards of 6 identical questions, then one top-up prompt for the other 6
+        self.assertEqual(provider.calls, 3)
+
+    def test_max_retries_counts_retries_after_the_first_attempt(self):
+        for max_retries, fail_first in [(0, 0), (1, 1)]:
+            provider = FakeProvider(fail_first=fail_first)
+            with override_settings(AI_QUIZ_MAX_RETRIES=max_retries):
+                quiz = generate_quiz('comets', 'easy', 5, provider=provider)
+            self.assertEqual(len(quiz['questions']), 5)
+            self.assertEqual(provider.calls, max_retries + 1)
+
+        provider = FakeProvider(fail_first=2)
+        with override_settings(AI_QUIZ_MAX_RETRIES=1), self.assertRaises(AIQuizError):
+            generate_quiz('comets', 'easy', 5, provider=provider)
+        self.assertEqual(provider.calls, 2)
+
+
+class AIQuizCacheTests(TestCase):
+    """TTL expiry, LRU eviction and prewarming of the AI quiz cache"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = AIQuizCache(max_keys=2, per_key=2, ttl=60, clock=lambda: self.now)
+
+    def test_entries_expire_and_least_recently_used_key_is_evicted(self):
+        space, history, art = (cache_key(topic, 'easy', 5) for topic in ['space', 'history', 'art'])
+        self.cache.put(space, {'title': 'Space'})
+        self.cache.put(history, {'title': 'History'})
+        self.assertEqual(self.cache.get(space), {'title': 'Space'})
+
+        # history is now least recently used
+        self.cache.put(art, {'title': 'Art'})
+        self.assertIsNone(self.cache.get(history))
+
+        self.now = 61
+        self.assertIsNone(self.cache.get(space))
+        metrics = self.cache.metrics()
+        self.assertEqual((metrics['evictions'], metrics['expirations']), (1, 1))
+        self.assertEqual(metrics['keys'], 1)
+
+    def test_prewarmer_fills_popular_keys(self):
+        set_provider(FakeProvider())
+        self.addCleanup(set_provider, None)
+        key = cache_key('Rivers', 'medium', 4)
+        self.cache.get(key)
+
+        # One-off topics are not prewarmed
+        self.assertEqual(Prewarmer(self.cache, popular=1).run_once(), 0)
+        self.cache.get(key)
+        self.assertEqual(Prewarmer(self.cache, popular=1).run_once(), 2)
+        self.assertEqual(self.cache.fresh_count(key), 2)
+        self.assertEqual(len(self.cache.get(key)['questions']), 4)
+        self.assertEqual(Prewarmer(self.cache, popular=1).run_once(), 0)
+
+        # Requests older than the previous TTL period no longer count
+        self.now = 200
+        self.assertEqual(self.cache.popular_keys(1, min_requests=2), [])
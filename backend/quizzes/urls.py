@@ -7,6 +7,10 @@ urlpatterns = [
     path('quizzes/<int:pk>/', views.QuizDetailView.as_view(), name='quiz-detail'),
     path('quiz/generate/', views.generate_custom_quiz, name='generate-custom-quiz'),
     path('quiz/generate-ai/', views.generate_ai_quiz, name='generate-ai-quiz'),
+    path('quiz/generate-ai/jobs/', views.create_ai_quiz_job, name='ai-quiz-job-create'),
+    path('quiz/generate-ai/jobs/<uuid:job_id>/', views.ai_quiz_job, name='ai-quiz-job'),
+    path('quiz/generate-ai/stream/', views.stream_ai_quiz, name='ai-quiz-stream'),
+    path('quiz/generate-ai/cache/', views.ai_quiz_cache_metrics, name='ai-quiz-cache'),
     path('submit/', views.submit_quiz, name='submit-quiz'),
     path('attempts/<int:user_id>/', views.get_user_attempts, name='user-attempts'),
 
@@ -1,38 +1,146 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Count, Sum
 from datetime import datetime, timedelta
-import random
-import json
-import time
-from decouple import config
-import google.generativeai as genai
-from .models import Quiz, Question, Choice, QuizAttempt, Answer, UserProfile
+import hashlib
+from .models import (
+    Category, Quiz, Question, Choice, QuizAttempt, Answer, UserProfile, LeaderboardDirtyUser, AIQuizJob
+)
+from .ai_quiz import AIQuizError, get_provider as get_ai_provider, validate_request as validate_ai_quiz_request
+from .ai_cache import get_ai_quiz_cache
+from .ai_stream import quiz_events as ai_quiz_events
+from .ai_jobs import create_job as create_ai_job, wait_for_job as wait_for_ai_job, job_payload as ai_job_payload
+from .grading import load_answer_key, quiz_total_points, grade_answers, save_graded_answers
+from .leaderboard import get_leaderboard_index
+from .cache import cached_json_response, quiz_leaderboard_key
+from .question_pool import get_question_pool, sample_questions
+from .pagination import paginate_questions, InvalidCursor
+from .streaming import NDJSONRenderer, EventStreamRenderer, ndjson_response, sse_response
 from .serializers import (
     QuizListSerializer, QuizDetailSerializer, QuizAttemptSerializer,
     QuizSubmissionSerializer, LeaderboardEntrySerializer, UserProfileSerializer,
-    QuizLeaderboardSerializer
+    QuizLeaderboardSerializer, QuizSummarySerializer, QuestionSerializer
 )
 
-# Initialize Gemini AI
-GEMINI_API_KEY = config('GEMINI_API_KEY', default=None)
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-
 class QuizListView(generics.ListAPIView):
-    queryset = Quiz.objects.filter(is_active=True)
     serializer_class = QuizListSerializer
     permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        # Question counts come from one grouped query instead of a COUNT per quiz
+        queryset = Quiz.objects.filter(is_active=True).select_related('category').annotate(
+            question_count=Count('questions')
+        )
+
+        category = self.request.query_params.get('category')
+        if category:
+            queryset = queryset.filter(category__in=Category.matching(category))
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        # Rendered list is cached per content version (and category) and served with an ETag
+        category = request.query_params.get('category')
+        name = f'quiz_list:{hashlib.md5(category.strip().lower().encode()).hexdigest()}' if category else 'quiz_list'
+        build_list = super().list
+        return cached_json_response(
+            request, name, lambda: build_list(request, *args, **kwargs).data
+        )
+
 class QuizDetailView(generics.RetrieveAPIView):
-    queryset = Quiz.objects.filter(is_active=True)
+    """
+    Quiz with its questions.
+
+    By default the whole quiz is returned. With ?page_size and/or ?cursor the
+    questions are returned one cursor page at a time, and with
+    Accept: application/x-ndjson (or ?format=ndjson) they are streamed as
+    they are read, so large quizzes are never serialized in one piece.
+    """
     serializer_class = QuizDetailSerializer
     permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer, NDJSONRenderer]
+
+    def get_queryset(self):
+        # One query each for the quiz, its questions and their choices
+        return Quiz.objects.filter(is_active=True).annotate(
+            total_points=Sum('questions__points')
+        ).prefetch_related('questions__choices')
+
+    def get_summary_object(self, pk):
+        """Quiz with question totals, without loading its questions"""
+        return get_object_or_404(
+            Quiz.objects.filter(is_active=True).annotate(
+                total_points=Sum('questions__points'),
+                question_count=Count('questions')
+            ),
+            pk=pk
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == 'ndjson':
+            return self.stream_questions(kwargs['pk'])
+
+        if 'page_size' in request.query_params or 'cursor' in request.query_params:
+            return self.retrieve_page(request, kwargs['pk'])
+
+        # Rendered quiz is cached per content version and served with an ETag
+        build_detail = super().retrieve
+        return cached_json_response(
+            request, f'quiz_detail:{kwargs["pk"]}', lambda: build_detail(request, *args, **kwargs).data
+        )
+
+    def retrieve_page(self, request, pk):
+        """One cursor page of questions with the quiz metadata"""
+        try:
+            page_size = int(request.query_params.get('page_size', settings.QUIZ_QUESTIONS_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'page_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if page_size < 1:
+            return Response({'error': 'page_size must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = min(page_size, settings.QUIZ_QUESTIONS_MAX_PAGE_SIZE)
+        cursor = request.query_params.get('cursor')
+
+        def build_page():
+            quiz = self.get_summary_object(pk)
+            questions, next_cursor = paginate_questions(
+                quiz.questions.prefetch_related('choices'), cursor, page_size
+            )
+            return {
+                **QuizSummarySerializer(quiz).data,
+                'questions': QuestionSerializer(questions, many=True).data,
+                'next_cursor': next_cursor
+            }
+
+        # Cursors come from the client, so only a fixed-length digest goes into the key
+        cursor_digest = hashlib.md5(cursor.encode()).hexdigest() if cursor else ''
+        try:
+            return cached_json_response(
+                request, f'quiz_detail:{pk}:page:{cursor_digest}:{page_size}', build_page
+            )
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def stream_questions(self, pk):
+        """Stream the quiz metadata followed by one NDJSON line per question"""
+        quiz = self.get_summary_object(pk)
+        header = QuizSummarySerializer(quiz).data
+        questions = quiz.questions.order_by('order', 'id').prefetch_related(
+            'choices'
+        ).iterator(chunk_size=settings.QUIZ_STREAM_CHUNK_SIZE)
+
+        def records():
+            yield {'type': 'quiz', **header}
+            for question in questions:
+                yield {'type': 'question', **QuestionSerializer(question).data}
+
+        return ndjson_response(records())
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -61,48 +169,23 @@ def submit_quiz(request):
     except User.DoesNotExist:
         user = User.objects.create_user(username=f'user_{user_id}', password='password')
     
+    # Load the answer key once; it also provides the quiz total
+    answer_key = load_answer_key(quiz)
+
     # Create quiz attempt
     attempt, created = QuizAttempt.objects.get_or_create(
         user=user,
         quiz=quiz,
-        defaults={'total_points': sum(q.points for q in quiz.questions.all())}
+        defaults={'total_points': quiz_total_points(answer_key)}
     )
     
     if attempt.is_completed:
         return Response({'error': 'Quiz already completed'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Process answers
-    score = 0
-    for answer_data in answers_data:
-        question_id = answer_data.get('question_id')
-        selected_choice_id = answer_data.get('selected_choice_id')
-        text_answer = answer_data.get('text_answer', '')
-        
-        try:
-            question = Question.objects.get(id=question_id, quiz=quiz)
-        except Question.DoesNotExist:
-            continue
-        
-        is_correct = False
-        selected_choice = None
-        
-        if selected_choice_id:
-            try:
-                selected_choice = Choice.objects.get(id=selected_choice_id, question=question)
-                is_correct = selected_choice.is_correct
-            except Choice.DoesNotExist:
-                pass
-        
-        if is_correct:
-            score += question.points
-        
-        Answer.objects.create(
-            attempt=attempt,
-            question=question,
-            selected_choice=selected_choice,
-            text_answer=text_answer,
-            is_correct=is_correct
-        )
+    # Grade all answers in memory and store them in one insert
+    result = grade_answers(attempt, answers_data, answer_key)
+    score = result.score
+    save_graded_answers(result)
     
     # Update attempt
     attempt.score = score
@@ -112,21 +195,31 @@ def submit_quiz(request):
         attempt.time_taken_seconds = time_taken_seconds
     attempt.save()
     
-    # Update or create user profile
+    # Update or create user profile, applying only the new attempt
     profile, created = UserProfile.objects.get_or_create(user=user)
-    profile.update_stats()
+    LeaderboardDirtyUser.mark([profile])
+    if created:
+        profile.update_stats()
+    else:
+        profile.record_attempt(attempt)
     
-    # Update all user ranks
-    UserProfile.update_all_ranks()
+    leaderboard_index = get_leaderboard_index()
+    leaderboard_index.update_profile(profile)
     
     return Response({
         'score': score,
         'total_points': attempt.total_points,
         'percentage': (score / attempt.total_points * 100) if attempt.total_points > 0 else 0,
         'attempt_id': attempt.id,
-        'rank': profile.rank
+        'rank': _current_rank(leaderboard_index, profile)
     })
 
+def _current_rank(leaderboard_index, profile):
+    """A user's rank from the index when all processes share it, else from the database"""
+    if leaderboard_index.shared:
+        return leaderboard_index.rank_of(profile.user_id)
+    return profile.get_current_rank()
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_user_attempts(request, user_id):
@@ -142,25 +235,62 @@ def get_user_attempts(request, user_id):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def global_leaderboard(request):
-    """Get global leaderboard with top users"""
-    limit = int(request.GET.get('limit', 50))
+    """Get global leaderboard with top users, optionally with the players around a user"""
+    try:
+        limit = int(request.GET.get('limit', 50))
+        user_id = request.GET.get('user_id')
+        user_id = int(user_id) if user_id else None
+        window = int(request.GET.get('window', 5))
+    except ValueError:
+        return Response(
+            {'error': 'limit, user_id and window must be integers'}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if limit < 0 or window < 0:
+        return Response(
+            {'error': 'limit and window must not be negative'}, status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    leaderboard_index = get_leaderboard_index()
+    entries = leaderboard_index.top(limit)
+    around_entries = leaderboard_index.around(user_id, window) if user_id else []
+    
+    response_data = {
+        'leaderboard': _serialize_leaderboard_entries(entries),
+        'total_users': leaderboard_index.count()
+    }
+    
+    if user_id:
+        response_data['user_rank'] = leaderboard_index.rank_of(user_id)
+        response_data['around_me'] = _serialize_leaderboard_entries(around_entries)
     
-    # Get top users by rank
+    return Response(response_data)
+
+def _serialize_leaderboard_entries(entries):
+    """Serialize leaderboard index entries with their profiles, fetched in one query"""
+    # Looked up by user id; the index order is applied below, so skip the default ordering
     profiles = UserProfile.objects.filter(
-        total_quizzes_completed__gt=0
-    ).order_by('rank')[:limit]
+        user_id__in=[entry.user_id for entry in entries]
+    ).select_related('user').order_by().in_bulk(field_name='user_id')
     
-    serializer = LeaderboardEntrySerializer(profiles, many=True)
+    ranked_profiles = []
+    for entry in entries:
+        profile = profiles.get(entry.user_id)
+        if profile is None:
+            continue
+        profile.current_rank = entry.rank
+        ranked_profiles.append(profile)
     
-    return Response({
-        'leaderboard': serializer.data,
-        'total_users': UserProfile.objects.filter(total_quizzes_completed__gt=0).count()
-    })
+    return LeaderboardEntrySerializer(ranked_profiles, many=True).data
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def quiz_leaderboard(request, quiz_id):
-    """Get leaderboard for a specific quiz"""
+    """Get leaderboard for a specific quiz, cached for LEADERBOARD_CACHE_TIMEOUT seconds"""
+    key = quiz_leaderboard_key(quiz_id)
+    response_data = cache.get(key)
+    if response_data is not None:
+        return Response(response_data)
+
     try:
         quiz = Quiz.objects.get(id=quiz_id, is_active=True, is_ai_generated=False)
     except Quiz.DoesNotExist:
@@ -188,11 +318,13 @@ def quiz_leaderboard(request, quiz_id):
             'time_taken': attempt.time_taken_formatted
         })
     
-    return Response({
+    response_data = {
         'quiz_id': quiz.id,
         'quiz_title': quiz.title,
         'leaderboard': leaderboard_data
-    })
+    }
+    cache.set(key, response_data, settings.LEADERBOARD_CACHE_TIMEOUT)
+    return Response(response_data)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -207,6 +339,11 @@ def user_profile(request, user_id):
     if created:
         profile.update_stats()
     
+    leaderboard_index = get_leaderboard_index()
+    if created:
+        leaderboard_index.update_profile(profile)
+    profile.current_rank = _current_rank(leaderboard_index, profile)
+    
     serializer = UserProfileSerializer(profile)
     
     # Get recent attempts (including AI-generated quizzes for history display)
@@ -254,28 +391,29 @@ def generate_custom_quiz(request):
     """Generate a custom quiz based on category, difficulty, and question count"""
     category = request.data.get('category')
     difficulty = request.data.get('difficulty')  # 'easy', 'medium', 'hard', or None for any
-    question_count = int(request.data.get('question_count', 10))
+    try:
+        question_count = int(request.data.get('question_count', 10))
+    except (TypeError, ValueError):
+        return Response({'error': 'question_count must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
 
     if not category:
         return Response({'error': 'Category is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(category, str) or not category.strip():
+        return Response({'error': 'Category must be a non-empty string'}, status=status.HTTP_400_BAD_REQUEST)
+    if difficulty is not None and not isinstance(difficulty, str):
+        return Response({'error': 'Difficulty must be a string'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Get all questions from quizzes that match the category
-    quiz_filter = Q(quiz__title__icontains=category) & Q(quiz__is_active=True)
-
-    if difficulty:
-        quiz_filter &= Q(difficulty=difficulty)
+    # Sample from the precomputed id pool for this category and difficulty
+    pool = get_question_pool(category, difficulty)
 
-    # Get all matching questions with distinct check to avoid duplicates
-    all_questions = list(Question.objects.filter(quiz_filter).select_related('quiz').distinct())
-
-    if not all_questions:
+    if not pool:
         return Response({
             'error': f'No questions found for category "{category}"' +
                     (f' with difficulty "{difficulty}"' if difficulty else '')
         }, status=status.HTTP_404_NOT_FOUND)
 
     # Check if we have enough questions
-    available_count = len(all_questions)
+    available_count = len(pool)
     actual_count = min(question_count, available_count)
 
     # Prepare warning message if not enough questions
@@ -283,8 +421,8 @@ def generate_custom_quiz(request):
     if available_count < question_count:
         warning_message = f'Only {available_count} unique question{"s" if available_count != 1 else ""} available for this category{f" with {difficulty} difficulty" if difficulty else ""}. Generating quiz with {actual_count} question{"s" if actual_count != 1 else ""}.'
 
-    # Randomly select questions up to the requested count
-    selected_questions = random.sample(all_questions, actual_count)
+    # Fetch only the selected questions, with their choices in one extra query
+    selected_questions = sample_questions(pool, actual_count)
 
     # Build quiz data structure
     quiz_data = {
@@ -343,28 +481,32 @@ def cleanup_quiz_data(request):
 
     # Count what will be deleted
     quiz_attempts_to_delete = QuizAttempt.objects.filter(started_at__lt=cutoff_datetime)
-    answers_to_delete = Answer.objects.filter(attempt__started_at__lt=cutoff_datetime)
+    # Filtering on attempt_id (not through the join) lets the delete use the attempt index
+    answers_to_delete = Answer.objects.filter(attempt_id__in=quiz_attempts_to_delete.values('id'))
 
     attempts_count = quiz_attempts_to_delete.count()
     answers_count = answers_to_delete.count()
 
+    # Only users who lose attempts need their statistics recomputed
+    affected_profiles = UserProfile.objects.filter(
+        user_id__in=quiz_attempts_to_delete.values('user_id')
+    ).order_by()
+    LeaderboardDirtyUser.mark(affected_profiles)
+
     # Perform the deletion
     deleted_answers = answers_to_delete.delete()
     deleted_attempts = quiz_attempts_to_delete.delete()
 
-    # Update user profiles after deletion
-    profiles = UserProfile.objects.all()
-    for profile in profiles:
-        profile.update_stats()
-
-    # Update all user ranks after cleanup
-    UserProfile.update_all_ranks()
+    # Recompute a bounded number of dirty users now; the scheduled
+    # leaderboard update picks up the rest
+    profiles_updated, _ = UserProfile.incremental_update(limit=settings.LEADERBOARD_SYNC_UPDATE_LIMIT)
 
     return Response({
         'message': f'Successfully cleaned up quiz data prior to {cutoff_date_str}',
         'deleted_attempts': deleted_attempts[0],
         'deleted_answers': deleted_answers[0],
-        'profiles_updated': profiles.count()
+        'profiles_updated': profiles_updated,
+        'profiles_pending': LeaderboardDirtyUser.objects.count()
     })
 
 @api_view(['POST'])
@@ -413,6 +555,16 @@ def save_custom_quiz_result(request):
         time_taken_seconds=time_taken_seconds
     )
 
+    # Custom quizzes built from database questions count towards the profile
+    if not is_ai_generated:
+        profile, created = UserProfile.objects.get_or_create(user=user)
+        LeaderboardDirtyUser.mark([profile])
+        if created:
+            profile.update_stats()
+        else:
+            profile.record_attempt(attempt)
+        get_leaderboard_index().update_profile(profile)
+
     return Response({
         'message': 'Custom quiz result saved successfully',
         'attempt_id': attempt.id,
@@ -454,187 +606,105 @@ def scheduler_status(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
-def generate_ai_quiz(request):
-    """Generate an AI-powered quiz using Google Gemini"""
+def create_ai_quiz_job(request):
+    """Start generating an AI quiz in the background; returns the job to poll"""
+    if get_ai_provider() is None:
+        return Response({
+            'error': 'Gemini API key is not configured. Please add your API key to the .env file.'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    try:
+        topic, difficulty, question_count = validate_ai_quiz_request(request.data)
+    except AIQuizError as e:
+        return Response({'error': e.message}, status=e.status_code)
 
-    # Check if Gemini is configured
-    if not GEMINI_API_KEY:
+    job = create_ai_job(topic, difficulty, question_count)
+    return Response(ai_job_payload(job), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def ai_quiz_job(request, job_id):
+    """
+    Status of an AI quiz job, with the quiz once it succeeded.
+
+    ?wait=N long-polls: the response is held up to N seconds (capped at
+    AI_QUIZ_MAX_WAIT) until the job finishes.
+    """
+    try:
+        wait = min(max(float(request.query_params.get('wait', 0)), 0), settings.AI_QUIZ_MAX_WAIT)
+    except ValueError:
+        return Response({'error': 'wait must be a number of seconds'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        job = wait_for_ai_job(job_id, wait)
+    except AIQuizJob.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ai_job_payload(job))
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@renderer_classes([NDJSONRenderer, EventStreamRenderer, JSONRenderer])
+def stream_ai_quiz(request):
+    """
+    Generate an AI quiz and stream each question as soon as it is generated.
+
+    Responds with NDJSON records, or server-sent events with
+    Accept: text/event-stream (or ?format=sse); see ai_stream for the
+    records. Unlike the job endpoints, the request is held for the whole
+    generation.
+    """
+    if get_ai_provider() is None:
         return Response({
             'error': 'Gemini API key is not configured. Please add your API key to the .env file.'
         }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-    # Get request parameters
-    difficulty = request.data.get('difficulty', 'any')
-    question_count = int(request.data.get('question_count', 10))
-    topic = request.data.get('topic', '').strip()
+    try:
+        topic, difficulty, question_count = validate_ai_quiz_request(request.data)
+    except AIQuizError as e:
+        return Response({'error': e.message}, status=e.status_code)
 
-    # Validate parameters
-    if difficulty not in ['easy', 'medium', 'hard', 'any']:
-        return Response({'error': 'Invalid difficulty level'}, status=status.HTTP_400_BAD_REQUEST)
+    events = ai_quiz_events(topic, difficulty, question_count)
+    if request.accepted_renderer.format == 'sse':
+        return sse_response(events)
+    return ndjson_response(events)
 
-    if question_count < 1 or question_count > 50:
-        return Response({'error': 'Question count must be between 1 and 50'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Generate quiz with retry logic
-    max_retries = 3
-    base_delay = 2
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def ai_quiz_cache_metrics(request):
+    """Hit rate and size of this process's AI quiz cache"""
+    return Response(get_ai_quiz_cache().metrics())
 
-    for attempt in range(max_retries):
-        try:
-            # Create the prompt
-            topic_text = f"about {topic}" if topic else "on general knowledge topics"
-            difficulty_text = (
-                "mixed difficulty levels (include a variety of easy, medium, and hard questions)"
-                if difficulty == 'any' else f"{difficulty} difficulty level"
-            )
 
-            prompt = f"""Generate a quiz {topic_text} with the following specifications:
-
-Difficulty: {difficulty_text}
-Number of questions: {question_count}
-
-Requirements:
-- Each question should have exactly 4 multiple choice options (A, B, C, D)
-- Only one option should be correct
-- Questions should be appropriate for {difficulty_text}
-- Include a mix of topics if no specific topic is provided
-- Make questions engaging and educational
-
-Please respond with ONLY a valid JSON object in this exact format:
-{{
-  "title": "Generated Quiz Title",
-  "description": "Brief description of the quiz",
-  "questions": [
-    {{
-      "question": "What is the question text?",
-      "options": ["Option A", "Option B", "Option C", "Option D"],
-      "correct_answer": "Option A",
-      "difficulty": "{difficulty if difficulty != 'any' else 'easy" (or "medium" or "hard" for each question individually)'}",
-      "type": "multiple_choice"
-    }}
-  ]
-}}
-
-{f'IMPORTANT: For mixed difficulty, assign each question a specific difficulty level ("easy", "medium", or "hard") based on its complexity. Make sure to include a good mix of all three difficulty levels.' if difficulty == 'any' else ''}
-
-Generate exactly {question_count} questions. Do not include any text before or after the JSON object."""
-
-            # Call Gemini API
-            model = genai.GenerativeModel('gemini-2.5-flash-lite')
-            result = model.generate_content(prompt)
-            response_text = result.text.strip()
-
-            # Clean up response - remove markdown code blocks if present
-            if response_text.startswith('```json'):
-                response_text = response_text.replace('```json', '', 1).replace('```', '', 1).strip()
-            elif response_text.startswith('```'):
-                response_text = response_text.replace('```', '', 1).replace('```', '', 1).strip()
-
-            # Parse JSON response
-            quiz_data = json.loads(response_text)
-
-            # Validate response structure
-            if not quiz_data or not isinstance(quiz_data, dict):
-                raise ValueError('Invalid quiz data format')
-
-            if not isinstance(quiz_data.get('questions'), list) or len(quiz_data['questions']) != question_count:
-                raise ValueError(f'Expected {question_count} questions, got {len(quiz_data.get("questions", []))}')
-
-            # Validate each question
-            for q in quiz_data['questions']:
-                if not q.get('question') or not isinstance(q.get('options'), list) or len(q['options']) != 4:
-                    raise ValueError('Invalid question format')
-                if not q.get('correct_answer') or q['correct_answer'] not in q['options']:
-                    raise ValueError('Invalid correct answer')
-
-            # Transform to QuizDetail format
-            def get_points_for_difficulty(q_difficulty):
-                return {'easy': 1, 'medium': 2, 'hard': 4}.get(q_difficulty.lower(), 2)
-
-            transformed_questions = []
-            for i, gemini_question in enumerate(quiz_data['questions']):
-                choices = [
-                    {
-                        'id': j + 1,
-                        'choice_text': option,
-                        'is_correct': option == gemini_question['correct_answer']
-                    }
-                    for j, option in enumerate(gemini_question['options'])
-                ]
-
-                question_points = get_points_for_difficulty(gemini_question.get('difficulty', difficulty))
-
-                transformed_questions.append({
-                    'id': i + 1,
-                    'question_text': gemini_question['question'],
-                    'question_type': 'multiple_choice',
-                    'points': question_points,
-                    'order': i + 1,
-                    'choices': choices
-                })
-
-            total_points = sum(q['points'] for q in transformed_questions)
-
-            response_data = {
-                'id': int(time.time() * 1000),  # Unique ID based on timestamp
-                'title': quiz_data.get('title', f'{difficulty.title()} Quiz'),
-                'description': quiz_data.get('description', f'A {difficulty} difficulty quiz with {question_count} questions'),
-                'created_at': timezone.now().isoformat(),
-                'questions': transformed_questions,
-                'total_points': total_points
-            }
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def generate_ai_quiz(request):
+    """
+    Generate an AI-powered quiz and return it in one response.
+
+    Kept for older clients: the generation runs as a background job and
+    this request only waits for it briefly, up to AI_QUIZ_LEGACY_WAIT
+    seconds, so it does not hold a worker for a whole generation. If the
+    job is still running then, 202 and the job are returned for polling.
+    """
+    if get_ai_provider() is None:
+        return Response({
+            'error': 'Gemini API key is not configured. Please add your API key to the .env file.'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-            return Response(response_data)
-
-        except json.JSONDecodeError as e:
-            if attempt < max_retries - 1:
-                delay = base_delay * (2 ** attempt)
-                time.sleep(delay)
-                continue
-            return Response({
-                'error': 'Failed to parse AI response. Please try again.'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        except Exception as e:
-            error_message = str(e).lower()
-
-            # Check if retryable error
-            is_retryable = any(keyword in error_message for keyword in [
-                'overloaded', '503', '502', '504', 'timeout', 'network', 'fetch'
-            ])
-
-            if is_retryable and attempt < max_retries - 1:
-                delay = base_delay * (2 ** attempt)
-                time.sleep(delay)
-                continue
-
-            # Return specific error messages
-            if 'api_key' in error_message or 'api key' in error_message:
-                return Response({
-                    'error': 'Invalid API key. Please check your Gemini API key configuration.'
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-
-            if 'overloaded' in error_message or '503' in error_message:
-                return Response({
-                    'error': 'AI service is currently overloaded. Please wait a moment and try again.'
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-
-            if 'quota' in error_message or 'limit' in error_message:
-                return Response({
-                    'error': 'API quota exceeded. Please try again later or check your API usage limits.'
-                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-
-            if 'timeout' in error_message:
-                return Response({
-                    'error': 'Request timed out. Please check your internet connection and try again.'
-                }, status=status.HTTP_504_GATEWAY_TIMEOUT)
-
-            # Generic error
-            return Response({
-                'error': 'Failed to generate quiz. The AI service may be temporarily unavailable. Please try again in a few moments.'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    # If all retries exhausted
-    return Response({
-        'error': 'Failed to generate quiz after multiple attempts. Please try again later.'
-    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    try:
+        topic, difficulty, question_count = validate_ai_quiz_request(request.data)
+    except AIQuizError as e:
+        return Response({'error': e.message}, status=e.status_code)
+
+    job = wait_for_ai_job(
+        create_ai_job(topic, difficulty, question_count).id,
+        min(settings.AI_QUIZ_LEGACY_WAIT, settings.AI_QUIZ_MAX_WAIT)
+    )
+    if job.status == AIQuizJob.STATUS_SUCCEEDED:
+        return Response(job.result)
+    if job.status == AIQuizJob.STATUS_FAILED:
+        return Response({'error': job.error}, status=job.error_status or status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(ai_job_payload(job), status=status.HTTP_202_ACCEPTED)
@@ -73,6 +73,8 @@ export const API_ENDPOINTS = {
     list: '/quizzes/',
     generate: '/quiz/generate/',
     generateAI: '/quiz/generate-ai/',
+    aiJobs: '/quiz/generate-ai/jobs/',
+    aiJob: (jobId: string) => `/quiz/generate-ai/jobs/${jobId}/`,
     submit: '/submit/',
     saveCustomResult: '/save-custom-result/',
   },
@@ -181,14 +181,22 @@ export const quizAPI = {
     return response.data;
   },
 
-  // Generate an AI-powered quiz using Gemini
+  // Generate an AI-powered quiz using Gemini: start a background job, then
+  // long-poll it (each poll stays under the request timeout) until it finishes
   generateAIQuiz: async (config: {
     difficulty: 'easy' | 'medium' | 'hard' | 'any';
     question_count: number;
     topic?: string;
   }): Promise<QuizDetail> => {
-    const response = await api.post(API_ENDPOINTS.quiz.generateAI, config);
-    return response.data;
+    let job = (await api.post(API_ENDPOINTS.quiz.aiJobs, config)).data;
+    while (job.status === 'pending' || job.status === 'running') {
+      job = (await api.get(API_ENDPOINTS.quiz.aiJob(job.id), { params: { wait: 8 } })).data;
+    }
+    if (job.status === 'failed') {
+      // Same shape as an HTTP error, so screens keep reading error.response.data.error
+      throw { response: { status: job.error_status, data: { error: job.error } } };
+    }
+    return job.quiz;
   },
 
   // Submit quiz answers and get results